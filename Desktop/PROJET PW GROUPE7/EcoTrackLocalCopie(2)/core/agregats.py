@@ -0,0 +1,64 @@
+# core/agregats.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .models import Depense, AgregatDepenseJour, JourModifie
+
+# Nombre de jours recalculés par requête (limite la taille des clauses IN)
+TAILLE_LOT_JOURS = 500
+
+
+def marquer_jours(jours):
+    """Inscrit au journal les jours de dépenses à ré-agréger ({(enqueteur_id, date_depense)})"""
+    JourModifie.objects.bulk_create(
+        [JourModifie(enqueteur_id=enqueteur_id, date_depense=jour) for enqueteur_id, jour in jours],
+        ignore_conflicts=True,
+    )
+
+
+def _recalculer_jours(enqueteur_id, jours):
+    """Remplace les agrégats des jours donnés par ceux recalculés depuis les dépenses brutes"""
+    AgregatDepenseJour.objects.filter(enqueteur_id=enqueteur_id, date_depense__in=jours).delete()
+    lignes = Depense.objects.filter(
+        enqueteur_id=enqueteur_id,
+        date_depense__in=jours,
+    ).values('quartier', 'categorie', 'date_depense').annotate(
+        nombre=Count('id'),
+        total=Sum('montant'),
+        minimum=Min('montant'),
+        maximum=Max('montant'),
+    ).order_by()
+    AgregatDepenseJour.objects.bulk_create(
+        [AgregatDepenseJour(enqueteur_id=enqueteur_id, **ligne) for ligne in lignes],
+        batch_size=500,
+    )
+
+
+def rafraichir_agregats(enqueteur=None):
+    """Recalcule les agrégats des seuls jours modifiés depuis le dernier rafraîchissement
+    
+    Renvoie le nombre de jours recalculés (0 si le journal est vide : une seule requête).
+    """
+    marques = JourModifie.objects.all()
+    if enqueteur is not None:
+        marques = marques.filter(enqueteur=enqueteur)
+    marques = list(marques.values_list('pk', 'enqueteur_id', 'date_depense'))
+    if not marques:
+        return 0
+    
+    jours_par_enqueteur = defaultdict(set)
+    for _, enqueteur_id, jour in marques:
+        jours_par_enqueteur[enqueteur_id].add(jour)
+    
+    with transaction.atomic():
+        # Les marques sont retirées avant le calcul : une écriture concurrente
+        # en inscrit une nouvelle, traitée au prochain rafraîchissement
+        JourModifie.objects.filter(pk__in=[pk for pk, _, _ in marques]).delete()
+        for enqueteur_id, jours in jours_par_enqueteur.items():
+            jours = sorted(jours)
+            for debut in range(0, len(jours), TAILLE_LOT_JOURS):
+                _recalculer_jours(enqueteur_id, jours[debut:debut + TAILLE_LOT_JOURS])
+    
+    return len(marques)
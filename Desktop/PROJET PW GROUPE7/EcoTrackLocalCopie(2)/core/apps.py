@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'
\ No newline at end of file
+    name = 'core'
+    
+    def ready(self):
+        # Maintien des résumés par enquêteur (ResumeEnqueteur)
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,189 @@
+# core/benchmark.py
+import platform
+import random
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Enqueteur, Etudiant, Depense
+from .forms import QUARTIERS_YAOUNDE
+from .detecteur_anomalies import DetecteurAnomalies, LIMITES_MONTANT
+
+SYLLABES = ['ba', 'be', 'bi', 'ko', 'ka', 'ma', 'me', 'mo', 'na', 'ne', 'ngo', 'nga', 'ta', 'te', 'to', 'ze', 'zo', 'fo', 'lo', 'lu']
+PRENOMS = ['Marie', 'Paul', 'Jean', 'Aline', 'Brice', 'Carine', 'Didier', 'Estelle', 'Franck', 'Grace', 'Hervé', 'Inès']
+QUARTIERS = [valeur for valeur, _ in QUARTIERS_YAOUNDE if valeur and valeur != 'Autre']
+NIVEAUX_AGES = {'L1': (18, 22), 'L2': (19, 23), 'L3': (20, 24), 'M1': (22, 26), 'M2': (23, 28), 'D': (25, 35)}
+
+
+def _nom_unique(index):
+    """Nom prononçable et unique dérivé d'un entier (évite les doublons involontaires)"""
+    # Permutation de l'index : deux index voisins ne donnent pas des noms voisins
+    index = (index * 2654435761) % (len(SYLLABES) ** 6)
+    syllabes = []
+    for _ in range(6):
+        index, reste = divmod(index, len(SYLLABES))
+        syllabes.append(SYLLABES[reste])
+    return ''.join(syllabes).capitalize()
+
+
+def _faute_de_frappe(nom, aleatoire):
+    """Supprime une lettre du nom (quasi-doublon)"""
+    position = aleatoire.randrange(1, len(nom))
+    return nom[:position] + nom[position + 1:]
+
+
+def generer_donnees(enqueteur, nb_etudiants, depenses_par_etudiant=1, taux_doublons=0.05, taux_aberrants=0.02, graine=42):
+    """Insère des données synthétiques avec des taux contrôlés de doublons et de montants aberrants"""
+    aleatoire = random.Random(graine)
+    prefixe = f"B{enqueteur.pk}_"
+    maintenant = timezone.now()
+    
+    etudiants = []
+    for i in range(nb_etudiants):
+        if i and aleatoire.random() < taux_doublons:
+            # Nouvelle saisie d'un étudiant existant : nom identique ou avec une faute de frappe
+            modele = etudiants[aleatoire.randrange(len(etudiants))]
+            nom = modele.nom if aleatoire.random() < 0.5 else _faute_de_frappe(modele.nom, aleatoire)
+        else:
+            nom = f"{_nom_unique(i)} {aleatoire.choice(PRENOMS)}"
+        
+        niveau = aleatoire.choice(list(NIVEAUX_AGES))
+        etudiant = Etudiant(
+            code_enquete=f"{prefixe}{i}",
+            enqueteur=enqueteur,
+            nom=nom,
+            age=aleatoire.randint(*NIVEAUX_AGES[niveau]),
+            sexe=aleatoire.choice('MF'),
+            niveau=niveau,
+            universite=aleatoire.choice(['Université de Yaoundé I', 'Université de Yaoundé II', 'ISSEA', 'ENSP']),
+            quartier=aleatoire.choice(QUARTIERS),
+            gps_lat=3.80 + aleatoire.random() * 0.15,
+            gps_lng=11.45 + aleatoire.random() * 0.10,
+        )
+        # bulk_create ne passe pas par save() : les clés sont calculées ici
+        etudiant.mettre_a_jour_cles()
+        etudiants.append(etudiant)
+    
+    etudiants = Etudiant.objects.bulk_create(etudiants, batch_size=5000)
+    
+    depenses = []
+    for etudiant in etudiants:
+        for _ in range(depenses_par_etudiant):
+            categorie = aleatoire.choice(list(LIMITES_MONTANT))
+            limites = LIMITES_MONTANT[categorie]
+            montant = aleatoire.uniform(max(limites['min'], 500), limites['max'])
+            if aleatoire.random() < taux_aberrants:
+                montant *= aleatoire.uniform(10, 20)
+            depenses.append(Depense(
+                etudiant=etudiant,
+                enqueteur=enqueteur,
+                categorie=categorie,
+                montant=round(montant, -1),
+                quartier=etudiant.quartier,
+                date_depense=(maintenant - timedelta(days=aleatoire.randrange(90))).date(),
+            ))
+    
+    Depense.objects.bulk_create(depenses, batch_size=5000)
+    return len(etudiants), len(depenses)
+
+
+def mesurer(fonction):
+    """Exécute une fonction et renvoie (résultat, durée en secondes, nombre de requêtes SQL)"""
+    with CaptureQueriesContext(connection) as requetes:
+        debut = time.perf_counter()
+        resultat = fonction()
+        duree = time.perf_counter() - debut
+    return resultat, duree, len(requetes.captured_queries)
+
+
+def methodes_detection():
+    """Noms des méthodes detecter_* de DetecteurAnomalies (hors agrégat detecter_toutes_anomalies)"""
+    return sorted(
+        nom for nom in dir(DetecteurAnomalies)
+        if nom.startswith('detecter_') and nom != 'detecter_toutes_anomalies'
+    )
+
+
+def executer_benchmark(tailles, depenses_par_etudiant=1, taux_doublons=0.05, taux_aberrants=0.02, graine=42,
+                       lot_incremental=50, rapporter=None):
+    """Mesure chaque détecteur et creer_anomalies_bd pour chaque taille de jeu de données
+    
+    creer_anomalies_bd est mesuré en analyse complète, puis en mode incrémental
+    après la modification de `lot_incremental` dépenses (coût attendu : celui du lot).
+    
+    Les données sont créées dans une transaction annulée à la fin de chaque taille :
+    la base n'est pas modifiée. Renvoie un rapport sérialisable en JSON.
+    """
+    rapport = {
+        'date': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base_de_donnees': connection.vendor,
+        'parametres': {
+            'depenses_par_etudiant': depenses_par_etudiant,
+            'taux_doublons': taux_doublons,
+            'taux_aberrants': taux_aberrants,
+            'graine': graine,
+            'lot_incremental': lot_incremental,
+        },
+        'resultats': [],
+    }
+    
+    for taille in tailles:
+        with transaction.atomic():
+            utilisateur = User.objects.create(username=f"benchmark_{taille}_{int(time.time())}")
+            enqueteur = Enqueteur.objects.create(user=utilisateur, matricule=f"BENCH{utilisateur.pk}", telephone='-')
+            
+            (nb_etudiants, nb_depenses), duree_generation, _ = mesurer(lambda: generer_donnees(
+                enqueteur, taille, depenses_par_etudiant, taux_doublons, taux_aberrants, graine
+            ))
+            resultat = {
+                'nb_etudiants': nb_etudiants,
+                'nb_depenses': nb_depenses,
+                'generation_s': round(duree_generation, 4),
+                'mesures': {},
+            }
+            
+            for nom in methodes_detection():
+                anomalies, duree, nb_requetes = mesurer(getattr(DetecteurAnomalies(enqueteur), nom))
+                resultat['mesures'][nom] = {
+                    'duree_s': round(duree, 4),
+                    'requetes': nb_requetes,
+                    'anomalies': len(anomalies),
+                }
+                if rapporter:
+                    rapporter(taille, nom, resultat['mesures'][nom])
+            
+            nouvelles, duree, nb_requetes = mesurer(DetecteurAnomalies(enqueteur).creer_anomalies_bd)
+            resultat['mesures']['creer_anomalies_bd'] = {
+                'duree_s': round(duree, 4),
+                'requetes': nb_requetes,
+                'anomalies': len(nouvelles),
+            }
+            if rapporter:
+                rapporter(taille, 'creer_anomalies_bd', resultat['mesures']['creer_anomalies_bd'])
+            
+            # Un lot de dépenses modifiées après l'analyse complète
+            lot = list(Depense.objects.filter(enqueteur=enqueteur).values_list('id', flat=True)[:lot_incremental])
+            Depense.objects.filter(pk__in=lot).update(date_modification=timezone.now())
+            nouvelles, duree, nb_requetes = mesurer(
+                lambda: DetecteurAnomalies(enqueteur).creer_anomalies_bd(incremental=True)
+            )
+            resultat['mesures']['creer_anomalies_bd_incremental'] = {
+                'duree_s': round(duree, 4),
+                'requetes': nb_requetes,
+                'anomalies': len(nouvelles),
+                'lot': len(lot),
+            }
+            if rapporter:
+                rapporter(taille, 'creer_anomalies_bd_incremental', resultat['mesures']['creer_anomalies_bd_incremental'])
+            
+            rapport['resultats'].append(resultat)
+            transaction.set_rollback(True)
+    
+    return rapport
@@ -0,0 +1,59 @@
+# core/cache_stats.py
+import threading
+import time
+from collections import OrderedDict
+
+from .models import ResumeEnqueteur
+
+
+class CacheVersionne:
+    """Cache LRU en mémoire avec durée de vie
+    
+    Les clés contiennent la version des données de l'enquêteur : après une écriture,
+    les anciennes entrées ne sont plus jamais lues et finissent évincées.
+    """
+    
+    def __init__(self, taille_max=512, duree_vie=300):
+        self.taille_max = taille_max
+        self.duree_vie = duree_vie
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+    
+    def obtenir(self, cle, calculer):
+        """Valeur en cache pour `cle`, ou calculée (puis mémorisée) par `calculer()`"""
+        maintenant = time.monotonic()
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                expiration, valeur = entree
+                if expiration > maintenant:
+                    self._entrees.move_to_end(cle)
+                    return valeur
+                del self._entrees[cle]
+        
+        valeur = calculer()
+        
+        with self._verrou:
+            self._entrees[cle] = (maintenant + self.duree_vie, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+        return valeur
+    
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+cache_statistiques = CacheVersionne()
+
+
+def version_donnees(enqueteur):
+    """Version courante des données de l'enquêteur (avancée par les signaux à chaque écriture)"""
+    return ResumeEnqueteur.pour(enqueteur).version
+
+
+def en_cache(nom, enqueteur, calculer, *parametres):
+    """Résultat de `calculer()` mis en cache pour cet enquêteur, cette version de ses données et ces paramètres"""
+    cle = (nom, enqueteur.pk, version_donnees(enqueteur), parametres)
+    return cache_statistiques.obtenir(cle, calculer)
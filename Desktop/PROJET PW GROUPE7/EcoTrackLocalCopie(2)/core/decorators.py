@@ -2,6 +2,8 @@
 from functools import wraps
 from django.shortcuts import redirect
 from django.conf import settings
+from django.utils import timezone
+from django.views.decorators.http import condition
 
 def login_required_custom(view_func):
     """
@@ -15,4 +17,30 @@ def login_required_custom(view_func):
         # Rediriger vers la page de login
         from django.contrib.auth.views import redirect_to_login
         return redirect_to_login(request.get_full_path())
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def _version_donnees(request):
+    """Version et date de mise à jour des données de l'enquêteur connecté (lues une fois par requête)"""
+    if not hasattr(request, '_version_donnees'):
+        from .models import ResumeEnqueteur
+        request._version_donnees = ResumeEnqueteur.objects.filter(
+            enqueteur__user=request.user
+        ).values('enqueteur_id', 'version', 'date_mise_a_jour').first()
+    return request._version_donnees
+
+
+def _etag_donnees(request, *args, **kwargs):
+    donnees = _version_donnees(request)
+    if donnees is None:
+        return None
+    # La date du jour invalide aussi les réponses relatives à « aujourd'hui » (évolution)
+    return f"{donnees['enqueteur_id']}-{donnees['version']}-{timezone.localdate():%Y%m%d}"
+
+
+def _derniere_modification(request, *args, **kwargs):
+    donnees = _version_donnees(request)
+    return donnees['date_mise_a_jour'] if donnees else None
+
+
+# GET conditionnel (ETag / Last-Modified) : 304 sans recalcul si les données n'ont pas changé
+donnees_conditionnelles = condition(etag_func=_etag_donnees, last_modified_func=_derniere_modification)
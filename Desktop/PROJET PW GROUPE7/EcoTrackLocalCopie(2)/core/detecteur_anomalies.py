@@ -1,124 +1,346 @@
 # core/detecteur_anomalies.py
+import hashlib
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+from operator import attrgetter
+
+import pandas as pd
+from django.db import transaction
 from django.utils import timezone
-from .models import Etudiant, Depense, Anomalie, Enqueteur
-from django.db.models import Avg
+from .models import Etudiant, Depense, Anomalie, Enqueteur, ResumeEnqueteur, BorneMontant
+from .moteur_statistique import (
+    bornes_des_groupes, bornes_par_groupe, bornes_robustes, charger_montants, detecter_valeurs_aberrantes,
+)
+from .regles import REGLES
+from .doublons import quasi_doublons
+from .normalisation import normaliser_texte
+from .flux import signaler_modification
+from django.db.models import Count, Exists, OuterRef, Q
+
+# Limites par défaut (FCFA), utilisées quand une catégorie n'a pas assez de données
+LIMITES_MONTANT = {
+    'LOGEMENT': {'min': 5000, 'max': 50000},
+    'NOURRITURE': {'min': 2000, 'max': 30000},
+    'TRANSPORT': {'min': 1000, 'max': 20000},
+    'SANTE': {'min': 1000, 'max': 100000},
+    'COMMUNICATION': {'min': 500, 'max': 20000},
+    'FORMATION': {'min': 1000, 'max': 50000},
+    'DIVERTISSEMENT': {'min': 500, 'max': 20000},
+    'HABILLEMENT': {'min': 1000, 'max': 30000},
+    'AUTRE': {'min': 0, 'max': 50000},
+}
+
+# Au-delà, les bornes enregistrées ne servent plus de référence : la détection incrémentale les recalcule
+DUREE_VALIDITE_BORNES = timedelta(hours=24)
+
+def calculer_empreinte(type_anomalie, regle, etudiant_id=None, depense_id=None, cle=''):
+    """Empreinte stable d'une anomalie : type, objet ciblé et règle déclenchée"""
+    brut = f"{type_anomalie}|{regle}|{etudiant_id or ''}|{depense_id or ''}|{cle}"
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()
+
 
 class DetecteurAnomalies:
     """Classe pour détecter automatiquement les anomalies dans les données"""
     
-    def __init__(self, enqueteur):
+    def __init__(self, enqueteur, depuis=None, par_quartier=False, methode='mad'):
         self.enqueteur = enqueteur
+        # Si renseigné, seules les lignes créées ou modifiées depuis cette date sont analysées
+        self.depuis = depuis
+        # Bornes des montants calculées par catégorie, ou par catégorie et quartier
+        self.par_quartier = par_quartier
+        # Bornes des montants : 'mad' (médiane ± MAD) ou 'iqr' (Tukey)
+        self.methode = methode
+        # Durée (secondes) de chaque détecteur et de chaque règle lors de la dernière analyse
+        self.durees = {}
+    
+    def _etudiants(self):
+        """Étudiants à analyser (tous, ou seulement ceux modifiés depuis la dernière détection)"""
+        etudiants = Etudiant.objects.filter(enqueteur=self.enqueteur)
+        if self.depuis:
+            etudiants = etudiants.filter(date_modification__gte=self.depuis)
+        return etudiants
+    
+    def _depenses(self):
+        """Dépenses à analyser (toutes, ou seulement celles modifiées depuis la dernière détection)"""
+        depenses = Depense.objects.filter(enqueteur=self.enqueteur)
+        if self.depuis:
+            depenses = depenses.filter(date_modification__gte=self.depuis)
+        return depenses
     
     def detecter_toutes_anomalies(self):
         """Détecte tous les types d'anomalies"""
         anomalies = []
+        self.durees = {}
         
-        anomalies.extend(self.detecter_doublons_etudiants())
-        anomalies.extend(self.detecter_depenses_hors_norme())
-        anomalies.extend(self.detecter_incoherences_age())
-        anomalies.extend(self.detecter_donnees_manquantes())
+        for detecteur in (
+            self.detecter_doublons_etudiants,
+            self.detecter_quasi_doublons,
+            self.detecter_doublons_inter_enqueteurs,
+            self.detecter_depenses_hors_norme,
+            self.detecter_regles,
+            self.detecter_donnees_manquantes,
+        ):
+            debut = time.perf_counter()
+            anomalies.extend(detecteur())
+            self.durees[detecteur.__name__] = time.perf_counter() - debut
         
         return anomalies
     
+    def groupes_doublons(self):
+        """Regroupe les étudiants partageant le même nom normalisé (une seule requête)"""
+        noms_en_double = Etudiant.objects.filter(enqueteur=self.enqueteur)\
+            .exclude(nom_normalise='')\
+            .values('nom_normalise')\
+            .annotate(nb=Count('id'))\
+            .filter(nb__gt=1)\
+            .values('nom_normalise')
+        
+        if self.depuis:
+            # Les groupes restent complets, mais on ne garde que ceux touchés par un étudiant modifié
+            noms_en_double = noms_en_double.filter(nom_normalise__in=self._etudiants().values('nom_normalise'))
+        
+        membres = Etudiant.objects.filter(
+            enqueteur=self.enqueteur,
+            nom_normalise__in=noms_en_double
+        ).order_by('nom_normalise', 'id')
+        
+        return [list(groupe) for _, groupe in groupby(membres, key=attrgetter('nom_normalise'))]
+    
     def detecter_doublons_etudiants(self):
         """Détecte les étudiants en doublon"""
         anomalies = []
         
+        for groupe in self.groupes_doublons():
+            for etudiant in groupe:
+                anomalies.append({
+                    'etudiant': etudiant,
+                    'doublons': [autre for autre in groupe if autre.id != etudiant.id],
+                    'type': 'DOUBLON',
+                    'regle': 'doublon_nom',
+                    'gravite': 'MOYENNE',
+                    'description': f"Étudiant potentiellement en doublon : {etudiant.nom}",
+                    'solution': "Vérifier si c'est le même étudiant ou supprimer le doublon"
+                })
+        
+        return anomalies
+    
+    def fiches_quasi_doublons(self):
+        """Fiches à bloquer, et ids dont les paires sont à évaluer (None : toutes)
+        
+        En mode incrémental, seuls les étudiants modifiés et les autres membres
+        de leurs blocs (même clé phonétique, ou même quartier et même âge) sont chargés.
+        """
+        champs = ('id', 'nom_normalise', 'quartier', 'age', 'cle_phonetique')
         etudiants = Etudiant.objects.filter(enqueteur=self.enqueteur)
+        if not self.depuis:
+            return list(etudiants.values(*champs)), None
+        
+        modifies = list(self._etudiants().exclude(nom_normalise='').values(*champs))
+        if not modifies:
+            return [], set()
+        
+        # Des mots identiques donnent les mêmes codes : la clé phonétique couvre aussi le blocage par mots triés
+        condition = Q(cle_phonetique__in={fiche['cle_phonetique'] for fiche in modifies})
+        
+        # Le blocage compare les quartiers normalisés : on retrouve leurs graphies en base
+        graphies = defaultdict(set)
+        for quartier in etudiants.exclude(quartier='').values_list('quartier', flat=True).distinct():
+            graphies[normaliser_texte(quartier)].add(quartier)
+        for fiche in modifies:
+            if fiche['quartier'] and fiche['age']:
+                condition |= Q(age=fiche['age'], quartier__in=graphies[normaliser_texte(fiche['quartier'])])
+        
+        ids_a_verifier = {fiche['id'] for fiche in modifies}
+        autres = etudiants.filter(condition).exclude(id__in=ids_a_verifier).values(*champs)
+        return modifies + list(autres), ids_a_verifier
+    
+    def detecter_quasi_doublons(self, seuil=0.85):
+        """Détecte les noms très proches (fautes de frappe) par blocage puis score de similarité"""
+        anomalies = []
+        
+        fiches, ids_a_verifier = self.fiches_quasi_doublons()
+        
+        paires = quasi_doublons(fiches, seuil=seuil, ids_a_verifier=ids_a_verifier)
+        etudiants = Etudiant.objects.in_bulk({id_ for paire in paires for id_ in paire[:2]})
+        
+        for id_a, id_b, score in paires:
+            # L'anomalie est portée par la fiche la plus récente (probable nouvelle saisie)
+            ancien, recent = etudiants[id_a], etudiants[id_b]
+            anomalies.append({
+                'etudiant': recent,
+                'doublons': [ancien],
+                'cle': str(ancien.id),
+                'type': 'DOUBLON',
+                'regle': 'quasi_doublon',
+                'gravite': 'FAIBLE',
+                'description': f"Nom très proche d'un autre étudiant : {recent.nom} / {ancien.nom} ({ancien.code_enquete})",
+                'solution': "Vérifier s'il s'agit du même étudiant enquêté deux fois"
+            })
+        
+        return anomalies
+    
+    def detecter_doublons_inter_enqueteurs(self):
+        """Détecte les étudiants déjà enquêtés par un autre enquêteur (index global cle_identite)"""
+        anomalies = []
+        
+        # Sous-requête corrélée : une recherche dans l'index cle_identite par étudiant analysé,
+        # au lieu d'une lecture des fiches de tous les enquêteurs
+        meme_identite_ailleurs = Etudiant.objects.filter(cle_identite=OuterRef('cle_identite'))\
+                                                 .exclude(enqueteur=self.enqueteur)
+        etudiants = list(self._etudiants().exclude(cle_identite='').filter(Exists(meme_identite_ailleurs)))
+        if not etudiants:
+            return anomalies
+        
+        correspondances = {}
+        autres = Etudiant.objects.filter(cle_identite__in={e.cle_identite for e in etudiants})\
+                                 .exclude(enqueteur=self.enqueteur)\
+                                 .select_related('enqueteur__user')
+        for autre in autres:
+            correspondances.setdefault(autre.cle_identite, []).append(autre)
         
         for etudiant in etudiants:
-            doublons = Etudiant.objects.filter(
-                enqueteur=self.enqueteur,
-                nom__iexact=etudiant.nom
-            ).exclude(id=etudiant.id)
-            
-            if doublons.exists():
+            for autre in correspondances.get(etudiant.cle_identite, []):
                 anomalies.append({
                     'etudiant': etudiant,
+                    'doublons': [autre],
+                    'cle': str(autre.id),
                     'type': 'DOUBLON',
+                    'regle': 'doublon_inter_enqueteurs',
                     'gravite': 'MOYENNE',
-                    'description': f"Étudiant potentiellement en doublon : {etudiant.nom}",
-                    'solution': "Vérifier si c'est le même étudiant ou supprimer le doublon"
+                    'description': f"Étudiant déjà enquêté par {autre.enqueteur.user.username} : {etudiant.nom} ({autre.code_enquete})",
+                    'solution': "Se coordonner avec l'autre enquêteur et conserver une seule fiche"
                 })
         
         return anomalies
     
+    def _bornes_enregistrees(self, par):
+        """Bornes par groupe de la dernière détection complète (None si absentes ou trop anciennes)"""
+        lignes = list(
+            BorneMontant.objects.filter(enqueteur=self.enqueteur, methode=self.methode, par_quartier=self.par_quartier)
+                                .values('categorie', 'quartier', 'borne_min', 'borne_max', 'date_calcul')
+        )
+        if not lignes or min(ligne['date_calcul'] for ligne in lignes) < timezone.now() - DUREE_VALIDITE_BORNES:
+            return None
+        groupes = pd.DataFrame.from_records(lignes, columns=['categorie', 'quartier', 'borne_min', 'borne_max'])
+        # Borne vide : pas de limite de ce côté
+        groupes['borne_min'] = groupes['borne_min'].astype('float64').fillna(-math.inf)
+        groupes['borne_max'] = groupes['borne_max'].astype('float64').fillna(math.inf)
+        return groupes[[*par, 'borne_min', 'borne_max']]
+    
+    def _enregistrer_bornes(self, groupes):
+        """Remplace les bornes enregistrées de l'enquêteur (pour la méthode et le regroupement courants)"""
+        date_calcul = timezone.now()
+        bornes = [
+            BorneMontant(
+                enqueteur=self.enqueteur,
+                methode=self.methode,
+                par_quartier=self.par_quartier,
+                categorie=ligne['categorie'],
+                quartier=ligne.get('quartier') or '',
+                borne_min=ligne['borne_min'] if math.isfinite(ligne['borne_min']) else None,
+                borne_max=ligne['borne_max'] if math.isfinite(ligne['borne_max']) else None,
+                date_calcul=date_calcul,
+            )
+            for ligne in groupes.to_dict('records')
+        ]
+        with transaction.atomic():
+            BorneMontant.objects.filter(
+                enqueteur=self.enqueteur, methode=self.methode, par_quartier=self.par_quartier
+            ).delete()
+            # Une détection concurrente a pu enregistrer les mêmes groupes entre-temps
+            BorneMontant.objects.bulk_create(bornes, batch_size=500, ignore_conflicts=True)
+    
     def detecter_depenses_hors_norme(self):
-        """Détecte les dépenses avec des montants anormaux"""
+        """Détecte les dépenses avec des montants anormaux
+        
+        Les bornes sont calculées sur les données (médiane ± 3,5 MAD, ou Tukey avec
+        methode='iqr') pour chaque catégorie, ou chaque catégorie et quartier, en une
+        passe vectorisée sur toutes les dépenses de l'enquêteur, puis enregistrées.
+        En mode incrémental, seules les dépenses modifiées sont chargées et comparées
+        aux bornes enregistrées (recalculées si elles datent de plus de DUREE_VALIDITE_BORNES).
+        """
         anomalies = []
+        par = ('categorie', 'quartier') if self.par_quartier else ('categorie',)
+        champs = ('id', *par, 'montant', 'date_modification')
         
-        limites = {
-            'LOGEMENT': {'min': 5000, 'max': 50000},
-            'NOURRITURE': {'min': 2000, 'max': 30000},
-            'TRANSPORT': {'min': 1000, 'max': 20000},
-            'SANTE': {'min': 1000, 'max': 100000},
-            'EDUCATION': {'min': 1000, 'max': 50000},
-            'COMMUNICATION': {'min': 500, 'max': 20000},
-            'HABILLEMENT': {'min': 1000, 'max': 30000},
-            'LOISIRS': {'min': 500, 'max': 20000},
-            'AUTRES': {'min': 0, 'max': 50000},
-        }
+        groupes = self._bornes_enregistrees(par) if self.depuis else None
+        if groupes is not None:
+            # Coût proportionnel au lot modifié, pas à l'ensemble des dépenses
+            montants = charger_montants(self._depenses(), champs=champs)
+            if montants.empty:
+                return anomalies
+            aberrantes = detecter_valeurs_aberrantes(
+                montants, bornes=bornes_des_groupes(montants, groupes, par, LIMITES_MONTANT)
+            )
+        else:
+            montants = charger_montants(Depense.objects.filter(enqueteur=self.enqueteur), champs=champs)
+            if montants.empty:
+                self._enregistrer_bornes(pd.DataFrame(columns=[*par, 'borne_min', 'borne_max']))
+                return anomalies
+            bornes = bornes_robustes(montants, par=par, methode=self.methode, limites_defaut=LIMITES_MONTANT)
+            self._enregistrer_bornes(bornes_par_groupe(montants, bornes, par))
+            aberrantes = detecter_valeurs_aberrantes(montants, bornes=bornes)
+            
+            if self.depuis and not aberrantes.empty:
+                # Les bornes portent sur toutes les données, mais on ne signale que les lignes modifiées
+                aberrantes = aberrantes[aberrantes['date_modification'] >= self.depuis]
         
-        depenses = Depense.objects.filter(enqueteur=self.enqueteur)
+        # Seules les dépenses signalées sont chargées comme objets
+        depenses = Depense.objects.in_bulk(aberrantes['id'].tolist())
         
-        for depense in depenses:
-            limites_cat = limites.get(depense.categorie, {'min': 0, 'max': 100000})
+        for ligne in aberrantes.itertuples():
+            depense = depenses[ligne.id]
             
-            if depense.montant < limites_cat['min']:
+            if ligne.sens == 'bas':
                 anomalies.append({
                     'depense': depense,
                     'type': 'HORS_NORME',
+                    'regle': 'montant_min',
                     'gravite': 'FAIBLE',
                     'description': f"Dépense très faible en {depense.get_categorie_display()}: {depense.montant} FCFA",
-                    'solution': f"Vérifier le montant. Minimum attendu: {limites_cat['min']} FCFA"
+                    'solution': f"Vérifier le montant. Minimum attendu: {ligne.borne_min:.0f} FCFA"
                 })
-            
-            if depense.montant > limites_cat['max']:
+            else:
                 anomalies.append({
                     'depense': depense,
                     'type': 'HORS_NORME',
+                    'regle': 'montant_max',
                     'gravite': 'ELEVEE',
                     'description': f"Dépense très élevée en {depense.get_categorie_display()}: {depense.montant} FCFA",
-                    'solution': f"Vérifier le montant. Maximum attendu: {limites_cat['max']} FCFA"
+                    'solution': f"Vérifier le montant. Maximum attendu: {ligne.borne_max:.0f} FCFA"
                 })
         
         return anomalies
     
-    def detecter_incoherences_age(self):
-        """Détecte les incohérences d'âge avec le niveau d'études"""
-        anomalies = []
+    def detecter_regles(self, regles=None):
+        """Applique les règles déclaratives (âge/niveau, zone GPS, montants...)
         
-        etudiants = Etudiant.objects.filter(enqueteur=self.enqueteur)
+        Chaque règle est traduite en filtre ORM : une requête par règle,
+        quelle que soit la taille des tables.
+        """
+        anomalies = []
+        querysets = {
+            Etudiant: self._etudiants,
+            Depense: self._depenses,
+        }
         
-        for etudiant in etudiants:
-            if etudiant.age and etudiant.niveau:
-                incoherent = False
-                message = ""
-                
-                if etudiant.niveau == 'LICENCE1' and (etudiant.age < 18 or etudiant.age > 25):
-                    incoherent = True
-                    message = f"Âge ({etudiant.age} ans) atypique pour Licence 1"
-                elif etudiant.niveau == 'LICENCE2' and (etudiant.age < 19 or etudiant.age > 26):
-                    incoherent = True
-                    message = f"Âge ({etudiant.age} ans) atypique pour Licence 2"
-                elif etudiant.niveau == 'LICENCE3' and (etudiant.age < 20 or etudiant.age > 27):
-                    incoherent = True
-                    message = f"Âge ({etudiant.age} ans) atypique pour Licence 3"
-                elif etudiant.niveau == 'MASTER1' and (etudiant.age < 21 or etudiant.age > 30):
-                    incoherent = True
-                    message = f"Âge ({etudiant.age} ans) atypique pour Master 1"
-                elif etudiant.niveau == 'MASTER2' and (etudiant.age < 22 or etudiant.age > 31):
-                    incoherent = True
-                    message = f"Âge ({etudiant.age} ans) atypique pour Master 2"
-                
-                if incoherent:
-                    anomalies.append({
-                        'etudiant': etudiant,
-                        'type': 'INCOHERENCE',
-                        'gravite': 'MOYENNE',
-                        'description': message,
-                        'solution': "Vérifier l'âge ou le niveau de l'étudiant"
-                    })
+        for regle in (REGLES if regles is None else regles):
+            cible = 'etudiant' if regle.modele is Etudiant else 'depense'
+            debut = time.perf_counter()
+            for objet in regle.evaluer(querysets[regle.modele]()):
+                anomalies.append({
+                    cible: objet,
+                    'type': regle.type_anomalie,
+                    'regle': regle.code,
+                    'gravite': regle.gravite,
+                    'description': regle.description(objet),
+                    'solution': regle.solution
+                })
+            cle = f"regle:{regle.code}"
+            self.durees[cle] = self.durees.get(cle, 0) + time.perf_counter() - debut
         
         return anomalies
     
@@ -127,30 +349,26 @@ class DetecteurAnomalies:
         anomalies = []
         
         # Étudiants sans dépenses
-        etudiants_sans_depenses = Etudiant.objects.filter(
-            enqueteur=self.enqueteur,
-            depenses__isnull=True
-        )
+        etudiants_sans_depenses = self._etudiants().filter(depenses__isnull=True)
         
         for etudiant in etudiants_sans_depenses:
             anomalies.append({
                 'etudiant': etudiant,
                 'type': 'MANQUANTE',
+                'regle': 'sans_depense',
                 'gravite': 'ELEVEE',
                 'description': f"Étudiant sans aucune dépense enregistrée: {etudiant.nom}",
                 'solution': "Ajouter au moins une dépense pour cet étudiant"
             })
         
         # Étudiants sans quartier
-        etudiants_sans_quartier = Etudiant.objects.filter(
-            enqueteur=self.enqueteur,
-            quartier__isnull=True
-        )
+        etudiants_sans_quartier = self._etudiants().filter(quartier__isnull=True)
         
         for etudiant in etudiants_sans_quartier:
             anomalies.append({
                 'etudiant': etudiant,
                 'type': 'MANQUANTE',
+                'regle': 'sans_quartier',
                 'gravite': 'FAIBLE',
                 'description': f"Étudiant sans quartier renseigné: {etudiant.nom}",
                 'solution': "Compléter le quartier de résidence"
@@ -158,29 +376,67 @@ class DetecteurAnomalies:
         
         return anomalies
     
-    def creer_anomalies_bd(self):
-        """Crée les anomalies détectées dans la base de données"""
+    def creer_anomalies_bd(self, incremental=False):
+        """Crée les anomalies détectées dans la base de données
+        
+        En mode incrémental, seules les données modifiées depuis la dernière
+        détection de l'enquêteur sont analysées.
+        """
+        debut = timezone.now()
+        if incremental and self.depuis is None:
+            self.depuis = self.enqueteur.derniere_detection
+        
         anomalies_detectees = self.detecter_toutes_anomalies()
         
+        # Une seule requête pour connaître les empreintes déjà enregistrées
+        empreintes_connues = set(
+            Anomalie.objects.filter(enqueteur=self.enqueteur)
+                            .exclude(empreinte='')
+                            .values_list('empreinte', flat=True)
+        )
+        
+        nouvelles = []
         for anomalie_data in anomalies_detectees:
-            existe = Anomalie.objects.filter(
+            etudiant = anomalie_data.get('etudiant')
+            depense = anomalie_data.get('depense')
+            empreinte = calculer_empreinte(
+                anomalie_data['type'],
+                anomalie_data.get('regle', ''),
+                etudiant_id=etudiant.id if etudiant else None,
+                depense_id=depense.id if depense else None,
+                cle=anomalie_data.get('cle', '')
+            )
+            
+            if empreinte in empreintes_connues:
+                continue
+            empreintes_connues.add(empreinte)
+            
+            nouvelles.append(Anomalie(
+                etudiant=etudiant,
+                depense=depense,
                 enqueteur=self.enqueteur,
+                type_anomalie=anomalie_data['type'],
+                gravite=anomalie_data['gravite'],
+                statut='A_TRAITER',
                 description=anomalie_data['description'],
-                statut='A_TRAITER'
-            ).exists()
-            
-            if not existe:
-                Anomalie.objects.create(
-                    etudiant=anomalie_data.get('etudiant'),
-                    depense=anomalie_data.get('depense'),
-                    enqueteur=self.enqueteur,
-                    type_anomalie=anomalie_data['type'],
-                    gravite=anomalie_data['gravite'],
-                    statut='A_TRAITER',
-                    description=anomalie_data['description'],
-                    solution=anomalie_data.get('solution', ''),
-                    date_detection=timezone.now()
-                )
+                solution=anomalie_data.get('solution', ''),
+                empreinte=empreinte
+            ))
+        
+        # Une détection concurrente (worker, commande de scan) a pu enregistrer les mêmes empreintes
+        # entre-temps : la contrainte d'unicité les écarte sans erreur
+        Anomalie.objects.bulk_create(nouvelles, batch_size=500, ignore_conflicts=True)
+        # bulk_create n'émet pas de signal : le résumé est mis à jour ici, par recomptage
+        # (le nombre de lignes réellement insérées n'est pas connu)
+        if nouvelles:
+            ResumeEnqueteur.recompter_anomalies(self.enqueteur.pk)
+            signaler_modification(self.enqueteur.pk)
+        
+        # Point de reprise pour la prochaine détection incrémentale
+        Enqueteur.objects.filter(pk=self.enqueteur.pk).update(derniere_detection=debut)
+        self.enqueteur.derniere_detection = debut
+        
+        return nouvelles
     
     @staticmethod
     def generer_anomalies_simulees(enqueteur, count=5):
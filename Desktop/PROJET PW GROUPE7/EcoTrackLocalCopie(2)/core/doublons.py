@@ -0,0 +1,82 @@
+# core/doublons.py
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from .normalisation import cle_phonetique, mots_tries, normaliser_texte
+
+# Au-delà de cette taille, un bloc est trop peu discriminant pour être comparé paire à paire
+TAILLE_MAX_BLOC = 50
+
+
+def cles_de_blocage(fiche):
+    """Clés de blocage d'une fiche étudiant (dict avec nom_normalise, quartier, age)
+    
+    Deux fiches ne sont comparées que si elles partagent au moins une clé.
+    """
+    cles = []
+    nom = fiche['nom_normalise']
+    if not nom:
+        return cles
+    
+    cles.append('phonetique:' + cle_phonetique(nom))
+    cles.append('mots:' + mots_tries(nom))
+    if fiche.get('quartier') and fiche.get('age'):
+        # Même quartier, même âge et mêmes initiales : rattrape les fautes qui changent le code phonétique
+        initiales = ''.join(sorted(mot[0] for mot in nom.split()))
+        cles.append(f"quartier_age:{normaliser_texte(fiche['quartier'])}:{fiche['age']}:{initiales}")
+    return cles
+
+
+def paires_candidates(fiches, taille_max_bloc=TAILLE_MAX_BLOC):
+    """Paires d'identifiants partageant une clé de blocage (sans comparaison de toutes les paires)"""
+    blocs = defaultdict(list)
+    for fiche in fiches:
+        for cle in cles_de_blocage(fiche):
+            blocs[cle].append(fiche['id'])
+    
+    paires = set()
+    for ids in blocs.values():
+        if len(ids) < 2 or len(ids) > taille_max_bloc:
+            continue
+        for i, premier in enumerate(ids):
+            for second in ids[i + 1:]:
+                paires.add((min(premier, second), max(premier, second)))
+    return paires
+
+
+def similarite(nom_a, nom_b):
+    """Similarité (0 à 1) entre deux noms normalisés, insensible à l'ordre des mots"""
+    return max(
+        SequenceMatcher(None, nom_a, nom_b).ratio(),
+        SequenceMatcher(None, mots_tries(nom_a), mots_tries(nom_b)).ratio(),
+    )
+
+
+def _peut_atteindre(nom_a, nom_b, seuil):
+    """Majorants bon marché de la similarité (longueurs, puis lettres communes), pour écarter vite une paire"""
+    if 2 * min(len(nom_a), len(nom_b)) < seuil * (len(nom_a) + len(nom_b)):
+        return False
+    return SequenceMatcher(None, nom_a, nom_b).quick_ratio() >= seuil
+
+
+def quasi_doublons(fiches, seuil=0.85, ids_a_verifier=None):
+    """Renvoie les paires (id_a, id_b, score) de noms proches mais non identiques
+    
+    Si `ids_a_verifier` est fourni, seules les paires contenant l'un de ces ids sont évaluées.
+    """
+    noms = {fiche['id']: fiche['nom_normalise'] for fiche in fiches}
+    resultats = []
+    
+    for id_a, id_b in paires_candidates(fiches):
+        if ids_a_verifier is not None and id_a not in ids_a_verifier and id_b not in ids_a_verifier:
+            continue
+        # Les noms identiques relèvent de la détection des doublons exacts
+        if noms[id_a] == noms[id_b]:
+            continue
+        if not _peut_atteindre(noms[id_a], noms[id_b], seuil):
+            continue
+        score = similarite(noms[id_a], noms[id_b])
+        if score >= seuil:
+            resultats.append((id_a, id_b, score))
+    
+    return sorted(resultats)
@@ -0,0 +1,128 @@
+# core/flux.py
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+# Secondes entre deux commentaires de maintien de connexion (sans accès à la base)
+INTERVALLE_PING = 30
+
+# Secondes entre deux relectures de la version quand aucune notification n'arrive
+# (écritures faites par un autre processus : worker de détection, autre serveur)
+INTERVALLE_VERIFICATION = 300
+
+
+class Abonnement:
+    """Connexion en attente de notifications pour un enquêteur (une par onglet ouvert)"""
+    
+    def __init__(self):
+        self.boucle = asyncio.get_running_loop()
+        self.evenement = asyncio.Event()
+    
+    def reveiller(self):
+        # Appelé depuis n'importe quel thread (signaux exécutés hors de la boucle)
+        self.boucle.call_soon_threadsafe(self.evenement.set)
+    
+    async def attendre(self, delai):
+        """Vrai si une notification est arrivée avant la fin du délai"""
+        try:
+            await asyncio.wait_for(self.evenement.wait(), delai)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.evenement.clear()
+
+
+class Diffuseur:
+    """Relais en mémoire : les écritures réveillent les connexions de l'enquêteur concerné"""
+    
+    def __init__(self):
+        self._abonnements = defaultdict(set)
+        self._verrou = threading.Lock()
+    
+    def abonner(self, enqueteur_id):
+        abonnement = Abonnement()
+        with self._verrou:
+            self._abonnements[enqueteur_id].add(abonnement)
+        return abonnement
+    
+    def desabonner(self, enqueteur_id, abonnement):
+        with self._verrou:
+            self._abonnements[enqueteur_id].discard(abonnement)
+            if not self._abonnements[enqueteur_id]:
+                del self._abonnements[enqueteur_id]
+    
+    def publier(self, enqueteur_id):
+        with self._verrou:
+            abonnements = list(self._abonnements.get(enqueteur_id, ()))
+        for abonnement in abonnements:
+            abonnement.reveiller()
+
+
+diffuseur = Diffuseur()
+
+
+def signaler_modification(enqueteur_id):
+    """Notifie les connexions ouvertes une fois la transaction validée"""
+    transaction.on_commit(lambda: diffuseur.publier(enqueteur_id))
+
+
+# Compteurs du résumé envoyés au navigateur
+CHAMPS_DIFFUSES = {
+    'nb_etudiants': 'etudiants',
+    'nb_depenses': 'depenses',
+    'nb_quartiers': 'quartiers',
+    'nb_anomalies_ouvertes': 'anomalies',
+}
+
+
+async def _lire_etat(enqueteur_id):
+    from .models import ResumeEnqueteur
+    
+    return await ResumeEnqueteur.objects.filter(enqueteur_id=enqueteur_id).values(
+        'version', *CHAMPS_DIFFUSES
+    ).afirst()
+
+
+def _message(etat, precedent=None):
+    """Événement SSE : compteurs actuels et variations depuis le dernier envoi"""
+    donnees = {nom: etat[champ] for champ, nom in CHAMPS_DIFFUSES.items()}
+    donnees['version'] = etat['version']
+    if precedent is not None:
+        donnees['variations'] = {
+            nom: etat[champ] - precedent[champ]
+            for champ, nom in CHAMPS_DIFFUSES.items()
+            if etat[champ] != precedent[champ]
+        }
+    return f"event: donnees\ndata: {json.dumps(donnees)}\n\n"
+
+
+async def evenements(enqueteur_id):
+    """Flux Server-Sent Events : un message à chaque nouvelle version des données"""
+    abonnement = diffuseur.abonner(enqueteur_id)
+    try:
+        etat = await _lire_etat(enqueteur_id)
+        if etat is not None:
+            yield _message(etat)
+        
+        boucle = asyncio.get_running_loop()
+        derniere_lecture = boucle.time()
+        while True:
+            notifie = await abonnement.attendre(INTERVALLE_PING)
+            # Sans notification, la base n'est relue qu'à chaque INTERVALLE_VERIFICATION :
+            # un onglet inactif ne coûte qu'un ping
+            if notifie or boucle.time() - derniere_lecture >= INTERVALLE_VERIFICATION:
+                derniere_lecture = boucle.time()
+                nouvel_etat = await _lire_etat(enqueteur_id)
+                if nouvel_etat is not None and (etat is None or nouvel_etat['version'] != etat['version']):
+                    yield _message(nouvel_etat, etat)
+                    etat = nouvel_etat
+                    continue
+            if not notifie:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ": ping\n\n"
+    finally:
+        diffuseur.desabonner(enqueteur_id, abonnement)
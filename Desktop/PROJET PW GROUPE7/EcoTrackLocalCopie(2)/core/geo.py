@@ -0,0 +1,119 @@
+# core/geo.py
+import math
+
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+# Côté d'une cellule de la grille, en degrés (≈ 1,1 km à Yaoundé)
+TAILLE_CELLULE = 0.01
+
+# Au-delà, la zone demandée est filtrée directement sur les coordonnées plutôt que par cellules
+CELLULES_MAX = 2500
+
+RAYON_TERRE_KM = 6371.0
+KM_PAR_DEGRE_LATITUDE = 111.32
+
+
+def cellule_gps(lat, lng):
+    """Cellule de la grille fixe contenant le point ('' sans coordonnées)"""
+    if lat is None or lng is None:
+        return ''
+    return f"{math.floor(lat / TAILLE_CELLULE)}:{math.floor(lng / TAILLE_CELLULE)}"
+
+
+def cellules_cadre(lat_min, lng_min, lat_max, lng_max):
+    """Cellules couvrant un rectangle, ou None si elles sont trop nombreuses"""
+    lignes = range(math.floor(lat_min / TAILLE_CELLULE), math.floor(lat_max / TAILLE_CELLULE) + 1)
+    colonnes = range(math.floor(lng_min / TAILLE_CELLULE), math.floor(lng_max / TAILLE_CELLULE) + 1)
+    if len(lignes) * len(colonnes) > CELLULES_MAX:
+        return None
+    return [f"{ligne}:{colonne}" for ligne in lignes for colonne in colonnes]
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Distance du grand cercle entre deux points (formule de haversine)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * RAYON_TERRE_KM * math.asin(math.sqrt(a))
+
+
+def cadre_autour(lat, lng, rayon_km):
+    """Rectangle (lat_min, lng_min, lat_max, lng_max) englobant le cercle de rayon donné"""
+    dlat = rayon_km / KM_PAR_DEGRE_LATITUDE
+    dlng = rayon_km / (KM_PAR_DEGRE_LATITUDE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def dans_cadre(etudiants, lat_min, lng_min, lat_max, lng_max):
+    """Étudiants situés dans le rectangle : recherche des cellules par index, puis filtre exact"""
+    cellules = cellules_cadre(lat_min, lng_min, lat_max, lng_max)
+    if cellules is not None:
+        etudiants = etudiants.filter(cellule_gps__in=cellules)
+    return etudiants.filter(
+        gps_lat__gte=lat_min, gps_lat__lte=lat_max,
+        gps_lng__gte=lng_min, gps_lng__lte=lng_max,
+    )
+
+
+def distance_km_sql(lat, lng):
+    """Distance de haversine au point, calculée par la base (même formule que distance_km)"""
+    phi = Radians(F('gps_lat'))
+    dphi = phi - Value(math.radians(lat))
+    dlambda = Radians(F('gps_lng')) - Value(math.radians(lng))
+    a = Power(Sin(dphi / 2), 2) + Value(math.cos(math.radians(lat))) * Cos(phi) * Power(Sin(dlambda / 2), 2)
+    return Value(2 * RAYON_TERRE_KM) * ASin(Sqrt(a, output_field=FloatField()))
+
+
+def dans_rayon(etudiants, lat, lng, rayon_km):
+    """Étudiants à moins de `rayon_km`, annotés de leur distance, du plus proche au plus lointain
+    
+    Le rectangle englobant passe par l'index des cellules ; le cercle et le tri sont
+    évalués par la base, qui peut donc appliquer directement une limite.
+    """
+    return dans_cadre(etudiants, *cadre_autour(lat, lng, rayon_km))\
+        .annotate(distance_km=distance_km_sql(lat, lng))\
+        .filter(distance_km__lte=rayon_km)\
+        .order_by('distance_km', 'id')
+
+
+RAYON_DEFAUT_KM = 1.0
+RAYON_MAX_KM = 25.0
+
+# Points renvoyés au plus par l'API cartographique
+RESULTATS_MAX = 2000
+
+
+def _coordonnee(valeur, nom, limite):
+    try:
+        nombre = float(valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"Paramètre {nom} invalide : {valeur!r}")
+    if not math.isfinite(nombre) or not -limite <= nombre <= limite:
+        raise ValueError(f"Paramètre {nom} hors limites : {valeur!r}")
+    return nombre
+
+
+def lire_zone(parametres):
+    """Zone demandée : ?lat=&lng=&rayon= (km) ou ?cadre=lat_min,lng_min,lat_max,lng_max"""
+    if parametres.get('cadre'):
+        valeurs = parametres['cadre'].split(',')
+        if len(valeurs) != 4:
+            raise ValueError("cadre attendu : lat_min,lng_min,lat_max,lng_max")
+        lat_min, lat_max = (_coordonnee(v, 'cadre', 90) for v in valeurs[0::2])
+        lng_min, lng_max = (_coordonnee(v, 'cadre', 180) for v in valeurs[1::2])
+        if lat_min > lat_max or lng_min > lng_max:
+            raise ValueError("cadre : les minimums doivent précéder les maximums")
+        return {'cadre': (lat_min, lng_min, lat_max, lng_max)}
+    
+    lat = _coordonnee(parametres.get('lat'), 'lat', 90)
+    lng = _coordonnee(parametres.get('lng'), 'lng', 180)
+    rayon = parametres.get('rayon') or RAYON_DEFAUT_KM
+    try:
+        rayon = float(rayon)
+    except (TypeError, ValueError):
+        raise ValueError(f"Paramètre rayon invalide : {rayon!r}")
+    if not 0 < rayon <= RAYON_MAX_KM:
+        raise ValueError(f"Le rayon doit être compris entre 0 et {RAYON_MAX_KM:g} km")
+    return {'centre': (lat, lng), 'rayon_km': rayon, 'cadre': cadre_autour(lat, lng, rayon)}
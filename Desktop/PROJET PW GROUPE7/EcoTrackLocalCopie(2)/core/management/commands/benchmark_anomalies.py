@@ -0,0 +1,58 @@
+# core/management/commands/benchmark_anomalies.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import executer_benchmark
+
+
+class Command(BaseCommand):
+    help = "Mesure les performances de DetecteurAnomalies sur des données synthétiques et produit un rapport JSON"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tailles', default='1000,10000,100000,1000000',
+            help="Nombres d'étudiants à générer, séparés par des virgules"
+        )
+        parser.add_argument('--depenses-par-etudiant', type=int, default=1)
+        parser.add_argument('--taux-doublons', type=float, default=0.05)
+        parser.add_argument('--taux-aberrants', type=float, default=0.02)
+        parser.add_argument('--graine', type=int, default=42)
+        parser.add_argument(
+            '--lot-incremental', type=int, default=50,
+            help="Dépenses modifiées avant la mesure de la détection incrémentale"
+        )
+        parser.add_argument(
+            '--sortie',
+            help="Fichier où écrire le rapport JSON (par défaut : sortie standard)"
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            tailles = [int(taille) for taille in options['tailles'].split(',') if taille.strip()]
+        except ValueError:
+            raise CommandError("--tailles doit être une liste d'entiers séparés par des virgules")
+        
+        def rapporter(taille, methode, mesure):
+            self.stderr.write(
+                f"{taille:>9} étudiants  {methode:<38} {mesure['duree_s']:9.3f} s  "
+                f"{mesure['requetes']:>4} requêtes  {mesure['anomalies']:>7} anomalies"
+            )
+        
+        rapport = executer_benchmark(
+            tailles,
+            depenses_par_etudiant=options['depenses_par_etudiant'],
+            taux_doublons=options['taux_doublons'],
+            taux_aberrants=options['taux_aberrants'],
+            graine=options['graine'],
+            lot_incremental=options['lot_incremental'],
+            rapporter=rapporter,
+        )
+        
+        contenu = json.dumps(rapport, indent=2, ensure_ascii=False)
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                fichier.write(contenu)
+            self.stdout.write(self.style.SUCCESS(f"Rapport écrit dans {options['sortie']}"))
+        else:
+            self.stdout.write(contenu)
@@ -0,0 +1,44 @@
+# core/management/commands/rafraichir_agregats.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.agregats import marquer_jours, rafraichir_agregats
+from core.models import Enqueteur, Depense, AgregatDepenseJour
+
+
+class Command(BaseCommand):
+    help = "Met à jour la table des dépenses agrégées par jour (seuls les jours modifiés sont recalculés)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueteur', metavar='MATRICULE',
+            help="Ne rafraîchir que les agrégats de cet enquêteur"
+        )
+        parser.add_argument(
+            '--complet', action='store_true',
+            help="Reconstruire tous les agrégats (tous les jours sont marqués comme modifiés)"
+        )
+    
+    def handle(self, *args, **options):
+        enqueteur = None
+        if options['enqueteur']:
+            try:
+                enqueteur = Enqueteur.objects.get(matricule=options['enqueteur'])
+            except Enqueteur.DoesNotExist:
+                raise CommandError(f"Enquêteur introuvable : {options['enqueteur']}")
+        
+        if options['complet']:
+            agregats = AgregatDepenseJour.objects.all()
+            if enqueteur is not None:
+                agregats = agregats.filter(enqueteur=enqueteur)
+            agregats.delete()
+            self._marquer_tout(enqueteur)
+        
+        nb_jours = rafraichir_agregats(enqueteur)
+        self.stdout.write(self.style.SUCCESS(f"{nb_jours} jour(s) recalculé(s)"))
+    
+    def _marquer_tout(self, enqueteur):
+        """Inscrit au journal tous les jours ayant des dépenses"""
+        depenses = Depense.objects.all()
+        if enqueteur is not None:
+            depenses = depenses.filter(enqueteur=enqueteur)
+        marquer_jours(depenses.values_list('enqueteur_id', 'date_depense').distinct())
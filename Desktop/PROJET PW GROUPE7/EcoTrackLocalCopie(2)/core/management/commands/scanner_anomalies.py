@@ -0,0 +1,105 @@
+# core/management/commands/scanner_anomalies.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _initialiser_processus():
+    """Prépare Django dans un processus du pool (chaque processus ouvre sa propre connexion)"""
+    django.setup()
+    connections.close_all()
+
+
+def scanner_enqueteur(enqueteur_id, incremental=False, par_quartier=False, methode='mad'):
+    """Détection complète pour un enquêteur ; exécutée dans un processus du pool"""
+    from core.models import Enqueteur, Etudiant, Depense
+    from core.detecteur_anomalies import DetecteurAnomalies
+    
+    enqueteur = Enqueteur.objects.select_related('user').get(pk=enqueteur_id)
+    debut = time.perf_counter()
+    
+    detecteur = DetecteurAnomalies(enqueteur, par_quartier=par_quartier, methode=methode)
+    nouvelles = detecteur.creer_anomalies_bd(incremental=incremental)
+    
+    return {
+        'enqueteur': str(enqueteur),
+        'lignes': Etudiant.objects.filter(enqueteur=enqueteur).count()
+                  + Depense.objects.filter(enqueteur=enqueteur).count(),
+        'anomalies': len(nouvelles),
+        'duree': time.perf_counter() - debut,
+        'durees': detecteur.durees,
+    }
+
+
+class Command(BaseCommand):
+    help = "Relance la détection des anomalies pour tous les enquêteurs, en parallèle (un processus par enquêteur)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processus', type=int, default=os.cpu_count(),
+            help="Nombre de processus de travail (par défaut : nombre de cœurs)"
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help="N'analyser que les données modifiées depuis la dernière détection"
+        )
+        parser.add_argument(
+            '--par-quartier', action='store_true',
+            help="Bornes des montants par catégorie et quartier (par défaut : par catégorie)"
+        )
+        parser.add_argument(
+            '--methode', choices=['mad', 'iqr'], default='mad',
+            help="Bornes des montants : médiane ± MAD (par défaut) ou écart interquartile (Tukey)"
+        )
+    
+    def handle(self, *args, **options):
+        from core.models import Enqueteur
+        
+        enqueteurs = list(Enqueteur.objects.values_list('id', flat=True))
+        if not enqueteurs:
+            self.stdout.write("Aucun enquêteur à analyser")
+            return
+        
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+        
+        debut = time.perf_counter()
+        total_lignes = 0
+        total_anomalies = 0
+        durees = {}
+        
+        with ProcessPoolExecutor(max_workers=options['processus'], initializer=_initialiser_processus) as pool:
+            resultats = pool.map(
+                scanner_enqueteur,
+                enqueteurs,
+                [options['incremental']] * len(enqueteurs),
+                [options['par_quartier']] * len(enqueteurs),
+                [options['methode']] * len(enqueteurs)
+            )
+            for resultat in resultats:
+                total_lignes += resultat['lignes']
+                total_anomalies += resultat['anomalies']
+                for nom, duree in resultat['durees'].items():
+                    durees[nom] = durees.get(nom, 0) + duree
+                
+                self.stdout.write(
+                    f"{resultat['enqueteur']} : {resultat['lignes']} lignes, "
+                    f"{resultat['anomalies']} nouvelle(s) anomalie(s) en {resultat['duree']:.2f} s"
+                )
+        
+        duree_totale = time.perf_counter() - debut
+        debit = total_lignes / duree_totale if duree_totale > 0 else 0
+        
+        self.stdout.write("")
+        self.stdout.write("Temps cumulé par détecteur / règle :")
+        for nom, duree in sorted(durees.items(), key=lambda item: item[1], reverse=True):
+            self.stdout.write(f"  {nom:<40} {duree:8.3f} s")
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(enqueteurs)} enquêteur(s), {total_lignes} lignes, {total_anomalies} nouvelle(s) anomalie(s) "
+            f"en {duree_totale:.2f} s ({debit:.0f} lignes/s)"
+        ))
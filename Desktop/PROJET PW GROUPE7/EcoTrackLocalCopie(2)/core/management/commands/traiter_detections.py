@@ -0,0 +1,48 @@
+# core/management/commands/traiter_detections.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.taches import DUREE_CONSERVATION_TACHES, planifier_detection_globale, traiter_taches
+
+
+class Command(BaseCommand):
+    help = "Exécute les détections d'anomalies en file d'attente (worker)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continu', action='store_true',
+            help="Ne pas s'arrêter quand la file est vide : attendre de nouvelles tâches"
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=5,
+            help="Secondes d'attente entre deux vérifications de la file (mode continu)"
+        )
+        parser.add_argument(
+            '--conservation-jours', type=float, default=DUREE_CONSERVATION_TACHES.days,
+            help="Jours de conservation des tâches terminées ou en échec avant leur suppression"
+        )
+        parser.add_argument(
+            '--planifier-tous', action='store_true',
+            help="Planifier d'abord une détection complète pour chaque enquêteur (tâche planifiée / cron)"
+        )
+    
+    def handle(self, *args, **options):
+        if options['planifier_tous']:
+            taches = planifier_detection_globale()
+            self.stdout.write(f"{len(taches)} détection(s) planifiée(s)")
+        
+        conservation = timedelta(days=options['conservation_jours'])
+        while True:
+            for tache in traiter_taches(conservation=conservation):
+                if tache.statut == 'TERMINEE':
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{tache.enqueteur} : {tache.nb_anomalies} nouvelle(s) anomalie(s)"
+                    ))
+                else:
+                    self.stderr.write(f"{tache.enqueteur} : échec ({tache.erreur})")
+            
+            if not options['continu']:
+                break
+            time.sleep(options['intervalle'])
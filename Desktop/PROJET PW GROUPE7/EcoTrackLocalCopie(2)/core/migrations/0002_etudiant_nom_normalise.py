@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:29
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normaliser_texte(texte):
+    """Copie figée de core.normalisation.normaliser_texte à la date de cette migration"""
+    if not texte:
+        return ''
+    texte = unicodedata.normalize('NFKD', texte)
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(texte.lower().split())
+
+
+def remplir_nom_normalise(apps, schema_editor):
+    Etudiant = apps.get_model('core', 'Etudiant')
+    etudiants = list(Etudiant.objects.only('id', 'nom'))
+    for etudiant in etudiants:
+        etudiant.nom_normalise = normaliser_texte(etudiant.nom)
+    Etudiant.objects.bulk_update(etudiants, ['nom_normalise'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etudiant',
+            name='nom_normalise',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(remplir_nom_normalise, migrations.RunPython.noop),
+    ]
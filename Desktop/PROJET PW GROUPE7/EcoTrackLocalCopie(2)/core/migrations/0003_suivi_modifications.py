@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_etudiant_nom_normalise'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enqueteur',
+            name='derniere_detection',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Dernière détection d'anomalies"),
+        ),
+        migrations.AddField(
+            model_name='etudiant',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='depense',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
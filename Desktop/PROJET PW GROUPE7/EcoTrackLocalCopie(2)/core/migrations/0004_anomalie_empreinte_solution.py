@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_suivi_modifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anomalie',
+            name='empreinte',
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='anomalie',
+            name='solution',
+            field=models.TextField(blank=True, verbose_name='Solution proposée'),
+        ),
+    ]
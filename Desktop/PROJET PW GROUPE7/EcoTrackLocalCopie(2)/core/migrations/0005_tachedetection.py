@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_anomalie_empreinte_solution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheDetection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('incremental', models.BooleanField(default=True, verbose_name='Analyse des seules données modifiées')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINEE', 'Terminée'), ('ECHEC', 'Échec')], db_index=True, default='EN_ATTENTE', max_length=20)),
+                ('nb_anomalies', models.IntegerField(default=0, verbose_name='Nouvelles anomalies')),
+                ('erreur', models.TextField(blank=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('enqueteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taches_detection', to='core.enqueteur')),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:34
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normaliser_texte(texte):
+    """Copie figée de core.normalisation.normaliser_texte à la date de cette migration"""
+    if not texte:
+        return ''
+    texte = unicodedata.normalize('NFKD', texte)
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(texte.lower().split())
+
+
+def calculer_cle_identite(nom, age, universite, quartier):
+    """Copie figée de core.normalisation.calculer_cle_identite à la date de cette migration"""
+    brut = '|'.join([normaliser_texte(nom), str(age or ''), normaliser_texte(universite), normaliser_texte(quartier)])
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()
+
+
+def remplir_cle_identite(apps, schema_editor):
+    Etudiant = apps.get_model('core', 'Etudiant')
+    etudiants = list(Etudiant.objects.only('id', 'nom', 'age', 'universite', 'quartier'))
+    for etudiant in etudiants:
+        etudiant.cle_identite = calculer_cle_identite(
+            etudiant.nom, etudiant.age, etudiant.universite, etudiant.quartier
+        )
+    Etudiant.objects.bulk_update(etudiants, ['cle_identite'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_tachedetection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etudiant',
+            name='cle_identite',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40),
+        ),
+        migrations.RunPython(remplir_cle_identite, migrations.RunPython.noop),
+    ]
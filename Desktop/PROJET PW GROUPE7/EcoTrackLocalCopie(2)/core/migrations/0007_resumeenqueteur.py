@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_etudiant_cle_identite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeEnqueteur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nb_etudiants', models.IntegerField(default=0)),
+                ('nb_hommes', models.IntegerField(default=0)),
+                ('nb_femmes', models.IntegerField(default=0)),
+                ('nb_quartiers', models.IntegerField(default=0)),
+                ('nb_depenses', models.IntegerField(default=0)),
+                ('montant_total', models.FloatField(default=0)),
+                ('nb_anomalies_ouvertes', models.IntegerField(default=0, verbose_name='Anomalies à traiter')),
+                ('nb_anomalies_resolues', models.IntegerField(default=0)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+                ('enqueteur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resume', to='core.enqueteur')),
+            ],
+        ),
+    ]
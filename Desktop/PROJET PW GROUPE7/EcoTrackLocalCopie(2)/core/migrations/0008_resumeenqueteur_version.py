@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_resumeenqueteur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumeenqueteur',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def marquer_jours_existants(apps, schema_editor):
+    # Tous les jours déjà saisis sont à agréger au premier rafraîchissement
+    Depense = apps.get_model('core', 'Depense')
+    JourModifie = apps.get_model('core', 'JourModifie')
+    jours = Depense.objects.values_list('enqueteur_id', 'date_depense').distinct()
+    JourModifie.objects.bulk_create(
+        [JourModifie(enqueteur_id=enqueteur_id, date_depense=jour) for enqueteur_id, jour in jours],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_resumeenqueteur_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregatDepenseJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quartier', models.CharField(max_length=100)),
+                ('categorie', models.CharField(choices=[('LOGEMENT', 'Logement (loyer, charges)'), ('NOURRITURE', 'Nourriture et boissons'), ('TRANSPORT', 'Transport'), ('SANTE', 'Santé et hygiène'), ('COMMUNICATION', 'Communication (internet, téléphone)'), ('FORMATION', 'Frais académiques'), ('DIVERTISSEMENT', 'Loisirs et divertissement'), ('HABILLEMENT', 'Habillement'), ('AUTRE', 'Autres dépenses')], max_length=20)),
+                ('date_depense', models.DateField()),
+                ('nombre', models.IntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('minimum', models.FloatField(default=0)),
+                ('maximum', models.FloatField(default=0)),
+                ('enqueteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agregats_depenses', to='core.enqueteur')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('enqueteur', 'quartier', 'categorie', 'date_depense'), name='agregat_depense_jour_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='JourModifie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_depense', models.DateField()),
+                ('enqueteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jours_modifies', to='core.enqueteur')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('enqueteur', 'date_depense'), name='jour_modifie_unique')],
+            },
+        ),
+        migrations.RunPython(marquer_jours_existants, migrations.RunPython.noop),
+    ]
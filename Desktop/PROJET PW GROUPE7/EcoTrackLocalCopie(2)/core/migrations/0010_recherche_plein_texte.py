@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:53
+
+from django.db import migrations
+
+# Copie figée de core.recherche à la date de cette migration
+TABLE_FTS = 'core_recherche_fts'
+
+SQL_CREER_INDEX = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_FTS} USING fts5(
+        enqueteur_id UNINDEXED, nom, universite, quartier, notes, depenses,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+SQL_DOCUMENTS = f"""
+    INSERT INTO {TABLE_FTS} (rowid, enqueteur_id, nom, universite, quartier, notes, depenses)
+    SELECT e.id, e.enqueteur_id, e.nom, e.universite, e.quartier, e.notes,
+           COALESCE((SELECT group_concat(d.lieu_precis || ' ' || d.commentaire, ' ')
+                     FROM core_depense d WHERE d.etudiant_id = e.id), '')
+    FROM core_etudiant e
+"""
+
+# Index trigrammes PostgreSQL (pg_trgm) : (nom de l'index, table, colonne)
+INDEX_TRIGRAMMES = [
+    ('core_etudiant_nom_trgm', 'core_etudiant', 'nom'),
+    ('core_etudiant_universite_trgm', 'core_etudiant', 'universite'),
+    ('core_etudiant_quartier_trgm', 'core_etudiant', 'quartier'),
+    ('core_etudiant_notes_trgm', 'core_etudiant', 'notes'),
+    ('core_depense_lieu_precis_trgm', 'core_depense', 'lieu_precis'),
+    ('core_depense_commentaire_trgm', 'core_depense', 'commentaire'),
+]
+
+
+def _fts5_disponible(connexion):
+    with connexion.cursor() as curseur:
+        curseur.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if curseur.fetchone()[0]:
+            return True
+        # Certaines compilations l'embarquent sans l'option : on essaie
+        try:
+            curseur.execute("CREATE VIRTUAL TABLE temp.test_fts5 USING fts5(x)")
+            curseur.execute("DROP TABLE temp.test_fts5")
+            return True
+        except Exception:
+            return False
+
+
+def creer_index(apps, schema_editor):
+    connexion = schema_editor.connection
+    if connexion.vendor == 'sqlite':
+        if _fts5_disponible(connexion):
+            schema_editor.execute(SQL_CREER_INDEX)
+            schema_editor.execute(SQL_DOCUMENTS)
+    elif connexion.vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for nom, table, colonne in INDEX_TRIGRAMMES:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {nom} ON {table} USING gin ({colonne} gin_trgm_ops)"
+            )
+
+
+def supprimer_index(apps, schema_editor):
+    connexion = schema_editor.connection
+    if connexion.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE_FTS}")
+    elif connexion.vendor == 'postgresql':
+        for nom, _, _ in INDEX_TRIGRAMMES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {nom}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_agregatdepensejour'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recherche_plein_texte'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='anomalie',
+            index=models.Index(fields=['enqueteur', 'statut', 'gravite'], name='anomalie_enq_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='depense',
+            index=models.Index(fields=['enqueteur', 'date_saisie'], name='depense_enq_saisie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='depense',
+            index=models.Index(fields=['enqueteur', 'categorie'], name='depense_enq_categorie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='depense',
+            index=models.Index(fields=['enqueteur', 'date_depense'], name='depense_enq_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['enqueteur', 'quartier'], name='etudiant_enq_quartier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['enqueteur', 'statut'], name='etudiant_enq_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['enqueteur', 'date_collecte'], name='etudiant_enq_date_idx'),
+        ),
+    ]
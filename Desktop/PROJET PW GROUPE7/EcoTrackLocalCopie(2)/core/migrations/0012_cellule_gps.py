@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:56
+
+import math
+
+from django.db import migrations, models
+
+# Copie figée de core.geo à la date de cette migration
+TAILLE_CELLULE = 0.01
+
+
+def cellule_gps(lat, lng):
+    if lat is None or lng is None:
+        return ''
+    return f"{math.floor(lat / TAILLE_CELLULE)}:{math.floor(lng / TAILLE_CELLULE)}"
+
+
+def remplir_cellule_gps(apps, schema_editor):
+    Etudiant = apps.get_model('core', 'Etudiant')
+    etudiants = list(Etudiant.objects.filter(gps_lat__isnull=False, gps_lng__isnull=False).only('id', 'gps_lat', 'gps_lng'))
+    for etudiant in etudiants:
+        etudiant.cellule_gps = cellule_gps(etudiant.gps_lat, etudiant.gps_lng)
+    Etudiant.objects.bulk_update(etudiants, ['cellule_gps'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_index_composites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etudiant',
+            name='cellule_gps',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['enqueteur', 'cellule_gps'], name='etudiant_enq_cellule_idx'),
+        ),
+        migrations.RunPython(remplir_cellule_gps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:08
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def calculer_empreinte(type_anomalie, regle, etudiant_id=None, depense_id=None, cle=''):
+    """Copie figée de core.detecteur_anomalies.calculer_empreinte à la date de cette migration"""
+    brut = f"{type_anomalie}|{regle}|{etudiant_id or ''}|{depense_id or ''}|{cle}"
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()
+
+
+# Anomalies enregistrées avant les empreintes : (type, début de la description, règle du détecteur actuel)
+REGLES_ANCIENNES = [
+    ('DOUBLON', "Étudiant potentiellement en doublon", 'doublon_nom'),
+    ('HORS_NORME', "Dépense très faible", 'montant_min'),
+    ('HORS_NORME', "Dépense très élevée", 'montant_max'),
+    ('INCOHERENCE', "Âge (", 'age_niveau'),
+    ('MANQUANTE', "Étudiant sans aucune dépense", 'sans_depense'),
+    ('MANQUANTE', "Étudiant sans quartier", 'sans_quartier'),
+]
+
+# Parmi des anomalies de même empreinte, celle qui la conserve : à traiter d'abord, puis la plus récente
+PRIORITE_STATUT = {'A_TRAITER': 0, 'EN_COURS': 1, 'RESOLUE': 2, 'IGNOREE': 3}
+
+
+def _regle(anomalie):
+    for type_anomalie, debut, regle in REGLES_ANCIENNES:
+        if anomalie.type_anomalie == type_anomalie and anomalie.description.startswith(debut):
+            return regle
+    return None
+
+
+def remplir_empreintes(apps, schema_editor):
+    Anomalie = apps.get_model('core', 'Anomalie')
+    anomalies = list(Anomalie.objects.only(
+        'id', 'enqueteur_id', 'etudiant_id', 'depense_id', 'type_anomalie', 'description', 'statut', 'empreinte',
+        'date_detection',
+    ))
+    
+    # Empreinte que la détection calculerait aujourd'hui : elle ne recrée plus ces anomalies
+    for anomalie in anomalies:
+        regle = None if anomalie.empreinte else _regle(anomalie)
+        if regle:
+            anomalie.empreinte = calculer_empreinte(
+                anomalie.type_anomalie, regle,
+                etudiant_id=anomalie.etudiant_id, depense_id=anomalie.depense_id,
+            )
+    
+    # Les doublons déjà enregistrés gardent leur ligne, mais une seule porte l'empreinte
+    anomalies.sort(key=lambda a: (PRIORITE_STATUT.get(a.statut, 4), -a.date_detection.timestamp(), -a.id))
+    vues = set()
+    for anomalie in anomalies:
+        if not anomalie.empreinte:
+            continue
+        cle = (anomalie.enqueteur_id, anomalie.empreinte)
+        if cle in vues:
+            anomalie.empreinte = ''
+        vues.add(cle)
+    
+    Anomalie.objects.bulk_update(anomalies, ['empreinte'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_cellule_gps'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_empreintes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='anomalie',
+            constraint=models.UniqueConstraint(condition=models.Q(('empreinte', ''), _negated=True), fields=('enqueteur', 'empreinte'), name='anomalie_empreinte_unique'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_anomalie_empreinte_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorneMontant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('methode', models.CharField(max_length=10)),
+                ('par_quartier', models.BooleanField(default=False)),
+                ('categorie', models.CharField(choices=[('LOGEMENT', 'Logement (loyer, charges)'), ('NOURRITURE', 'Nourriture et boissons'), ('TRANSPORT', 'Transport'), ('SANTE', 'Santé et hygiène'), ('COMMUNICATION', 'Communication (internet, téléphone)'), ('FORMATION', 'Frais académiques'), ('DIVERTISSEMENT', 'Loisirs et divertissement'), ('HABILLEMENT', 'Habillement'), ('AUTRE', 'Autres dépenses')], max_length=20)),
+                ('quartier', models.CharField(blank=True, max_length=100)),
+                ('borne_min', models.FloatField(null=True)),
+                ('borne_max', models.FloatField(null=True)),
+                ('date_calcul', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enqueteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bornes_montants', to='core.enqueteur')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('enqueteur', 'methode', 'par_quartier', 'categorie', 'quartier'), name='borne_montant_unique')],
+            },
+        ),
+    ]
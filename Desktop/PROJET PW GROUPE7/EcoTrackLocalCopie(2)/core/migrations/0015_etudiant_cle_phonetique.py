@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:39
+
+import unicodedata
+
+from django.db import migrations, models
+
+# Copie figée de core.normalisation._CODES_SOUNDEX à la date de cette migration
+_CODES_SOUNDEX = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def normaliser_texte(texte):
+    """Copie figée de core.normalisation.normaliser_texte à la date de cette migration"""
+    if not texte:
+        return ''
+    texte = unicodedata.normalize('NFKD', texte)
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(texte.lower().split())
+
+
+def code_phonetique(mot):
+    """Copie figée de core.normalisation.code_phonetique à la date de cette migration"""
+    mot = ''.join(c for c in normaliser_texte(mot) if c.isalpha())
+    if not mot:
+        return ''
+    
+    code = mot[0].upper()
+    precedent = _CODES_SOUNDEX.get(mot[0], '')
+    for lettre in mot[1:]:
+        chiffre = _CODES_SOUNDEX.get(lettre, '')
+        if chiffre and chiffre != precedent:
+            code += chiffre
+        if lettre not in 'hw':
+            precedent = chiffre
+    return (code + '000')[:4]
+
+
+def cle_phonetique(texte):
+    """Copie figée de core.normalisation.cle_phonetique à la date de cette migration"""
+    return ' '.join(sorted(code_phonetique(mot) for mot in normaliser_texte(texte).split()))
+
+
+def remplir_cle_phonetique(apps, schema_editor):
+    Etudiant = apps.get_model('core', 'Etudiant')
+    etudiants = list(Etudiant.objects.only('id', 'nom'))
+    for etudiant in etudiants:
+        etudiant.cle_phonetique = cle_phonetique(etudiant.nom)
+    Etudiant.objects.bulk_update(etudiants, ['cle_phonetique'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_bornemontant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='etudiant',
+            name='cle_phonetique',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='etudiant',
+            index=models.Index(fields=['enqueteur', 'cle_phonetique'], name='etudiant_enq_phonetique_idx'),
+        ),
+        migrations.RunPython(remplir_cle_phonetique, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+def fusionner_taches_en_attente(apps, schema_editor):
+    """Une seule tâche en attente par enquêteur : la plus ancienne, complète si l'une des autres l'était"""
+    TacheDetection = apps.get_model('core', 'TacheDetection')
+    conservees = {}
+    for tache in TacheDetection.objects.filter(statut='EN_ATTENTE').order_by('date_creation', 'id'):
+        conservee = conservees.setdefault(tache.enqueteur_id, tache)
+        if conservee.pk == tache.pk:
+            continue
+        if not tache.incremental and conservee.incremental:
+            conservee.incremental = False
+            conservee.save(update_fields=['incremental'])
+        tache.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_etudiant_cle_phonetique'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionner_taches_en_attente, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tachedetection',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'EN_ATTENTE')), fields=('enqueteur',), name='tache_detection_en_attente_unique'),
+        ),
+    ]
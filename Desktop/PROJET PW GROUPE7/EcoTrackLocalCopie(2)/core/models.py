@@ -1,12 +1,17 @@
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .normalisation import normaliser_texte, calculer_cle_identite, cle_phonetique
+from .geo import cellule_gps
 
 class Enqueteur(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     matricule = models.CharField(max_length=20, unique=True)
     telephone = models.CharField(max_length=15)
     date_inscription = models.DateTimeField(auto_now_add=True)
+    derniere_detection = models.DateTimeField(null=True, blank=True, verbose_name="Dernière détection d'anomalies")
     
     def __str__(self):
         return f"{self.user.username} ({self.matricule})"
@@ -33,6 +38,11 @@ class Etudiant(models.Model):
     
     # Informations personnelles
     nom = models.CharField(max_length=100)
+    nom_normalise = models.CharField(max_length=100, blank=True, editable=False, db_index=True)
+    # Index global des doublons, tous enquêteurs confondus
+    cle_identite = models.CharField(max_length=40, blank=True, editable=False, db_index=True)
+    # Clé de blocage phonétique des quasi-doublons
+    cle_phonetique = models.CharField(max_length=100, blank=True, editable=False)
     age = models.IntegerField()
     sexe = models.CharField(max_length=1, choices=SEXE_CHOICES)
     niveau = models.CharField(max_length=10, choices=NIVEAU_CHOICES)
@@ -42,9 +52,12 @@ class Etudiant(models.Model):
     # Géolocalisation
     gps_lat = models.FloatField(null=True, blank=True, verbose_name="Latitude")
     gps_lng = models.FloatField(null=True, blank=True, verbose_name="Longitude")
+    # Cellule de la grille fixe (core/geo.py) : recherches spatiales par index
+    cellule_gps = models.CharField(max_length=20, blank=True, editable=False)
     
     # Métadonnées
     date_collecte = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True)
     statut = models.CharField(max_length=20, default='BROUILLON', choices=[
         ('BROUILLON', 'Brouillon'),
         ('COMPLET', 'Complet'),
@@ -56,6 +69,35 @@ class Etudiant(models.Model):
     notes = models.TextField(blank=True, verbose_name="Observations de l'enquêteur")
     photo = models.ImageField(upload_to='etudiants/', blank=True, null=True, verbose_name="Photo (optionnel)")
     
+    class Meta:
+        # Filtres des listes et statistiques (toujours restreints à l'enquêteur)
+        indexes = [
+            models.Index(fields=['enqueteur', 'quartier'], name='etudiant_enq_quartier_idx'),
+            models.Index(fields=['enqueteur', 'statut'], name='etudiant_enq_statut_idx'),
+            models.Index(fields=['enqueteur', 'date_collecte'], name='etudiant_enq_date_idx'),
+            models.Index(fields=['enqueteur', 'cellule_gps'], name='etudiant_enq_cellule_idx'),
+            models.Index(fields=['enqueteur', 'cle_phonetique'], name='etudiant_enq_phonetique_idx'),
+        ]
+    
+    # Clés dérivées recalculées à chaque sauvegarde, et les champs dont elles dépendent
+    CHAMPS_CLES = {'nom_normalise', 'cle_identite', 'cle_phonetique', 'cellule_gps'}
+    CHAMPS_SOURCES_CLES = {'nom', 'age', 'universite', 'quartier', 'gps_lat', 'gps_lng'}
+    
+    def mettre_a_jour_cles(self):
+        """Recalcule les clés dérivées : comparaison (doublons) et cellule GPS"""
+        self.nom_normalise = normaliser_texte(self.nom)
+        self.cle_identite = calculer_cle_identite(self.nom, self.age, self.universite, self.quartier)
+        self.cle_phonetique = cle_phonetique(self.nom)
+        self.cellule_gps = cellule_gps(self.gps_lat, self.gps_lng)
+    
+    def save(self, *args, **kwargs):
+        self.mettre_a_jour_cles()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & self.CHAMPS_SOURCES_CLES:
+            # Les clés dérivées suivent les champs dont elles dépendent
+            kwargs['update_fields'] = set(update_fields) | self.CHAMPS_CLES
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.code_enquete} - {self.nom}"
 
@@ -93,6 +135,15 @@ class Depense(models.Model):
     est_valide = models.BooleanField(default=True, verbose_name="Donnée valide")
     anomalie = models.TextField(blank=True, verbose_name="Description de l'anomalie")
     date_saisie = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['enqueteur', 'date_saisie'], name='depense_enq_saisie_idx'),
+            models.Index(fields=['enqueteur', 'categorie'], name='depense_enq_categorie_idx'),
+            # Recalcul des agrégats journaliers (core/agregats.py)
+            models.Index(fields=['enqueteur', 'date_depense'], name='depense_enq_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.etudiant.nom} - {self.categorie}: {self.montant} FCFA"
@@ -110,6 +161,9 @@ class Anomalie(models.Model):
     depense = models.ForeignKey(Depense, on_delete=models.CASCADE, null=True, blank=True, related_name='anomalies_depense')
     type_anomalie = models.CharField(max_length=20, choices=TYPE_CHOICES)
     description = models.TextField()
+    solution = models.TextField(blank=True, verbose_name="Solution proposée")
+    # Empreinte stable (type + cible + règle) servant à ne pas recréer une anomalie déjà connue
+    empreinte = models.CharField(max_length=40, blank=True, db_index=True)
     gravite = models.CharField(max_length=10, choices=[
         ('FAIBLE', 'Faible'),
         ('MOYENNE', 'Moyenne'),
@@ -125,5 +179,183 @@ class Anomalie(models.Model):
     date_detection = models.DateTimeField(auto_now_add=True)
     date_resolution = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['enqueteur', 'statut', 'gravite'], name='anomalie_enq_statut_idx'),
+        ]
+        constraints = [
+            # Deux détections concurrentes (worker, commande de scan) ne peuvent pas enregistrer la même anomalie
+            models.UniqueConstraint(
+                fields=['enqueteur', 'empreinte'],
+                condition=~models.Q(empreinte=''),
+                name='anomalie_empreinte_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Anomalie {self.type_anomalie} - {self.etudiant.nom if self.etudiant else 'Dépense'}"
+
+class TacheDetection(models.Model):
+    """Tâche de détection d'anomalies en file d'attente, exécutée hors requête"""
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminée'),
+        ('ECHEC', 'Échec'),
+    ]
+    
+    enqueteur = models.ForeignKey(Enqueteur, on_delete=models.CASCADE, related_name='taches_detection')
+    incremental = models.BooleanField(default=True, verbose_name="Analyse des seules données modifiées")
+    statut = models.CharField(max_length=20, default='EN_ATTENTE', choices=STATUT_CHOICES, db_index=True)
+    nb_anomalies = models.IntegerField(default=0, verbose_name="Nouvelles anomalies")
+    erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            # Deux planifications concurrentes ne peuvent pas mettre en file deux détections pour le même enquêteur
+            models.UniqueConstraint(
+                fields=['enqueteur'],
+                condition=models.Q(statut='EN_ATTENTE'),
+                name='tache_detection_en_attente_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Détection {self.get_statut_display()} - {self.enqueteur}"
+
+
+
+class ResumeEnqueteur(models.Model):
+    """Compteurs pré-calculés d'un enquêteur, tenus à jour par les signaux (core/signals.py)"""
+    enqueteur = models.OneToOneField(Enqueteur, on_delete=models.CASCADE, related_name='resume')
+    nb_etudiants = models.IntegerField(default=0)
+    nb_hommes = models.IntegerField(default=0)
+    nb_femmes = models.IntegerField(default=0)
+    nb_quartiers = models.IntegerField(default=0)
+    nb_depenses = models.IntegerField(default=0)
+    montant_total = models.FloatField(default=0)
+    nb_anomalies_ouvertes = models.IntegerField(default=0, verbose_name="Anomalies à traiter")
+    nb_anomalies_resolues = models.IntegerField(default=0)
+    # Incrémentée à chaque écriture sur les données de l'enquêteur (clé des caches)
+    version = models.PositiveIntegerField(default=0)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def pour(cls, enqueteur):
+        """Résumé de l'enquêteur, calculé entièrement à la première lecture"""
+        try:
+            return cls.objects.get(enqueteur=enqueteur)
+        except cls.DoesNotExist:
+            return cls.recalculer(enqueteur)
+    
+    @classmethod
+    def recalculer(cls, enqueteur):
+        """Recalcule tous les compteurs depuis les tables sources"""
+        from .statistiques import calculer_kpis
+        
+        kpis = calculer_kpis(enqueteur)
+        champs = [
+            'nb_etudiants', 'nb_hommes', 'nb_femmes', 'nb_quartiers', 'nb_depenses',
+            'montant_total', 'nb_anomalies_ouvertes', 'nb_anomalies_resolues',
+        ]
+        resume, _ = cls.objects.update_or_create(
+            enqueteur=enqueteur,
+            defaults={champ: kpis[champ] for champ in champs}
+        )
+        return resume
+    
+    @classmethod
+    def incrementer(cls, enqueteur_id, **variations):
+        """Applique des variations atomiques (F() + n) aux compteurs
+        
+        Sans résumé existant, rien n'est fait : il sera calculé à la prochaine lecture.
+        """
+        variations = {champ: F(champ) + valeur for champ, valeur in variations.items() if valeur}
+        if variations:
+            cls.objects.filter(enqueteur_id=enqueteur_id).update(date_mise_a_jour=timezone.now(), **variations)
+    
+    @classmethod
+    def recompter_anomalies(cls, enqueteur_id):
+        """Relit le nombre d'anomalies à traiter et avance la version, en une seule requête
+        
+        Sert après une insertion groupée dont une partie a pu être ignorée (empreintes déjà enregistrées).
+        """
+        ouvertes = Anomalie.objects.filter(enqueteur_id=OuterRef('enqueteur_id'), statut='A_TRAITER')\
+                                   .values('enqueteur_id').annotate(nombre=Count('id')).values('nombre')
+        cls.objects.filter(enqueteur_id=enqueteur_id).update(
+            nb_anomalies_ouvertes=Coalesce(Subquery(ouvertes), 0),
+            version=F('version') + 1,
+            date_mise_a_jour=timezone.now(),
+        )
+    
+    def __str__(self):
+        return f"Résumé {self.enqueteur}"
+
+
+class AgregatDepenseJour(models.Model):
+    """Dépenses agrégées par enquêteur, quartier, catégorie et jour (table de cumul des analyses temporelles)"""
+    enqueteur = models.ForeignKey(Enqueteur, on_delete=models.CASCADE, related_name='agregats_depenses')
+    quartier = models.CharField(max_length=100)
+    categorie = models.CharField(max_length=20, choices=Depense.CATEGORIE_CHOICES)
+    date_depense = models.DateField()
+    nombre = models.IntegerField(default=0)
+    total = models.FloatField(default=0)
+    minimum = models.FloatField(default=0)
+    maximum = models.FloatField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['enqueteur', 'quartier', 'categorie', 'date_depense'],
+                name='agregat_depense_jour_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.enqueteur} - {self.quartier} / {self.categorie} le {self.date_depense}"
+
+
+class BorneMontant(models.Model):
+    """Bornes des montants d'un groupe de dépenses, calculées lors de la dernière détection complète
+    
+    Population de référence de la détection incrémentale : seules les dépenses
+    modifiées sont chargées et comparées à ces bornes.
+    """
+    enqueteur = models.ForeignKey(Enqueteur, on_delete=models.CASCADE, related_name='bornes_montants')
+    methode = models.CharField(max_length=10)
+    par_quartier = models.BooleanField(default=False)
+    categorie = models.CharField(max_length=20, choices=Depense.CATEGORIE_CHOICES)
+    # Vide si les bornes sont calculées par catégorie seule
+    quartier = models.CharField(max_length=100, blank=True)
+    # Vide : pas de borne de ce côté
+    borne_min = models.FloatField(null=True)
+    borne_max = models.FloatField(null=True)
+    date_calcul = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['enqueteur', 'methode', 'par_quartier', 'categorie', 'quartier'],
+                name='borne_montant_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.enqueteur} - {self.categorie} {self.quartier} [{self.borne_min}, {self.borne_max}]"
+
+
+class JourModifie(models.Model):
+    """Jour de dépenses modifié depuis le dernier rafraîchissement des agrégats (journal rempli par les signaux)"""
+    enqueteur = models.ForeignKey(Enqueteur, on_delete=models.CASCADE, related_name='jours_modifies')
+    date_depense = models.DateField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['enqueteur', 'date_depense'], name='jour_modifie_unique'),
+        ]
+    
     def __str__(self):
-        return f"Anomalie {self.type_anomalie} - {self.etudiant.nom if self.etudiant else 'Dépense'}"
\ No newline at end of file
+        return f"{self.enqueteur} - {self.date_depense}"
@@ -0,0 +1,149 @@
+# core/moteur_statistique.py
+import numpy as np
+import pandas as pd
+
+# Facteur rendant la MAD comparable à un écart-type (loi normale)
+FACTEUR_MAD = 1.4826
+
+# Seuil par défaut de chaque méthode de bornes
+SEUILS = {'mad': 3.5, 'iqr': 1.5}
+
+
+def charger_montants(depenses, champs=('id', 'categorie', 'quartier', 'montant')):
+    """Charge les colonnes demandées d'un queryset de dépenses dans un DataFrame, sans instancier de modèles"""
+    lignes = depenses.values_list(*champs).iterator(chunk_size=10000)
+    return pd.DataFrame.from_records(lignes, columns=list(champs))
+
+
+def bornes_robustes(montants, par=('categorie',), methode='mad', seuil=None, effectif_min=8, limites_defaut=None):
+    """Calcule pour chaque ligne les bornes acceptables de son groupe
+    
+    - methode='mad' : médiane ± seuil × MAD normalisée (seuil 3,5 par défaut)
+    - methode='iqr' : [Q1 - seuil × IQR, Q3 + seuil × IQR] (Tukey, seuil 1,5 par défaut)
+    
+    Les groupes trop petits (montants NaN non comptés) ou sans dispersion
+    reprennent les limites par défaut de leur catégorie ({'CATEGORIE': {'min': .., 'max': ..}}).
+    Renvoie un DataFrame (borne_min, borne_max) aligné sur `montants`.
+    """
+    if methode not in SEUILS:
+        raise ValueError(f"Méthode inconnue : {methode}")
+    if seuil is None:
+        seuil = SEUILS[methode]
+    
+    cles = [montants[colonne] for colonne in par]
+    valeurs = montants['montant'].astype('float64')
+    groupes = valeurs.groupby(cles)
+    
+    if methode == 'mad':
+        mediane = groupes.transform('median')
+        dispersion = (valeurs - mediane).abs().groupby(cles).transform('median') * FACTEUR_MAD
+        borne_min = mediane - seuil * dispersion
+        borne_max = mediane + seuil * dispersion
+    else:
+        q1 = groupes.transform('quantile', 0.25)
+        q3 = groupes.transform('quantile', 0.75)
+        dispersion = q3 - q1
+        borne_min = q1 - seuil * dispersion
+        borne_max = q3 + seuil * dispersion
+    
+    fiable = (groupes.transform('count') >= effectif_min) & (dispersion > 0)
+    defaut_min, defaut_max = _limites_defaut(montants, limites_defaut)
+    
+    return pd.DataFrame({
+        'borne_min': np.where(fiable, borne_min, defaut_min),
+        'borne_max': np.where(fiable, borne_max, defaut_max),
+    }, index=montants.index)
+
+
+def _limites_defaut(montants, limites_defaut):
+    """Limites par défaut de la catégorie de chaque ligne (sans limite pour une catégorie inconnue)"""
+    limites_defaut = limites_defaut or {}
+    defaut_min = montants['categorie'].map({cat: lim['min'] for cat, lim in limites_defaut.items()}).fillna(0)
+    defaut_max = montants['categorie'].map({cat: lim['max'] for cat, lim in limites_defaut.items()}).fillna(np.inf)
+    return defaut_min, defaut_max
+
+
+def bornes_par_groupe(montants, bornes, par=('categorie',)):
+    """Résumé des bornes : une ligne par groupe (colonnes `par`, borne_min, borne_max)"""
+    return montants[list(par)].join(bornes).drop_duplicates(subset=list(par)).reset_index(drop=True)
+
+
+def bornes_des_groupes(montants, groupes, par=('categorie',), limites_defaut=None):
+    """Bornes de chaque ligne lues dans un résumé par groupe (voir bornes_par_groupe)
+    
+    Un groupe absent du résumé reprend les limites par défaut de sa catégorie.
+    """
+    fusion = montants[list(par)].merge(groupes, on=list(par), how='left')
+    defaut_min, defaut_max = _limites_defaut(montants, limites_defaut)
+    borne_min = fusion['borne_min'].to_numpy(dtype='float64')
+    borne_max = fusion['borne_max'].to_numpy(dtype='float64')
+    return pd.DataFrame({
+        'borne_min': np.where(np.isnan(borne_min), defaut_min, borne_min),
+        'borne_max': np.where(np.isnan(borne_max), defaut_max, borne_max),
+    }, index=montants.index)
+
+
+def detecter_valeurs_aberrantes(montants, bornes=None, **options):
+    """Renvoie les lignes dont le montant sort des bornes de son groupe (calcul vectorisé)
+    
+    Les bornes sont calculées sur `montants` (options de bornes_robustes), ou fournies
+    déjà calculées. Le résultat contient les colonnes d'origine, les bornes et le sens
+    du dépassement ('bas' ou 'haut').
+    """
+    if montants.empty:
+        return montants.assign(borne_min=[], borne_max=[], sens=[])
+    
+    if bornes is None:
+        bornes = bornes_robustes(montants, **options)
+    resultat = montants.join(bornes)
+    
+    trop_bas = resultat['montant'] < resultat['borne_min']
+    trop_haut = resultat['montant'] > resultat['borne_max']
+    
+    resultat = resultat[trop_bas | trop_haut].copy()
+    resultat['sens'] = np.where(trop_haut[resultat.index], 'haut', 'bas')
+    return resultat
+
+
+def bornes_classes(valeurs, nb_classes=10, quantile_max=0.99):
+    """Bornes d'histogramme communes à tous les groupes (comparables entre eux)
+    
+    La dernière classe s'arrête au quantile `quantile_max` et reçoit aussi les
+    valeurs au-delà : quelques montants extrêmes n'écrasent pas les autres classes.
+    """
+    if len(valeurs) == 0:
+        return np.zeros(nb_classes + 1)
+    minimum = float(valeurs.min())
+    maximum = float(np.quantile(valeurs, quantile_max))
+    if maximum <= minimum:
+        maximum = minimum + 1
+    return np.linspace(minimum, maximum, nb_classes + 1)
+
+
+def distributions(montants, par='quartier', nb_classes=10):
+    """Distribution des montants de chaque groupe, en calcul vectorisé
+    
+    Renvoie un DataFrame indexé par groupe (effectif, moyenne, ecart_type, p10,
+    mediane, p90) et les bornes de classes avec un histogramme par groupe
+    ({groupe: [effectifs]}).
+    """
+    valeurs = montants['montant'].astype('float64')
+    bornes = bornes_classes(valeurs.to_numpy(), nb_classes)
+    
+    groupes = valeurs.groupby(montants[par])
+    resume = groupes.agg(['size', 'mean', 'std']).rename(
+        columns={'size': 'effectif', 'mean': 'moyenne', 'std': 'ecart_type'}
+    )
+    quantiles = groupes.quantile([0.1, 0.5, 0.9]).unstack()
+    resume['p10'] = quantiles[0.1]
+    resume['mediane'] = quantiles[0.5]
+    resume['p90'] = quantiles[0.9]
+    # Écart-type indéfini pour un groupe d'une seule valeur
+    resume['ecart_type'] = resume['ecart_type'].fillna(0)
+    
+    # Classe de chaque montant, puis effectifs par (groupe, classe) en un seul tableau croisé
+    classes = np.clip(np.searchsorted(bornes, valeurs.to_numpy(), side='right') - 1, 0, nb_classes - 1)
+    effectifs = pd.crosstab(montants[par].to_numpy(), classes).reindex(columns=range(nb_classes), fill_value=0)
+    histogrammes = {groupe: ligne.tolist() for groupe, ligne in zip(effectifs.index, effectifs.to_numpy())}
+    
+    return resume, bornes, histogrammes
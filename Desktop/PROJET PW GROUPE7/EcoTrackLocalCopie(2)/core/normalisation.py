@@ -0,0 +1,60 @@
+# core/normalisation.py
+import hashlib
+import unicodedata
+
+
+def normaliser_texte(texte):
+    """Normalise un texte pour les comparaisons : minuscules, sans accents ni espaces superflus"""
+    if not texte:
+        return ''
+    texte = unicodedata.normalize('NFKD', texte)
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return ' '.join(texte.lower().split())
+
+
+def calculer_cle_identite(nom, age, universite, quartier):
+    """Empreinte de l'identité d'un étudiant (nom, âge, établissement, quartier normalisés)
+    
+    Deux fiches de même clé décrivent très probablement la même personne,
+    quel que soit l'enquêteur qui les a saisies.
+    """
+    brut = '|'.join([normaliser_texte(nom), str(age or ''), normaliser_texte(universite), normaliser_texte(quartier)])
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()
+
+
+# Codes Soundex des consonnes (les voyelles, h, w et y sont ignorés)
+_CODES_SOUNDEX = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def code_phonetique(mot):
+    """Code Soundex d'un mot (ex. 'marie' et 'mari' donnent 'M600')"""
+    mot = ''.join(c for c in normaliser_texte(mot) if c.isalpha())
+    if not mot:
+        return ''
+    
+    code = mot[0].upper()
+    precedent = _CODES_SOUNDEX.get(mot[0], '')
+    for lettre in mot[1:]:
+        chiffre = _CODES_SOUNDEX.get(lettre, '')
+        if chiffre and chiffre != precedent:
+            code += chiffre
+        if lettre not in 'hw':
+            precedent = chiffre
+    return (code + '000')[:4]
+
+
+def cle_phonetique(texte):
+    """Codes Soundex des mots d'un texte, triés (clé de blocage des quasi-doublons)"""
+    return ' '.join(sorted(code_phonetique(mot) for mot in normaliser_texte(texte).split()))
+
+
+def mots_tries(texte):
+    """Mots d'un texte normalisé, triés (insensible à l'ordre nom / prénom)"""
+    return ' '.join(sorted(normaliser_texte(texte).split()))
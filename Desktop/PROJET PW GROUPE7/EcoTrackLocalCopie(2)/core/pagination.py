@@ -0,0 +1,75 @@
+# core/pagination.py
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Tailles de page proposées (la première sert par défaut)
+TAILLES_PAGE = (25, 10, 50, 100)
+
+SEL_CURSEUR = 'core.pagination.curseur'
+
+
+def taille_page(valeur):
+    """Taille de page demandée si elle fait partie des tailles proposées, sinon la taille par défaut"""
+    try:
+        valeur = int(valeur)
+    except (TypeError, ValueError):
+        return TAILLES_PAGE[0]
+    return valeur if valeur in TAILLES_PAGE else TAILLES_PAGE[0]
+
+
+def signer_curseur(filtres, taille, sens, date_collecte=None, pk=None, rang=None):
+    """Curseur opaque et signé : position, sens de lecture et filtres de la liste
+    
+    La position est la clé (date_collecte, id) de la dernière ligne vue, ou son
+    rang dans un classement par pertinence (sens='pertinence').
+    """
+    contenu = {'filtres': filtres, 'taille': taille, 'sens': sens}
+    if sens == 'pertinence':
+        contenu['rang'] = rang
+    else:
+        contenu['date'] = date_collecte.isoformat()
+        contenu['id'] = pk
+    return signing.dumps(contenu, salt=SEL_CURSEUR, compress=True)
+
+
+def lire_curseur(jeton):
+    """Contenu d'un curseur, ou None s'il est absent, altéré ou illisible"""
+    if not jeton:
+        return None
+    try:
+        curseur = signing.loads(jeton, salt=SEL_CURSEUR)
+        if curseur['sens'] == 'pertinence':
+            return curseur if isinstance(curseur['rang'], int) and curseur['rang'] >= 0 else None
+        curseur['date'] = parse_datetime(curseur['date'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    return curseur if curseur['date'] and curseur['sens'] in ('suivant', 'precedent') else None
+
+
+def paginer_par_cle(queryset, taille, curseur=None):
+    """Page de `taille` lignes triées par (date_collecte, id) décroissants, lue par recherche de clé
+    
+    Le coût d'une page ne dépend pas de sa position : pas d'OFFSET, seulement
+    une condition sur la clé de la dernière ligne vue.
+    Renvoie (lignes, a_precedente, a_suivante).
+    """
+    if curseur is None:
+        lignes = list(queryset.order_by('-date_collecte', '-id')[:taille + 1])
+        return lignes[:taille], False, len(lignes) > taille
+    
+    date, pk = curseur['date'], curseur['id']
+    if curseur['sens'] == 'suivant':
+        lignes = list(queryset.filter(
+            Q(date_collecte__lt=date) | Q(date_collecte=date, id__lt=pk)
+        ).order_by('-date_collecte', '-id')[:taille + 1])
+        return lignes[:taille], True, len(lignes) > taille
+    
+    # Page précédente : lecture en ordre croissant depuis la clé, puis remise dans l'ordre d'affichage
+    lignes = list(queryset.filter(
+        Q(date_collecte__gt=date) | Q(date_collecte=date, id__gt=pk)
+    ).order_by('date_collecte', 'id')[:taille + 1])
+    a_precedente = len(lignes) > taille
+    lignes = lignes[:taille]
+    lignes.reverse()
+    return lignes, a_precedente, True
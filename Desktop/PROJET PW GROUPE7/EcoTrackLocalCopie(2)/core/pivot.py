@@ -0,0 +1,107 @@
+# core/pivot.py
+from django.db.models import Avg, Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Etudiant, Depense
+
+# Sources interrogeables : modèle, champ numérique agrégé par sum/avg,
+# et chemin (ou expression) de chaque dimension de regroupement
+SOURCES = {
+    'depenses': {
+        'modele': Depense,
+        'valeur': 'montant',
+        'dimensions': {
+            'quartier': 'quartier',
+            'categorie': 'categorie',
+            'sexe': 'etudiant__sexe',
+            'niveau': 'etudiant__niveau',
+            'universite': 'etudiant__universite',
+            'mois': lambda: TruncMonth('date_depense', output_field=DateField()),
+        },
+    },
+    'etudiants': {
+        'modele': Etudiant,
+        'valeur': 'age',
+        'dimensions': {
+            'quartier': 'quartier',
+            'sexe': 'sexe',
+            'niveau': 'niveau',
+            'universite': 'universite',
+            'statut': 'statut',
+            'mois': lambda: TruncMonth('date_collecte', output_field=DateField()),
+        },
+    },
+}
+
+MESURES = {
+    'count': lambda valeur: Count('id'),
+    'sum': lambda valeur: Sum(valeur),
+    'avg': lambda valeur: Avg(valeur),
+}
+
+# Préfixe des colonnes de regroupement (évite les conflits avec les champs du modèle)
+PREFIXE = 'dim_'
+
+
+def _expression(chemin):
+    return chemin() if callable(chemin) else F(chemin)
+
+
+def lire_filtres(source, parametres):
+    """Filtres demandés parmi les paramètres d'une requête : seuls ceux qui portent le nom d'une dimension de la source
+    
+    Les autres paramètres (anti-cache `_`, suivi...) sont ignorés.
+    """
+    dimensions = SOURCES.get(source, {}).get('dimensions', {})
+    return {cle: valeur for cle, valeur in parametres.items() if cle in dimensions}
+
+
+def pivoter(enqueteur, source='depenses', dimensions=(), mesures=('count',), filtres=None):
+    """Tableau croisé : regroupe par les dimensions demandées et calcule les mesures, en une seule requête SQL
+    
+    `filtres` restreint les lignes sur des dimensions simples ({'categorie': 'LOGEMENT'}).
+    Lève ValueError pour une source, une dimension ou une mesure inconnue.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Source inconnue : {source}")
+    definition = SOURCES[source]
+    
+    dimensions = list(dict.fromkeys(dimensions))
+    mesures = list(dict.fromkeys(mesures))
+    inconnues = [nom for nom in dimensions if nom not in definition['dimensions']]
+    if inconnues:
+        raise ValueError(f"Dimension inconnue pour {source} : {', '.join(inconnues)}")
+    inconnues = [nom for nom in mesures if nom not in MESURES]
+    if inconnues:
+        raise ValueError(f"Mesure inconnue : {', '.join(inconnues)}")
+    if not mesures:
+        raise ValueError("Au moins une mesure est requise")
+    
+    lignes = definition['modele'].objects.filter(enqueteur=enqueteur)
+    for nom, valeur in (filtres or {}).items():
+        chemin = definition['dimensions'].get(nom)
+        if chemin is None or callable(chemin):
+            raise ValueError(f"Filtre impossible sur : {nom}")
+        lignes = lignes.filter(**{chemin: valeur})
+    
+    agregats = {nom: MESURES[nom](definition['valeur']) for nom in mesures}
+    if dimensions:
+        colonnes = [PREFIXE + nom for nom in dimensions]
+        lignes = lignes.annotate(**{
+            PREFIXE + nom: _expression(definition['dimensions'][nom]) for nom in dimensions
+        }).values(*colonnes).annotate(**agregats).order_by(*colonnes)
+    else:
+        # Sans dimension : une seule ligne de totaux
+        lignes = [lignes.aggregate(**agregats)]
+    
+    resultat = []
+    for ligne in lignes:
+        cellule = {}
+        for nom in dimensions:
+            valeur = ligne[PREFIXE + nom]
+            cellule[nom] = valeur.strftime('%Y-%m') if nom == 'mois' and valeur else valeur
+        for nom in mesures:
+            cellule[nom] = ligne[nom] or 0
+        resultat.append(cellule)
+    
+    return {'source': source, 'dimensions': dimensions, 'mesures': mesures, 'lignes': resultat}
@@ -0,0 +1,238 @@
+# core/recherche.py
+import re
+
+from django.db import connection
+from django.db.models import F, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Index plein texte SQLite (FTS5) : un document par étudiant, avec le texte libre de ses dépenses
+TABLE_FTS = 'core_recherche_fts'
+
+# Poids des colonnes dans le classement bm25 (nom, universite, quartier, notes, depenses)
+POIDS_COLONNES = (10.0, 3.0, 3.0, 1.0, 1.0)
+
+# Nombre maximal de résultats classés par pertinence
+LIMITE_RESULTATS = 500
+
+# Colonnes du document indexé, et champs texte parcourus pour chacune quand aucun index n'est disponible
+CHAMPS_TEXTE = {
+    'nom': ('nom',),
+    'universite': ('universite',),
+    'quartier': ('quartier',),
+    'notes': ('notes',),
+    'depenses': ('depenses__lieu_precis', 'depenses__commentaire'),
+}
+
+# Champs de l'étudiant dont la similarité trigramme classe les résultats sous PostgreSQL
+CHAMPS_SIMILARITE = ('nom', 'universite', 'quartier', 'notes')
+
+SQL_CREER_INDEX = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_FTS} USING fts5(
+        enqueteur_id UNINDEXED, nom, universite, quartier, notes, depenses,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+# Document d'un étudiant (ou de tous) recalculé depuis les tables sources
+SQL_DOCUMENTS = f"""
+    INSERT INTO {TABLE_FTS} (rowid, enqueteur_id, nom, universite, quartier, notes, depenses)
+    SELECT e.id, e.enqueteur_id, e.nom, e.universite, e.quartier, e.notes,
+           COALESCE((SELECT group_concat(d.lieu_precis || ' ' || d.commentaire, ' ')
+                     FROM core_depense d WHERE d.etudiant_id = e.id), '')
+    FROM core_etudiant e
+"""
+
+
+def fts_disponible(connexion=None):
+    """Vrai si la base est SQLite et que la table FTS5 a été créée par la migration"""
+    connexion = connexion or connection
+    if connexion.vendor != 'sqlite':
+        return False
+    # Seule une réponse positive est mémorisée (par base) : la table ne disparaît pas
+    base = connexion.settings_dict['NAME']
+    if getattr(connexion, '_fts_disponible', None) == base:
+        return True
+    with connexion.cursor() as curseur:
+        curseur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLE_FTS])
+        disponible = curseur.fetchone() is not None
+    if disponible:
+        connexion._fts_disponible = base
+    return disponible
+
+
+def reconstruire_index(connexion=None):
+    """Reconstruit entièrement l'index plein texte (migration, réparation)"""
+    connexion = connexion or connection
+    with connexion.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE_FTS}")
+        curseur.execute(SQL_DOCUMENTS)
+
+
+def indexer_etudiant(etudiant_id):
+    """Met à jour le document d'un étudiant (supprimé de l'index s'il n'existe plus)"""
+    if not fts_disponible():
+        return
+    with connection.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE_FTS} WHERE rowid = %s", [etudiant_id])
+        curseur.execute(SQL_DOCUMENTS + " WHERE e.id = %s", [etudiant_id])
+
+
+def requete_fts(texte, colonnes=None):
+    """Requête FTS5 : chaque mot doit apparaître, en correspondance de préfixe ("mot"*)
+    
+    Avec `colonnes`, les mots ne sont cherchés que dans ces colonnes du document.
+    """
+    mots = re.findall(r'\w+', texte)
+    filtre = '{%s} : ' % ' '.join(colonnes) if colonnes else ''
+    return ' '.join(f'{filtre}"{mot}"*' for mot in mots)
+
+
+def _ids_fts(enqueteur, texte, limite, decalage=0, etudiants=None, colonnes=None):
+    requete = requete_fts(texte, colonnes)
+    if not requete:
+        return []
+    poids = ', '.join(str(p) for p in POIDS_COLONNES)
+    sql = f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s AND enqueteur_id = %s"
+    parametres = [requete, enqueteur.pk]
+    if etudiants is not None:
+        # Filtres supplémentaires (quartier, sexe...) appliqués avant le classement et la pagination
+        sous_requete, parametres_sous_requete = etudiants.values('id').query.sql_with_params()
+        sql += f" AND rowid IN ({sous_requete})"
+        parametres.extend(parametres_sous_requete)
+    with connection.cursor() as curseur:
+        curseur.execute(
+            # LIMIT -1 : pas de limite en SQLite
+            f"{sql} ORDER BY bm25({TABLE_FTS}, 0, {poids}), rowid LIMIT %s OFFSET %s",
+            [*parametres, -1 if limite is None else limite, decalage],
+        )
+        return [ligne[0] for ligne in curseur.fetchall()]
+
+
+def _tranche(queryset, limite, decalage):
+    return queryset[decalage:] if limite is None else queryset[decalage:decalage + limite]
+
+
+class ContientSansCasse(Lookup):
+    """`champ ILIKE '%texte%'` (PostgreSQL)
+    
+    icontains produit UPPER(champ) LIKE UPPER(...), qu'un index GIN gin_trgm_ops
+    sur la colonne ne sert pas ; ILIKE, si.
+    """
+    lookup_name = 'contient_sans_casse'
+    
+    def as_sql(self, compiler, connexion):
+        lhs, lhs_params = self.process_lhs(compiler, connexion)
+        rhs, rhs_params = self.process_rhs(compiler, connexion)
+        return f"{lhs} ILIKE {rhs}", [*lhs_params, *rhs_params]
+
+
+def _proche(champ, texte):
+    """Champ similaire au texte (opérateur % de pg_trgm) ou le contenant (ILIKE) : deux conditions servies par l'index GIN"""
+    from django.contrib.postgres.lookups import TrigramSimilar
+    
+    motif = f"%{connection.ops.prep_for_like_query(texte)}%"
+    return Q(TrigramSimilar(F(champ), texte)) | Q(ContientSansCasse(F(champ), motif))
+
+
+def _condition_trigrammes(enqueteur, texte, colonnes=None):
+    """Condition de correspondance sous PostgreSQL, sur les mêmes colonnes que le document plein texte
+    
+    Le seuil de similarité est celui de pg_trgm (pg_trgm.similarity_threshold, 0,3 par défaut).
+    """
+    from .models import Depense
+    
+    condition = Q(pk__in=[])
+    for colonne, champs in CHAMPS_TEXTE.items():
+        if colonnes and colonne not in colonnes:
+            continue
+        if colonne == 'depenses':
+            # Sous-requête sur core_depense : index trigrammes de lieu_precis et commentaire
+            depenses = Depense.objects.filter(enqueteur=enqueteur).filter(
+                _proche('lieu_precis', texte) | _proche('commentaire', texte)
+            )
+            condition |= Q(id__in=depenses.values('etudiant_id'))
+        else:
+            for champ in champs:
+                condition |= _proche(champ, texte)
+    return condition
+
+
+def _ids_trigrammes(enqueteur, etudiants, texte, limite, decalage=0, colonnes=None):
+    """Correspondances filtrées par index, puis classées par similarité (calculée sur les seules lignes retenues)"""
+    # Import différé : django.contrib.postgres exige le pilote PostgreSQL
+    from django.contrib.postgres.search import TrigramSimilarity
+    from django.db.models.functions import Greatest
+    
+    similarites = [TrigramSimilarity(champ, texte) for champ in CHAMPS_SIMILARITE if not colonnes or champ in colonnes]
+    if not similarites:
+        similarite = Value(0.0)
+    elif len(similarites) > 1:
+        similarite = Greatest(*similarites)
+    else:
+        similarite = similarites[0]
+    return list(_tranche(
+        etudiants.filter(_condition_trigrammes(enqueteur, texte, colonnes))
+        .annotate(similarite=similarite)
+        .order_by(F('similarite').desc(nulls_last=True), 'id')
+        .values_list('id', flat=True),
+        limite, decalage,
+    ))
+
+
+def _condition_texte(texte, colonnes=None):
+    condition = Q()
+    for colonne, champs in CHAMPS_TEXTE.items():
+        if not colonnes or colonne in colonnes:
+            for champ in champs:
+                condition |= Q(**{f'{champ}__icontains': texte})
+    return condition
+
+
+def rechercher(enqueteur, texte, etudiants=None, limite=LIMITE_RESULTATS, decalage=0, colonnes=None):
+    """Identifiants des étudiants de l'enquêteur correspondant au texte, du plus au moins pertinent
+    
+    `etudiants` restreint la recherche (filtres de la liste) ; `limite` et `decalage`
+    découpent le classement en pages dans la base (`limite=None` : toutes les correspondances) ;
+    `colonnes` limite la recherche à certaines colonnes du document (ex. ('nom',)).
+    - SQLite : index FTS5, préfixes et classement bm25 ;
+    - PostgreSQL : opérateurs trigrammes servis par les index GIN (pg_trgm), classement par similarité ;
+    - sinon : recherche `icontains`, sans classement (plus récents d'abord).
+    """
+    from .models import Etudiant
+    
+    if fts_disponible():
+        return _ids_fts(enqueteur, texte, limite, decalage, etudiants, colonnes)
+    
+    if etudiants is None:
+        etudiants = Etudiant.objects.filter(enqueteur=enqueteur)
+    if connection.vendor == 'postgresql':
+        return _ids_trigrammes(enqueteur, etudiants, texte, limite, decalage, colonnes)
+    
+    return list(_tranche(
+        etudiants.filter(_condition_texte(texte, colonnes)).distinct()
+        .order_by('-date_collecte', '-id').values_list('id', flat=True),
+        limite, decalage,
+    ))
+
+
+def filtre_recherche(enqueteur, texte, colonnes=None):
+    """Condition (Q) « correspond au texte », évaluée dans la base par une sous-requête
+    
+    À combiner avec d'autres filtres et une pagination par clé : les identifiants
+    ne transitent pas par Python, quel que soit le nombre de correspondances.
+    """
+    from .models import Etudiant
+    
+    if fts_disponible():
+        requete = requete_fts(texte, colonnes)
+        if not requete:
+            return Q(pk__in=[])
+        return Q(id__in=RawSQL(
+            f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s AND enqueteur_id = %s",
+            [requete, enqueteur.pk],
+        ))
+    
+    etudiants = Etudiant.objects.filter(enqueteur=enqueteur)
+    if connection.vendor == 'postgresql':
+        return Q(id__in=etudiants.filter(_condition_trigrammes(enqueteur, texte, colonnes)).values('id'))
+    return Q(id__in=etudiants.filter(_condition_texte(texte, colonnes)).values('id'))
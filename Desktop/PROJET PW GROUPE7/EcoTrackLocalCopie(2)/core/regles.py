@@ -0,0 +1,118 @@
+# core/regles.py
+from django.db.models import Q
+from .models import Etudiant, Depense
+
+# Registre des règles appliquées par DetecteurAnomalies.detecter_regles()
+REGLES = []
+
+
+def enregistrer(regle):
+    """Ajoute une règle au registre"""
+    REGLES.append(regle)
+    return regle
+
+
+class Regle:
+    """Règle d'anomalie déclarative, traduite en filtre ORM et évaluée par la base"""
+    modele = None
+    code = ''
+    type_anomalie = 'INCOHERENCE'
+    gravite = 'MOYENNE'
+    solution = ''
+    
+    def filtre(self):
+        """Condition (Q) vérifiée par les lignes en anomalie"""
+        raise NotImplementedError
+    
+    def description(self, objet):
+        raise NotImplementedError
+    
+    def evaluer(self, queryset):
+        """Lignes du queryset qui enfreignent la règle (une seule requête)"""
+        return queryset.filter(self.filtre())
+
+
+class RegleAgeNiveau(Regle):
+    """Âge hors de la tranche attendue pour un niveau d'études"""
+    modele = Etudiant
+    code = 'age_niveau'
+    type_anomalie = 'INCOHERENCE'
+    gravite = 'MOYENNE'
+    solution = "Vérifier l'âge ou le niveau de l'étudiant"
+    
+    def __init__(self, niveau, age_min, age_max):
+        self.niveau = niveau
+        self.age_min = age_min
+        self.age_max = age_max
+    
+    def filtre(self):
+        return Q(niveau=self.niveau) & (Q(age__lt=self.age_min) | Q(age__gt=self.age_max))
+    
+    def description(self, etudiant):
+        return f"Âge ({etudiant.age} ans) atypique pour {etudiant.get_niveau_display()}"
+
+
+class RegleZoneGps(Regle):
+    """Coordonnées GPS renseignées mais situées hors de la zone d'enquête"""
+    modele = Etudiant
+    code = 'gps_hors_zone'
+    type_anomalie = 'ERREUR_SAISIE'
+    gravite = 'FAIBLE'
+    solution = "Vérifier les coordonnées GPS (inversion latitude/longitude ?)"
+    
+    def __init__(self, nom_zone, lat_min, lat_max, lng_min, lng_max):
+        self.nom_zone = nom_zone
+        self.lat_min = lat_min
+        self.lat_max = lat_max
+        self.lng_min = lng_min
+        self.lng_max = lng_max
+    
+    def filtre(self):
+        hors_zone = Q(gps_lat__lt=self.lat_min) | Q(gps_lat__gt=self.lat_max) \
+            | Q(gps_lng__lt=self.lng_min) | Q(gps_lng__gt=self.lng_max)
+        return Q(gps_lat__isnull=False, gps_lng__isnull=False) & hors_zone
+    
+    def description(self, etudiant):
+        return f"Position GPS hors de {self.nom_zone} pour {etudiant.nom} ({etudiant.gps_lat}, {etudiant.gps_lng})"
+
+
+class RegleMontant(Regle):
+    """Montant hors d'un intervalle fixe, pour une catégorie ou pour toutes"""
+    modele = Depense
+    type_anomalie = 'ERREUR_SAISIE'
+    gravite = 'ELEVEE'
+    solution = "Corriger le montant saisi"
+    
+    def __init__(self, code, minimum=None, maximum=None, categorie=None):
+        self.code = code
+        self.minimum = minimum
+        self.maximum = maximum
+        self.categorie = categorie
+    
+    def filtre(self):
+        hors_limites = Q(pk__in=[])
+        if self.minimum is not None:
+            hors_limites |= Q(montant__lt=self.minimum)
+        if self.maximum is not None:
+            hors_limites |= Q(montant__gt=self.maximum)
+        if self.categorie:
+            return Q(categorie=self.categorie) & hors_limites
+        return hors_limites
+    
+    def description(self, depense):
+        return f"Montant invraisemblable en {depense.get_categorie_display()}: {depense.montant} FCFA"
+
+
+# ===== RÈGLES PAR DÉFAUT =====
+for niveau, age_min, age_max in [
+    ('L1', 18, 25),
+    ('L2', 19, 26),
+    ('L3', 20, 27),
+    ('M1', 21, 30),
+    ('M2', 22, 31),
+    ('D', 23, 40),
+]:
+    enregistrer(RegleAgeNiveau(niveau, age_min, age_max))
+
+enregistrer(RegleZoneGps('Yaoundé', lat_min=3.70, lat_max=4.05, lng_min=11.35, lng_max=11.65))
+enregistrer(RegleMontant('montant_invraisemblable', minimum=1, maximum=1000000))
@@ -0,0 +1,164 @@
+# core/signals.py
+from collections import Counter
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Etudiant, Depense, Anomalie, ResumeEnqueteur
+from .agregats import marquer_jours
+from .flux import signaler_modification
+from .recherche import indexer_etudiant
+
+# Compteur du résumé correspondant à chaque valeur
+CHAMP_SEXE = {'M': 'nb_hommes', 'F': 'nb_femmes'}
+CHAMP_STATUT_ANOMALIE = {'A_TRAITER': 'nb_anomalies_ouvertes', 'RESOLUE': 'nb_anomalies_resolues'}
+
+
+def _memoriser(instance, *champs):
+    """Conserve sur l'instance les valeurs enregistrées avant modification"""
+    instance._avant = None
+    if instance.pk:
+        instance._avant = type(instance).objects.filter(pk=instance.pk).values(*champs).first()
+
+
+def _appliquer(variations):
+    """Applique les variations regroupées par enquêteur ({enqueteur_id: Counter})
+    
+    Toute écriture fait aussi avancer la version des données de l'enquêteur
+    et réveille ses connexions temps réel.
+    """
+    for enqueteur_id, compteurs in variations.items():
+        ResumeEnqueteur.incrementer(enqueteur_id, version=1, **compteurs)
+        signaler_modification(enqueteur_id)
+
+
+# ===== ÉTUDIANTS =====
+def _variations_etudiant(variations, etat, signe, pk, quartier=True):
+    """Ajoute (+1) ou retire (-1) l'étudiant `pk` des compteurs de son enquêteur
+    
+    Avec `quartier=False`, le nombre de quartiers n'est pas recompté
+    (l'étudiant reste dans le même quartier du même enquêteur).
+    """
+    compteurs = variations.setdefault(etat['enqueteur_id'], Counter())
+    compteurs['nb_etudiants'] += signe
+    if etat['sexe'] in CHAMP_SEXE:
+        compteurs[CHAMP_SEXE[etat['sexe']]] += signe
+    
+    # Le quartier ne compte que pour le premier (ou le dernier) étudiant qui y habite,
+    # l'étudiant lui-même étant exclu des deux côtés (la base contient déjà son nouvel état)
+    if quartier and not Etudiant.objects.filter(
+        enqueteur_id=etat['enqueteur_id'], quartier=etat['quartier']
+    ).exclude(pk=pk).exists():
+        compteurs['nb_quartiers'] += signe
+
+
+@receiver(pre_save, sender=Etudiant)
+def etudiant_avant_sauvegarde(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _memoriser(instance, 'enqueteur_id', 'sexe', 'quartier')
+
+
+@receiver(post_save, sender=Etudiant)
+def etudiant_sauvegarde(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    
+    indexer_etudiant(instance.pk)
+    
+    nouvel_etat = {'enqueteur_id': instance.enqueteur_id, 'sexe': instance.sexe, 'quartier': instance.quartier}
+    ancien_etat = getattr(instance, '_avant', None)
+    if ancien_etat == nouvel_etat:
+        # Aucun compteur ne change, mais les données ont changé
+        _appliquer({instance.enqueteur_id: Counter()})
+        return
+    
+    variations = {}
+    meme_quartier = bool(ancien_etat) and all(
+        ancien_etat[champ] == nouvel_etat[champ] for champ in ('enqueteur_id', 'quartier')
+    )
+    if ancien_etat:
+        _variations_etudiant(variations, ancien_etat, -1, instance.pk, quartier=not meme_quartier)
+    _variations_etudiant(variations, nouvel_etat, +1, instance.pk, quartier=not meme_quartier)
+    _appliquer(variations)
+
+
+@receiver(post_delete, sender=Etudiant)
+def etudiant_supprime(sender, instance, **kwargs):
+    indexer_etudiant(instance.pk)
+    variations = {}
+    _variations_etudiant(variations, {
+        'enqueteur_id': instance.enqueteur_id,
+        'sexe': instance.sexe,
+        'quartier': instance.quartier,
+    }, -1, instance.pk)
+    _appliquer(variations)
+
+
+# ===== DÉPENSES =====
+@receiver(pre_save, sender=Depense)
+def depense_avant_sauvegarde(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _memoriser(instance, 'enqueteur_id', 'etudiant_id', 'montant', 'date_depense')
+
+
+@receiver(post_save, sender=Depense)
+def depense_sauvegardee(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    
+    variations = {}
+    jours = {(instance.enqueteur_id, instance.date_depense)}
+    ancien_etat = getattr(instance, '_avant', None)
+    if ancien_etat:
+        compteurs = variations.setdefault(ancien_etat['enqueteur_id'], Counter())
+        compteurs['nb_depenses'] -= 1
+        compteurs['montant_total'] -= ancien_etat['montant']
+        jours.add((ancien_etat['enqueteur_id'], ancien_etat['date_depense']))
+    
+    compteurs = variations.setdefault(instance.enqueteur_id, Counter())
+    compteurs['nb_depenses'] += 1
+    compteurs['montant_total'] += float(instance.montant)
+    _appliquer(variations)
+    # Les agrégats journaliers de ces jours sont à recalculer
+    marquer_jours(jours)
+    
+    # Le texte des dépenses fait partie du document plein texte de l'étudiant
+    indexer_etudiant(instance.etudiant_id)
+    if ancien_etat and ancien_etat['etudiant_id'] != instance.etudiant_id:
+        indexer_etudiant(ancien_etat['etudiant_id'])
+
+
+@receiver(post_delete, sender=Depense)
+def depense_supprimee(sender, instance, **kwargs):
+    _appliquer({instance.enqueteur_id: Counter(nb_depenses=-1, montant_total=-instance.montant)})
+    marquer_jours({(instance.enqueteur_id, instance.date_depense)})
+    indexer_etudiant(instance.etudiant_id)
+
+
+# ===== ANOMALIES =====
+@receiver(pre_save, sender=Anomalie)
+def anomalie_avant_sauvegarde(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _memoriser(instance, 'enqueteur_id', 'statut')
+
+
+@receiver(post_save, sender=Anomalie)
+def anomalie_sauvegardee(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    
+    variations = {instance.enqueteur_id: Counter()}
+    ancien_etat = getattr(instance, '_avant', None)
+    if ancien_etat and ancien_etat['statut'] in CHAMP_STATUT_ANOMALIE:
+        variations.setdefault(ancien_etat['enqueteur_id'], Counter())[CHAMP_STATUT_ANOMALIE[ancien_etat['statut']]] -= 1
+    if instance.statut in CHAMP_STATUT_ANOMALIE:
+        variations.setdefault(instance.enqueteur_id, Counter())[CHAMP_STATUT_ANOMALIE[instance.statut]] += 1
+    _appliquer(variations)
+
+
+@receiver(post_delete, sender=Anomalie)
+def anomalie_supprimee(sender, instance, **kwargs):
+    variations = {instance.enqueteur_id: Counter()}
+    if instance.statut in CHAMP_STATUT_ANOMALIE:
+        variations[instance.enqueteur_id][CHAMP_STATUT_ANOMALIE[instance.statut]] -= 1
+    _appliquer(variations)
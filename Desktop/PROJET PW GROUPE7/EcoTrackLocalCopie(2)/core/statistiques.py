@@ -0,0 +1,214 @@
+# core/statistiques.py
+from datetime import timedelta
+
+from django.db.models import Avg, Count, DateField, ExpressionWrapper, FloatField, IntegerField, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Etudiant, Depense, Anomalie, ResumeEnqueteur, AgregatDepenseJour
+from .agregats import rafraichir_agregats
+from .moteur_statistique import charger_montants, distributions
+
+
+def stats_etudiants(enqueteur):
+    """Indicateurs sur les étudiants, en une seule requête (agrégation conditionnelle)"""
+    debut_mois = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return Etudiant.objects.filter(enqueteur=enqueteur).aggregate(
+        nb_etudiants=Count('id'),
+        nb_hommes=Count('id', filter=Q(sexe='M')),
+        nb_femmes=Count('id', filter=Q(sexe='F')),
+        nb_quartiers=Count('quartier', distinct=True),
+        etudiants_ce_mois=Count('id', filter=Q(date_collecte__gte=debut_mois)),
+    )
+
+
+def stats_depenses(enqueteur):
+    """Indicateurs sur les dépenses, en une seule requête"""
+    stats = Depense.objects.filter(enqueteur=enqueteur).aggregate(
+        nb_depenses=Count('id'),
+        montant_total=Sum('montant'),
+        moyenne_depenses=Avg('montant'),
+    )
+    stats['montant_total'] = stats['montant_total'] or 0
+    stats['moyenne_depenses'] = stats['moyenne_depenses'] or 0
+    return stats
+
+
+def stats_anomalies(enqueteur):
+    """Indicateurs sur les anomalies (par statut et gravité), en une seule requête"""
+    a_traiter = Q(statut='A_TRAITER')
+    return Anomalie.objects.filter(enqueteur=enqueteur).aggregate(
+        nb_anomalies=Count('id'),
+        nb_anomalies_ouvertes=Count('id', filter=a_traiter),
+        anomalies_critiques=Count('id', filter=a_traiter & Q(gravite='ELEVEE')),
+        anomalies_moyennes=Count('id', filter=a_traiter & Q(gravite='MOYENNE')),
+        anomalies_faibles=Count('id', filter=a_traiter & Q(gravite='FAIBLE')),
+        nb_anomalies_resolues=Count('id', filter=Q(statut='RESOLUE')),
+    )
+
+
+def calculer_kpis(enqueteur):
+    """Tous les indicateurs d'un enquêteur, recalculés : trois requêtes au total"""
+    return {
+        **stats_etudiants(enqueteur),
+        **stats_depenses(enqueteur),
+        **stats_anomalies(enqueteur),
+    }
+
+
+def nb_depenses_par_etudiant(etudiant_ids):
+    """Nombre de dépenses de chaque étudiant ({id: nombre}), en une requête restreinte à ces ids
+    
+    Sert aux pages de listes : le comptage porte sur la page affichée, pas sur toute la table.
+    """
+    return dict(
+        Depense.objects.filter(etudiant_id__in=etudiant_ids)
+        .values('etudiant_id')
+        .annotate(nombre=Count('id'))
+        .values_list('etudiant_id', 'nombre')
+        .order_by()
+    )
+
+
+def resume_enqueteur(enqueteur):
+    """Compteurs pré-calculés (ResumeEnqueteur) : une seule ligne lue"""
+    return ResumeEnqueteur.pour(enqueteur)
+
+
+def _agregat_depenses(agregats, fonction, type_sortie):
+    """Sous-requête corrélée : agrégat des dépenses du quartier de la ligne externe"""
+    return Subquery(
+        agregats.filter(quartier=OuterRef('quartier'))
+        .values('quartier')
+        .annotate(valeur=fonction)
+        .values('valeur'),
+        output_field=type_sortie,
+    )
+
+
+def stats_par_quartier(enqueteur, quartiers=None, categorie=None):
+    """Indicateurs étudiants + dépenses par quartier, en une seule requête groupée
+    
+    Les agrégats de dépenses sont lus dans la table de cumul journalier
+    et joints en SQL par sous-requêtes corrélées sur le quartier.
+    """
+    rafraichir_agregats(enqueteur)
+    agregats = AgregatDepenseJour.objects.filter(enqueteur=enqueteur)
+    if categorie:
+        agregats = agregats.filter(categorie=categorie)
+    
+    etudiants = Etudiant.objects.filter(enqueteur=enqueteur).exclude(quartier='')
+    if quartiers is not None:
+        etudiants = etudiants.filter(quartier__in=quartiers)
+    
+    moyenne = ExpressionWrapper(Sum('total') / Sum('nombre'), output_field=FloatField())
+    return etudiants.values('quartier').annotate(
+        nb_etudiants=Count('id'),
+        nb_hommes=Count('id', filter=Q(sexe='M')),
+        nb_femmes=Count('id', filter=Q(sexe='F')),
+        age_moyen=Avg('age'),
+        nb_depenses=Coalesce(_agregat_depenses(agregats, Sum('nombre'), IntegerField()), 0),
+        total_depenses=Coalesce(_agregat_depenses(agregats, Sum('total'), FloatField()), 0.0),
+        moyenne_depenses=Coalesce(_agregat_depenses(agregats, moyenne, FloatField()), 0.0),
+        depense_max=Coalesce(_agregat_depenses(agregats, Max('maximum'), FloatField()), 0.0),
+        depense_min=Coalesce(_agregat_depenses(agregats, Min('minimum'), FloatField()), 0.0),
+    ).order_by('-moyenne_depenses')
+
+
+# Granularité -> (fonction de troncature SQL, libellé d'un intervalle)
+GRANULARITES = {
+    'jour': (TruncDay, '%a'),
+    'semaine': (TruncWeek, '%d/%m'),
+    'mois': (TruncMonth, '%m/%Y'),
+}
+
+# Nombre maximal d'intervalles demandés à l'API d'évolution
+PERIODE_MAX_EVOLUTION = 366
+
+
+def _debut_intervalle(jour, granularite):
+    """Premier jour de l'intervalle (jour, semaine ISO ou mois) contenant `jour`"""
+    if granularite == 'semaine':
+        return jour - timedelta(days=jour.weekday())
+    if granularite == 'mois':
+        return jour.replace(day=1)
+    return jour
+
+
+def _intervalle_precedent(debut, granularite):
+    if granularite == 'semaine':
+        return debut - timedelta(weeks=1)
+    if granularite == 'mois':
+        return (debut - timedelta(days=1)).replace(day=1)
+    return debut - timedelta(days=1)
+
+
+def evolution_depenses(enqueteur, granularite='jour', periode=7, categorie=None, quartier=None):
+    """Totaux des dépenses sur les `periode` derniers intervalles (par date de dépense)
+    
+    Une seule requête groupée sur la table de cumul journalier ; renvoie une liste
+    [(début d'intervalle, total)] du plus ancien au plus récent, les intervalles
+    sans dépense étant complétés à 0 en Python.
+    """
+    tronquer, _ = GRANULARITES[granularite]
+    
+    debuts = [_debut_intervalle(timezone.localdate(), granularite)]
+    for _ in range(periode - 1):
+        debuts.append(_intervalle_precedent(debuts[-1], granularite))
+    debuts.reverse()
+    
+    rafraichir_agregats(enqueteur)
+    agregats = AgregatDepenseJour.objects.filter(
+        enqueteur=enqueteur,
+        date_depense__gte=debuts[0],
+    )
+    if categorie:
+        agregats = agregats.filter(categorie=categorie)
+    if quartier:
+        agregats = agregats.filter(quartier=quartier)
+    
+    totaux = dict(
+        agregats.annotate(intervalle=tronquer('date_depense', output_field=DateField()))
+        .values('intervalle')
+        .annotate(somme=Sum('total'))
+        .values_list('intervalle', 'somme')
+    )
+    
+    return [(debut, float(totaux.get(debut) or 0)) for debut in debuts]
+
+
+# Dimensions possibles pour les distributions de montants
+DIMENSIONS_DISTRIBUTION = ('quartier', 'categorie')
+
+
+def distributions_depenses(enqueteur, par='quartier', categorie=None, quartiers=None, nb_classes=10):
+    """Médiane, P10/P90, écart-type et histogramme des montants par quartier ou catégorie
+    
+    Les montants sont lus en une seule requête (colonnes seules), le calcul est vectorisé.
+    """
+    depenses = Depense.objects.filter(enqueteur=enqueteur)
+    if categorie:
+        depenses = depenses.filter(categorie=categorie)
+    if quartiers is not None:
+        depenses = depenses.filter(quartier__in=quartiers)
+    
+    montants = charger_montants(depenses, champs=(par, 'montant'))
+    if montants.empty:
+        return {'bornes_classes': [], 'groupes': {}}
+    
+    resume, bornes, histogrammes = distributions(montants, par=par, nb_classes=nb_classes)
+    return {
+        'bornes_classes': [round(borne, 2) for borne in bornes.tolist()],
+        'groupes': {
+            groupe: {
+                'effectif': int(ligne.effectif),
+                'moyenne': float(ligne.moyenne),
+                'ecart_type': float(ligne.ecart_type),
+                'p10': float(ligne.p10),
+                'mediane': float(ligne.mediane),
+                'p90': float(ligne.p90),
+                'histogramme': histogrammes[groupe],
+            }
+            for groupe, ligne in resume.iterrows()
+        },
+    }
@@ -0,0 +1,138 @@
+# core/taches.py
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+from .models import Enqueteur, TacheDetection
+from .detecteur_anomalies import DetecteurAnomalies
+
+# Au-delà, une tâche EN_COURS est considérée comme abandonnée (worker arrêté ou planté)
+DELAI_TACHE_BLOQUEE = timedelta(minutes=30)
+
+# Durée de conservation des tâches finies (la dernière détection terminée de chaque enquêteur est toujours gardée)
+DUREE_CONSERVATION_TACHES = timedelta(days=7)
+
+
+def planifier_detection(enqueteur, incremental=True):
+    """Ajoute une détection à la file d'attente (une seule tâche en attente par enquêteur)"""
+    while True:
+        tache = TacheDetection.objects.filter(enqueteur=enqueteur, statut='EN_ATTENTE').first()
+        if tache is not None:
+            break
+        try:
+            with transaction.atomic():
+                return TacheDetection.objects.create(enqueteur=enqueteur, incremental=incremental)
+        except IntegrityError:
+            # Une requête concurrente vient de mettre la détection en file : on reprend sa tâche
+            continue
+    
+    # Une demande d'analyse complète l'emporte sur une analyse incrémentale déjà prévue
+    if tache.incremental and not incremental:
+        TacheDetection.objects.filter(pk=tache.pk, statut='EN_ATTENTE').update(incremental=False)
+        tache.incremental = False
+    return tache
+
+
+def planifier_detection_globale(incremental=False):
+    """Planifie une détection pour chaque enquêteur (à lancer périodiquement)"""
+    return [planifier_detection(enqueteur, incremental) for enqueteur in Enqueteur.objects.all()]
+
+
+def recuperer_taches_bloquees(delai=DELAI_TACHE_BLOQUEE):
+    """Remet en file les tâches restées EN_COURS au-delà du délai, et renvoie leur nombre
+    
+    Si une autre détection attend déjà pour le même enquêteur, la tâche abandonnée est close en échec.
+    """
+    maintenant = timezone.now()
+    recuperees = 0
+    for tache in TacheDetection.objects.filter(statut='EN_COURS', date_debut__lt=maintenant - delai):
+        if TacheDetection.objects.filter(enqueteur_id=tache.enqueteur_id, statut='EN_ATTENTE').exists():
+            changements = {'statut': 'ECHEC', 'erreur': "Interrompue (worker arrêté)", 'date_fin': maintenant}
+        else:
+            changements = {'statut': 'EN_ATTENTE', 'date_debut': None}
+        # Mise à jour conditionnelle : la tâche a pu se terminer entre-temps
+        try:
+            with transaction.atomic():
+                recuperees += TacheDetection.objects.filter(pk=tache.pk, statut='EN_COURS').update(**changements)
+        except IntegrityError:
+            # Une autre détection vient d'être mise en file pour cet enquêteur
+            changements = {'statut': 'ECHEC', 'erreur': "Interrompue (worker arrêté)", 'date_fin': maintenant}
+            recuperees += TacheDetection.objects.filter(pk=tache.pk, statut='EN_COURS').update(**changements)
+    return recuperees
+
+
+def purger_taches(duree=DUREE_CONSERVATION_TACHES):
+    """Supprime les tâches finies depuis plus de `duree`, et renvoie leur nombre
+    
+    La dernière détection terminée de chaque enquêteur est conservée (date affichée par etat_detection).
+    """
+    derniere = TacheDetection.objects.filter(enqueteur=OuterRef('enqueteur'), statut='TERMINEE')\
+                                     .order_by('-date_fin', '-id')\
+                                     .values('pk')[:1]
+    dernieres = TacheDetection.objects.filter(pk=Subquery(derniere)).values('pk')
+    supprimees, _ = TacheDetection.objects.filter(
+        statut__in=('TERMINEE', 'ECHEC'),
+        date_fin__lt=timezone.now() - duree,
+    ).exclude(pk__in=dernieres).delete()
+    return supprimees
+
+
+def prendre_tache():
+    """Réserve la plus ancienne tâche en attente, ou None si la file est vide"""
+    while True:
+        tache = TacheDetection.objects.filter(statut='EN_ATTENTE').order_by('date_creation', 'id').first()
+        if tache is None:
+            return None
+        
+        # La mise à jour conditionnelle garantit qu'un seul worker obtient la tâche
+        reservee = TacheDetection.objects.filter(pk=tache.pk, statut='EN_ATTENTE')\
+                                         .update(statut='EN_COURS', date_debut=timezone.now())
+        if reservee:
+            tache.statut = 'EN_COURS'
+            return tache
+
+
+def executer_tache(tache):
+    """Exécute une tâche réservée et enregistre son résultat"""
+    try:
+        detecteur = DetecteurAnomalies(tache.enqueteur)
+        nouvelles = detecteur.creer_anomalies_bd(incremental=tache.incremental)
+        tache.statut = 'TERMINEE'
+        tache.nb_anomalies = len(nouvelles)
+    except Exception as e:
+        tache.statut = 'ECHEC'
+        tache.erreur = str(e)
+    
+    tache.date_fin = timezone.now()
+    tache.save(update_fields=['statut', 'nb_anomalies', 'erreur', 'date_fin'])
+    return tache
+
+
+def traiter_taches(limite=None, conservation=DUREE_CONSERVATION_TACHES):
+    """Vide la file d'attente (après avoir repris les tâches abandonnées et purgé les anciennes) et renvoie les tâches traitées"""
+    recuperer_taches_bloquees()
+    purger_taches(conservation)
+    traitees = []
+    while limite is None or len(traitees) < limite:
+        tache = prendre_tache()
+        if tache is None:
+            break
+        traitees.append(executer_tache(tache))
+    return traitees
+
+
+def etat_detection(enqueteur):
+    """Date de la dernière détection terminée et présence d'une détection en cours"""
+    derniere = TacheDetection.objects.filter(enqueteur=enqueteur, statut='TERMINEE')\
+                                     .order_by('-date_fin')\
+                                     .values_list('date_fin', flat=True)\
+                                     .first()
+    # Une tâche EN_COURS depuis trop longtemps a été abandonnée : elle n'est plus « en cours »
+    en_cours = TacheDetection.objects.filter(enqueteur=enqueteur).filter(
+        Q(statut='EN_ATTENTE') | Q(statut='EN_COURS', date_debut__gte=timezone.now() - DELAI_TACHE_BLOQUEE)
+    ).exists()
+    return {
+        'derniere_detection': derniere,
+        'detection_en_cours': en_cours,
+    }
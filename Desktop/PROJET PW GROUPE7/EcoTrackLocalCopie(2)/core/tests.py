@@ -1,3 +1,1694 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import itertools
+import json
+import unittest
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg, Count, Max, Min, QuerySet, Sum
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import flux, geo, recherche
+from .benchmark import executer_benchmark, methodes_detection
+from .normalisation import calculer_cle_identite, cle_phonetique, code_phonetique, mots_tries, normaliser_texte
+from .models import (
+    AgregatDepenseJour, Anomalie, BorneMontant, Depense, Enqueteur, Etudiant, JourModifie, ResumeEnqueteur, TacheDetection,
+)
+from .detecteur_anomalies import DUREE_VALIDITE_BORNES, DetecteurAnomalies
+from .management.commands.scanner_anomalies import scanner_enqueteur
+from .doublons import paires_candidates, quasi_doublons, similarite
+from .moteur_statistique import bornes_robustes, detecter_valeurs_aberrantes, distributions
+from .regles import REGLES, RegleAgeNiveau, RegleMontant, RegleZoneGps
+from .agregats import rafraichir_agregats
+from .cache_stats import cache_statistiques, en_cache
+from .statistiques import calculer_kpis, distributions_depenses, evolution_depenses, stats_par_quartier
+from .taches import (
+    DELAI_TACHE_BLOQUEE, DUREE_CONSERVATION_TACHES, etat_detection, planifier_detection, prendre_tache, purger_taches,
+    recuperer_taches_bloquees, traiter_taches,
+)
+
+
+class DonneesMixin:
+    """Création rapide d'enquêteurs, d'étudiants et de dépenses pour les tests"""
+    
+    # Codes d'enquête uniques, même après des suppressions
+    numeros = itertools.count(1)
+    
+    @staticmethod
+    def creer_enqueteur(nom):
+        user = User.objects.create_user(nom, password='x')
+        return Enqueteur.objects.create(user=user, matricule=nom.upper(), telephone='000')
+    
+    @staticmethod
+    def creer_etudiant(enqueteur, **champs):
+        valeurs = {
+            'code_enquete': f"E{next(DonneesMixin.numeros):05d}",
+            'nom': 'Ngono Marie', 'age': 20, 'sexe': 'F', 'niveau': 'L2',
+            'universite': 'Université de Yaoundé I', 'quartier': 'Melen',
+        }
+        valeurs.update(champs)
+        return Etudiant.objects.create(enqueteur=enqueteur, **valeurs)
+    
+    @staticmethod
+    def creer_depense(etudiant, **champs):
+        valeurs = {'categorie': 'NOURRITURE', 'montant': 1000, 'quartier': etudiant.quartier}
+        valeurs.update(champs)
+        return Depense.objects.create(etudiant=etudiant, enqueteur=etudiant.enqueteur, **valeurs)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "Plans d'exécution vérifiés avec EXPLAIN QUERY PLAN (SQLite)")
+class PlansRequetesTests(TestCase):
+    """Les requêtes fréquentes des vues doivent passer par un index composite, jamais par un parcours complet"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('plans', password='x')
+        cls.enqueteur = Enqueteur.objects.create(user=user, matricule='PLANS', telephone='000')
+
+    def assertUtiliseIndex(self, queryset, index):
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        # « SCAN table » sans index = lecture de toute la table
+        self.assertNotRegex(plan, rf'SCAN {table}(?! USING)', f"Parcours complet de {table} :\n{plan}")
+        self.assertIn(index, plan, f"Index {index} non utilisé :\n{plan}")
+        return plan
+
+    def test_etudiants_par_quartier(self):
+        self.assertUtiliseIndex(
+            Etudiant.objects.filter(enqueteur=self.enqueteur, quartier='Melen'),
+            'etudiant_enq_quartier_idx',
+        )
+
+    def test_etudiants_par_statut(self):
+        self.assertUtiliseIndex(
+            Etudiant.objects.filter(enqueteur=self.enqueteur, statut='COMPLET'),
+            'etudiant_enq_statut_idx',
+        )
+
+    def plans_de_la_vue(self, url, parametres=None):
+        """Plans d'exécution des requêtes de page (triées et limitées) réellement émises par la vue"""
+        self.client.force_login(self.enqueteur.user)
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(url, parametres or {})
+        self.assertEqual(reponse.status_code, 200)
+        plans = []
+        for requete in requetes.captured_queries:
+            sql = requete['sql']
+            if sql.startswith('SELECT') and 'FROM "core_etudiant"' in sql and 'ORDER BY' in sql and 'LIMIT' in sql:
+                with connection.cursor() as curseur:
+                    curseur.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plans.append('\n'.join(str(ligne[-1]) for ligne in curseur.fetchall()))
+        self.assertTrue(plans, f"Aucune requête de page émise par {url}")
+        return reponse, plans
+    
+    def assertPlanDePage(self, plan):
+        # Tri (date_collecte, id) servi par l'index : ni regroupement ni tri temporaire
+        self.assertIn('etudiant_enq_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_liste_etudiants_paginee(self):
+        Etudiant.objects.bulk_create([
+            Etudiant(enqueteur=self.enqueteur, code_enquete=f"PL{i:03d}", nom=f"Etudiant {i}",
+                     age=20, sexe='F', niveau='L1', universite='UY1', quartier='Melen')
+            for i in range(30)
+        ])
+        reponse, plans = self.plans_de_la_vue('/etudiants/')
+        for plan in plans:
+            self.assertPlanDePage(plan)
+        
+        # Page suivante, lue depuis le curseur
+        _, plans = self.plans_de_la_vue('/etudiants/', {'curseur': reponse.context['curseur_suivant']})
+        for plan in plans:
+            self.assertPlanDePage(plan)
+    
+    def test_recherche_etudiants_paginee(self):
+        _, plans = self.plans_de_la_vue('/api/rechercher-etudiants/')
+        for plan in plans:
+            self.assertPlanDePage(plan)
+    
+    def test_doublons_inter_enqueteurs(self):
+        # Requête réellement émise par le détecteur : recherche dans l'index cle_identite, pas de parcours de U0
+        with CaptureQueriesContext(connection) as requetes:
+            DetecteurAnomalies(self.enqueteur).detecter_doublons_inter_enqueteurs()
+        with connection.cursor() as curseur:
+            curseur.execute('EXPLAIN QUERY PLAN ' + requetes.captured_queries[0]['sql'])
+            plan = '\n'.join(str(ligne[-1]) for ligne in curseur.fetchall())
+        self.assertRegex(plan, r'SEARCH U0 USING INDEX core_etudiant_cle_identite_\w+')
+        self.assertNotIn('SCAN', plan)
+    
+    def test_etudiants_proches_par_cellule(self):
+        # Rayon de 1 km autour du centre de Yaoundé : recherche des cellules par index
+        self.assertUtiliseIndex(
+            geo.dans_cadre(Etudiant.objects.filter(enqueteur=self.enqueteur), *geo.cadre_autour(3.87, 11.52, 1)),
+            'etudiant_enq_cellule_idx',
+        )
+        self.assertUtiliseIndex(
+            geo.dans_rayon(Etudiant.objects.filter(enqueteur=self.enqueteur), 3.87, 11.52, 1)[:geo.RESULTATS_MAX],
+            'etudiant_enq_cellule_idx',
+        )
+    
+    def test_depenses_par_date_de_saisie(self):
+        self.assertUtiliseIndex(
+            Depense.objects.filter(enqueteur=self.enqueteur, date_saisie__gte=timezone.now() - timedelta(days=7)),
+            'depense_enq_saisie_idx',
+        )
+
+    def test_depenses_par_categorie(self):
+        self.assertUtiliseIndex(
+            Depense.objects.filter(enqueteur=self.enqueteur, categorie='LOGEMENT'),
+            'depense_enq_categorie_idx',
+        )
+
+    def test_depenses_des_jours_a_reagreger(self):
+        self.assertUtiliseIndex(
+            Depense.objects.filter(
+                enqueteur=self.enqueteur, date_depense__in=[timezone.localdate()]
+            ).values('quartier', 'categorie', 'date_depense').annotate(nombre=Count('id')).order_by(),
+            'depense_enq_date_idx',
+        )
+
+    def test_anomalies_ouvertes_par_gravite(self):
+        self.assertUtiliseIndex(
+            Anomalie.objects.filter(enqueteur=self.enqueteur, statut='A_TRAITER', gravite='ELEVEE'),
+            'anomalie_enq_statut_idx',
+        )
+
+
+class ResumeSignauxTests(DonneesMixin, TestCase):
+    """Les compteurs tenus par les signaux doivent rester égaux à un recalcul complet"""
+    
+    CHAMPS = [
+        'nb_etudiants', 'nb_hommes', 'nb_femmes', 'nb_quartiers', 'nb_depenses',
+        'montant_total', 'nb_anomalies_ouvertes', 'nb_anomalies_resolues',
+    ]
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('resume')
+        # Le résumé existe avant les écritures : seuls les signaux le tiennent à jour
+        ResumeEnqueteur.pour(self.enqueteur)
+    
+    def assertResumeExact(self):
+        resume = ResumeEnqueteur.objects.get(enqueteur=self.enqueteur)
+        kpis = calculer_kpis(self.enqueteur)
+        self.assertEqual(
+            {champ: getattr(resume, champ) for champ in self.CHAMPS},
+            {champ: kpis[champ] for champ in self.CHAMPS},
+        )
+    
+    def test_creation(self):
+        self.creer_etudiant(self.enqueteur)
+        self.creer_etudiant(self.enqueteur, nom='Atangana Paul', sexe='M')
+        self.creer_etudiant(self.enqueteur, nom='Essomba Luc', sexe='M', quartier='Bastos')
+        self.assertResumeExact()
+    
+    def test_modification_sans_changer_de_quartier(self):
+        etudiant = self.creer_etudiant(self.enqueteur)
+        etudiant.sexe = 'M'
+        etudiant.save()
+        etudiant.nom = 'Ngono Marie-Claire'
+        etudiant.save()
+        self.assertResumeExact()
+        self.assertEqual(ResumeEnqueteur.objects.get(enqueteur=self.enqueteur).nb_quartiers, 1)
+    
+    def test_changement_de_quartier(self):
+        etudiant = self.creer_etudiant(self.enqueteur)
+        self.creer_etudiant(self.enqueteur, nom='Atangana Paul', quartier='Bastos')
+        # Melen se vide, Bastos existe déjà
+        etudiant.quartier = 'Bastos'
+        etudiant.save()
+        self.assertResumeExact()
+        # Nouveau quartier
+        etudiant.quartier = 'Ngoa-Ekelle'
+        etudiant.save()
+        self.assertResumeExact()
+    
+    def test_suppression(self):
+        etudiant = self.creer_etudiant(self.enqueteur)
+        self.creer_depense(etudiant, montant=2500)
+        autre = self.creer_etudiant(self.enqueteur, nom='Atangana Paul', sexe='M')
+        etudiant.delete()
+        self.assertResumeExact()
+        autre.delete()
+        self.assertResumeExact()
+
+
+
+class RechercheEtudiantsApiTests(DonneesMixin, TestCase):
+    """Recherche par pertinence : tout le classement est accessible page par page"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('recherche')
+        self.client.force_login(self.enqueteur.user)
+        for i in range(12):
+            etudiant = self.creer_etudiant(self.enqueteur, nom=f"Ngono {chr(65 + i)}", sexe='MF'[i % 2])
+            self.creer_depense(etudiant)
+        self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+    
+    def parcourir(self, **parametres):
+        pages = []
+        reponse = self.client.get('/api/rechercher-etudiants/', {'taille': 10, **parametres}).json()
+        pages.append(reponse['etudiants'])
+        while reponse['curseur_suivant']:
+            reponse = self.client.get('/api/rechercher-etudiants/', {'curseur': reponse['curseur_suivant']}).json()
+            pages.append(reponse['etudiants'])
+        return pages
+    
+    def test_pages_par_pertinence(self):
+        pages = self.parcourir(nom='ngono')
+        self.assertEqual([len(page) for page in pages], [10, 2])
+        ids = [etudiant['id'] for page in pages for etudiant in page]
+        self.assertEqual(len(set(ids)), 12)
+        self.assertTrue(all(etudiant['nb_depenses'] == 1 for page in pages for etudiant in page))
+    
+    def test_filtres_appliques_avant_la_pagination(self):
+        pages = self.parcourir(nom='ngono', sexe='F')
+        self.assertEqual([len(page) for page in pages], [6])
+        self.assertTrue(all(etudiant['sexe'] == 'Féminin' for etudiant in pages[0]))
+
+
+class CacheVersionneTests(DonneesMixin, TestCase):
+    """Un résultat mis en cache n'est plus servi après une écriture sur les données de l'enquêteur"""
+    
+    def setUp(self):
+        cache_statistiques.vider()
+        self.enqueteur = self.creer_enqueteur('cache')
+        self.client.force_login(self.enqueteur.user)
+        self.etudiant = self.creer_etudiant(self.enqueteur)
+    
+    def nb_etudiants(self):
+        return en_cache('test_nb', self.enqueteur, lambda: Etudiant.objects.filter(enqueteur=self.enqueteur).count())
+    
+    def test_ecriture_par_signal(self):
+        self.assertEqual(self.nb_etudiants(), 1)
+        self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        self.assertEqual(self.nb_etudiants(), 2)
+    
+    def test_mise_a_jour_groupee(self):
+        # marquer_verifies passe par update(), sans signal
+        url = '/api/pivot/?source=etudiants&dimensions=statut'
+        self.assertEqual(self.client.get(url).json()['lignes'], [{'statut': 'BROUILLON', 'count': 1}])
+        self.client.post('/etudiants/marquer-verifies/', {'ids[]': [self.etudiant.pk], 'statut': 'VERIFIE'})
+        self.assertEqual(self.client.get(url).json()['lignes'], [{'statut': 'VERIFIE', 'count': 1}])
+
+
+
+class FluxTempsReelTests(DonneesMixin, TestCase):
+    """Flux SSE du tableau de bord et interrogation de repli"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('flux')
+        self.client.force_login(self.enqueteur.user)
+    
+    def test_repli_wsgi(self):
+        # Le client de test est WSGI : pas de flux, la page interroge l'API
+        self.assertEqual(self.client.get('/flux/').status_code, 204)
+    
+    def test_repli_inclut_les_anomalies(self):
+        etudiant = self.creer_etudiant(self.enqueteur)
+        Anomalie.objects.create(
+            enqueteur=self.enqueteur, etudiant=etudiant, type_anomalie='MANQUANTE', description='Test',
+        )
+        stats = self.client.get('/api/dashboard-stats/').json()
+        self.assertEqual(stats['anomalies_ouvertes'], 1)
+    
+    def test_flux_inactif_sans_relecture(self):
+        etat = {'version': 1, 'nb_etudiants': 0, 'nb_depenses': 0, 'nb_quartiers': 0, 'nb_anomalies_ouvertes': 0}
+        
+        async def lire_messages(nombre):
+            generateur = flux.evenements(self.enqueteur.pk)
+            messages = [await generateur.__anext__() for _ in range(nombre)]
+            await generateur.aclose()
+            return messages
+        
+        with mock.patch.object(flux, 'INTERVALLE_PING', 0.01), \
+                mock.patch.object(flux, '_lire_etat', mock.AsyncMock(return_value=etat)) as lire_etat:
+            messages = asyncio.run(lire_messages(4))
+        
+        self.assertTrue(messages[0].startswith('event: donnees'))
+        self.assertEqual(messages[1:], [": ping\n\n"] * 3)
+        # Seule la lecture initiale : les pings ne touchent pas la base
+        self.assertEqual(lire_etat.await_count, 1)
+
+
+class GetConditionnelTests(DonneesMixin, TestCase):
+    """ETag / Last-Modified des API : 304 tant que les données ne changent pas, 200 après une écriture"""
+    
+    URL = '/api/pivot/?source=etudiants&dimensions=statut'
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('etag')
+        self.client.force_login(self.enqueteur.user)
+        self.etudiant = self.creer_etudiant(self.enqueteur)
+        ResumeEnqueteur.pour(self.enqueteur)
+    
+    def test_304_puis_200_apres_ecriture(self):
+        premiere = self.client.get(self.URL)
+        self.assertEqual(premiere.status_code, 200)
+        etag = premiere['ETag']
+        
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        
+        self.client.post('/etudiants/marquer-verifies/', {'ids[]': [self.etudiant.pk], 'statut': 'VERIFIE'})
+        
+        apres = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(apres.status_code, 200)
+        self.assertNotEqual(apres['ETag'], etag)
+        self.assertEqual(apres.json()['lignes'], [{'statut': 'VERIFIE', 'count': 1}])
+    
+    def test_304_avec_la_derniere_modification(self):
+        premiere = self.client.get(self.URL)
+        self.assertEqual(
+            self.client.get(self.URL, HTTP_IF_MODIFIED_SINCE=premiere['Last-Modified']).status_code, 304
+        )
+
+
+class EmpreintesAnomaliesTests(DonneesMixin, TestCase):
+    """Une anomalie déjà enregistrée (même ancienne ou concurrente) n'est jamais recréée"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('empreintes')
+        # Étudiant sans dépense : anomalie MANQUANTE / sans_depense
+        self.etudiant = self.creer_etudiant(self.enqueteur)
+        ResumeEnqueteur.pour(self.enqueteur)
+    
+    def test_anciennes_anomalies_reprises_par_la_migration(self):
+        Anomalie.objects.create(
+            etudiant=self.etudiant, enqueteur=self.enqueteur, type_anomalie='MANQUANTE', gravite='ELEVEE',
+            description=f"Étudiant sans aucune dépense enregistrée: {self.etudiant.nom}",
+        )
+        migration = importlib.import_module('core.migrations.0013_anomalie_empreinte_unique')
+        migration.remplir_empreintes(apps, None)
+        
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        self.assertEqual(Anomalie.objects.filter(etudiant=self.etudiant, type_anomalie='MANQUANTE').count(), 1)
+    
+    def test_empreinte_unique_par_enqueteur(self):
+        nouvelles = DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        self.assertEqual(len(nouvelles), 1)
+        doublon = Anomalie(
+            etudiant=self.etudiant, enqueteur=self.enqueteur, type_anomalie='MANQUANTE', gravite='ELEVEE',
+            description='copie', empreinte=nouvelles[0].empreinte,
+        )
+        # Insertion concurrente : ignorée par bulk_create, refusée sinon
+        Anomalie.objects.bulk_create([doublon], ignore_conflicts=True)
+        self.assertEqual(Anomalie.objects.filter(enqueteur=self.enqueteur).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Anomalie.objects.create(
+                etudiant=self.etudiant, enqueteur=self.enqueteur, type_anomalie='MANQUANTE', gravite='ELEVEE',
+                description='copie', empreinte=nouvelles[0].empreinte,
+            )
+        self.assertEqual(ResumeEnqueteur.objects.get(enqueteur=self.enqueteur).nb_anomalies_ouvertes, 1)
+
+
+class RechercheParNomTests(DonneesMixin, TestCase):
+    """La case « Recherche par nom » de la liste ne cherche que dans les noms, en sous-requête SQL"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('parnom')
+        self.client.force_login(self.enqueteur.user)
+        self.ngono = self.creer_etudiant(self.enqueteur, nom='Ngöno Marie')
+        # « ngo » figure dans le quartier et dans une dépense, pas dans le nom
+        autre = self.creer_etudiant(self.enqueteur, nom='Atangana Paul', quartier='Ngoa-Ekelle')
+        self.creer_depense(autre, lieu_precis='Marché Ngoa')
+    
+    def noms_listes(self, nom):
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get('/etudiants/', {'nom': nom})
+        # Requête de page : la correspondance est une sous-requête, pas une liste d'identifiants en paramètres
+        for requete in requetes.captured_queries:
+            if 'FROM "core_etudiant"' in requete['sql'] and 'LIMIT' in requete['sql']:
+                self.assertNotRegex(requete['sql'], r'"id" IN \(\d')
+        return [etudiant.nom for etudiant in reponse.context['etudiants']]
+    
+    def test_recherche_limitee_aux_noms(self):
+        self.assertEqual(self.noms_listes('ngo'), ['Ngöno Marie'])
+        self.assertEqual(self.noms_listes('MARIE ngono'), ['Ngöno Marie'])
+        self.assertEqual(self.noms_listes('ekelle'), [])
+    
+    def test_sans_index_plein_texte(self):
+        with mock.patch('core.recherche.fts_disponible', return_value=False):
+            self.assertEqual(self.noms_listes('Marie'), ['Ngöno Marie'])
+            self.assertEqual(self.noms_listes('ekelle'), [])
+    
+    def test_conditions_postgresql_indexables(self):
+        # SQL généré pour PostgreSQL (sans l'exécuter) : opérateurs % et ILIKE, servis par les index GIN
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            sql, parametres = Etudiant.objects.filter(
+                recherche.filtre_recherche(self.enqueteur, 'ng_o')
+            ).query.sql_with_params()
+            sql_noms, _ = Etudiant.objects.filter(
+                recherche.filtre_recherche(self.enqueteur, 'ngo', colonnes=('nom',))
+            ).query.sql_with_params()
+        
+        for colonne in ('"nom"', '"universite"', '"quartier"', '"notes"', '"lieu_precis"', '"commentaire"'):
+            self.assertIn(f'{colonne} %% %s', sql)
+            self.assertIn(f'{colonne} ILIKE %s', sql)
+        self.assertIn('FROM "core_depense"', sql)
+        self.assertNotIn('SIMILARITY', sql.upper())
+        self.assertNotIn('UPPER(', sql)
+        self.assertIn('%ng\\_o%', parametres)
+        
+        self.assertIn('"nom" ILIKE %s', sql_noms)
+        self.assertNotIn('"quartier"', sql_noms.split('WHERE', 1)[1])
+        self.assertNotIn('core_depense', sql_noms)
+
+
+
+class PivotApiTests(DonneesMixin, TestCase):
+    """Paramètres de l'API de tableau croisé : valides, invalides et inconnus"""
+    
+    URL = '/api/pivot/'
+    
+    def setUp(self):
+        cache_statistiques.vider()
+        self.enqueteur = self.creer_enqueteur('pivot')
+        self.client.force_login(self.enqueteur.user)
+        etudiant = self.creer_etudiant(self.enqueteur)
+        self.creer_depense(etudiant, categorie='LOGEMENT', montant=20000)
+        self.creer_depense(etudiant, categorie='LOGEMENT', montant=30000)
+        self.creer_depense(etudiant, categorie='TRANSPORT', montant=500)
+    
+    def test_parametres_valides(self):
+        reponse = self.client.get(self.URL, {'dimensions': 'categorie', 'mesures': 'count,sum'})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['lignes'], [
+            {'categorie': 'LOGEMENT', 'count': 2, 'sum': 50000},
+            {'categorie': 'TRANSPORT', 'count': 1, 'sum': 500},
+        ])
+        
+        filtre = self.client.get(self.URL, {'mesures': 'avg', 'categorie': 'LOGEMENT'})
+        self.assertEqual(filtre.json()['lignes'], [{'avg': 25000}])
+    
+    def test_parametres_invalides(self):
+        for parametres, message in [
+            ({'source': 'anomalies'}, 'Source inconnue'),
+            ({'dimensions': 'couleur'}, 'Dimension inconnue'),
+            ({'mesures': 'median'}, 'Mesure inconnue'),
+            ({'mois': '2026-01'}, 'Filtre impossible'),
+        ]:
+            reponse = self.client.get(self.URL, parametres)
+            self.assertEqual(reponse.status_code, 400, parametres)
+            self.assertIn(message, reponse.json()['error'])
+    
+    def test_parametres_inconnus_ignores(self):
+        attendu = self.client.get(self.URL, {'dimensions': 'categorie'}).json()
+        reponse = self.client.get(self.URL, {'dimensions': 'categorie', '_': '123', 'utm_source': 'mail'})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json(), attendu)
+
+
+class TachesDetectionTests(DonneesMixin, TestCase):
+    """File des détections : reprise des tâches abandonnées et planification après suppression"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('taches')
+        self.client.force_login(self.enqueteur.user)
+    
+    def tache_abandonnee(self):
+        tache = planifier_detection(self.enqueteur)
+        TacheDetection.objects.filter(pk=tache.pk).update(
+            statut='EN_COURS', date_debut=timezone.now() - DELAI_TACHE_BLOQUEE - timedelta(minutes=1)
+        )
+        return tache
+    
+    def test_tache_abandonnee_remise_en_file(self):
+        tache = self.tache_abandonnee()
+        self.assertFalse(etat_detection(self.enqueteur)['detection_en_cours'])
+        
+        traitees = traiter_taches()
+        self.assertEqual([t.pk for t in traitees], [tache.pk])
+        self.assertEqual(TacheDetection.objects.get(pk=tache.pk).statut, 'TERMINEE')
+    
+    def test_tache_abandonnee_close_si_une_autre_attend(self):
+        tache = self.tache_abandonnee()
+        autre = planifier_detection(self.enqueteur)
+        self.assertEqual(recuperer_taches_bloquees(), 1)
+        self.assertEqual(TacheDetection.objects.get(pk=tache.pk).statut, 'ECHEC')
+        self.assertEqual(TacheDetection.objects.get(pk=autre.pk).statut, 'EN_ATTENTE')
+    
+    def test_tache_recente_non_reprise(self):
+        tache = planifier_detection(self.enqueteur)
+        self.assertEqual(prendre_tache().pk, tache.pk)
+        self.assertEqual(recuperer_taches_bloquees(), 0)
+        self.assertTrue(etat_detection(self.enqueteur)['detection_en_cours'])
+    
+    def test_une_seule_tache_en_attente(self):
+        planifier_detection(self.enqueteur)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TacheDetection.objects.create(enqueteur=self.enqueteur)
+        # Les tâches finies ne sont pas concernées
+        TacheDetection.objects.create(enqueteur=self.enqueteur, statut='TERMINEE')
+        TacheDetection.objects.create(enqueteur=self.enqueteur, statut='TERMINEE')
+    
+    def test_planification_concurrente(self):
+        existante = planifier_detection(self.enqueteur)
+        
+        # La tâche concurrente est créée entre la recherche et l'insertion : l'insertion échoue, la tâche est reprise
+        premiere = QuerySet.first
+        appels = []
+        def first(queryset):
+            appels.append(queryset)
+            return None if len(appels) == 1 else premiere(queryset)
+        with mock.patch.object(QuerySet, 'first', first):
+            tache = planifier_detection(self.enqueteur, incremental=False)
+        
+        self.assertEqual(tache.pk, existante.pk)
+        self.assertEqual(
+            list(TacheDetection.objects.filter(enqueteur=self.enqueteur).values_list('pk', 'incremental')),
+            [(existante.pk, False)],
+        )
+    
+    def test_purge_des_taches_finies(self):
+        autre = self.creer_enqueteur('autre')
+        ancien = timezone.now() - DUREE_CONSERVATION_TACHES - timedelta(days=1)
+        
+        def tache(enqueteur, statut, date_fin):
+            tache = TacheDetection.objects.create(enqueteur=enqueteur)
+            TacheDetection.objects.filter(pk=tache.pk).update(statut=statut, date_fin=date_fin)
+            return tache.pk
+        
+        supprimees = {
+            tache(self.enqueteur, 'TERMINEE', ancien - timedelta(days=1)),
+            tache(self.enqueteur, 'TERMINEE', ancien),
+            tache(self.enqueteur, 'ECHEC', ancien),
+            tache(autre, 'ECHEC', ancien),
+        }
+        conservees = {
+            tache(self.enqueteur, 'TERMINEE', timezone.now()),
+            tache(self.enqueteur, 'ECHEC', timezone.now()),
+            # Seule détection terminée de l'enquêteur : conservée pour etat_detection
+            tache(autre, 'TERMINEE', ancien - timedelta(days=30)),
+            planifier_detection(self.enqueteur).pk,
+        }
+        
+        self.assertEqual(purger_taches(), len(supprimees))
+        self.assertEqual(set(TacheDetection.objects.values_list('pk', flat=True)), conservees)
+        self.assertEqual(etat_detection(autre)['derniere_detection'], ancien - timedelta(days=30))
+    
+    def test_commande_traiter_detections_purge(self):
+        tache = planifier_detection(self.enqueteur)
+        call_command('traiter_detections', stdout=io.StringIO())
+        self.assertEqual(TacheDetection.objects.get(pk=tache.pk).statut, 'TERMINEE')
+        
+        # La purge précède le traitement : la précédente n'est supprimée qu'au passage suivant du worker
+        suivante = planifier_detection(self.enqueteur)
+        call_command('traiter_detections', '--conservation-jours', '0', stdout=io.StringIO())
+        call_command('traiter_detections', '--conservation-jours', '0', stdout=io.StringIO())
+        self.assertEqual(list(TacheDetection.objects.values_list('pk', flat=True)), [suivante.pk])
+    
+    def test_suppressions_planifient_une_analyse_complete(self):
+        etudiant = self.creer_etudiant(self.enqueteur)
+        depense = self.creer_depense(etudiant)
+        autre = self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        for url, donnees in [
+            (f'/depense/{depense.pk}/supprimer/', {}),
+            (f'/etudiant/{etudiant.pk}/supprimer/', {}),
+            ('/etudiants/supprimer-selection/', {'ids[]': [autre.pk]}),
+        ]:
+            TacheDetection.objects.all().delete()
+            self.assertEqual(self.client.post(url, donnees).status_code, 200, url)
+            self.assertTrue(
+                TacheDetection.objects.filter(enqueteur=self.enqueteur, statut='EN_ATTENTE', incremental=False).exists(),
+                url,
+            )
+
+
+class DetectionResolutionTests(DonneesMixin, TestCase):
+    """Détection des anomalies en base, puis résolution, ignorance et suppression depuis la liste"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('detection')
+        self.client.force_login(self.enqueteur.user)
+        ResumeEnqueteur.pour(self.enqueteur)
+    
+    def anomalies(self, **filtres):
+        return Anomalie.objects.filter(enqueteur=self.enqueteur, **filtres)
+    
+    def resume(self):
+        return ResumeEnqueteur.objects.get(enqueteur=self.enqueteur)
+    
+    def test_groupes_doublons_en_une_requete(self):
+        a = self.creer_etudiant(self.enqueteur, nom='Ngono Marie')
+        b = self.creer_etudiant(self.enqueteur, nom='NGONO  MARIE')
+        c = self.creer_etudiant(self.enqueteur, nom='Ngóno Marie')
+        self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        
+        with self.assertNumQueries(1):
+            groupes = DetecteurAnomalies(self.enqueteur).groupes_doublons()
+        self.assertEqual([[e.pk for e in groupe] for groupe in groupes], [[a.pk, b.pk, c.pk]])
+    
+    def test_doublons_et_donnees_manquantes_enregistres(self):
+        a = self.creer_etudiant(self.enqueteur, nom='Ngono Marie')
+        b = self.creer_etudiant(self.enqueteur, nom='ngono marie')
+        autre = self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        for etudiant in (a, b):
+            self.creer_depense(etudiant)
+        
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        
+        self.assertEqual(
+            set(self.anomalies(type_anomalie='DOUBLON').values_list('etudiant_id', flat=True)), {a.pk, b.pk}
+        )
+        self.assertEqual(
+            list(self.anomalies(type_anomalie='MANQUANTE').values_list('etudiant_id', flat=True)), [autre.pk]
+        )
+        self.assertTrue(self.anomalies().exists())
+        self.assertFalse(self.anomalies().exclude(statut='A_TRAITER').exists())
+        self.assertEqual(self.resume().nb_anomalies_ouvertes, self.anomalies().count())
+    
+    def test_nouvelle_detection_sans_doublon_d_anomalie(self):
+        self.creer_etudiant(self.enqueteur, nom='Ngono Marie')
+        self.creer_etudiant(self.enqueteur, nom='Ngono Marie')
+        premieres = DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        self.assertTrue(premieres)
+        
+        self.assertEqual(DetecteurAnomalies(self.enqueteur).creer_anomalies_bd(), [])
+        self.assertEqual(self.anomalies().count(), len(premieres))
+    
+    def test_detection_incrementale(self):
+        ancien = self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        self.anomalies().delete()
+        Etudiant.objects.filter(pk=ancien.pk).update(date_modification=timezone.now() - timedelta(days=1))
+        
+        nouveau = self.creer_etudiant(self.enqueteur, nom='Essomba Luc')
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd(incremental=True)
+        
+        # Seul l'étudiant saisi depuis la dernière détection est analysé
+        self.assertEqual(set(self.anomalies().values_list('etudiant_id', flat=True)), {nouveau.pk})
+    
+    def test_resolution(self):
+        etudiant = self.creer_etudiant(self.enqueteur)
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        anomalie = self.anomalies(etudiant=etudiant, type_anomalie='MANQUANTE').get()
+        ouvertes = self.resume().nb_anomalies_ouvertes
+        
+        reponse = self.client.post(f'/anomalies/resoudre/{anomalie.pk}/', {'solution': 'Dépense ajoutée'})
+        self.assertRedirects(reponse, '/anomalies/', fetch_redirect_response=False)
+        
+        anomalie.refresh_from_db()
+        self.assertEqual(anomalie.statut, 'RESOLUE')
+        self.assertEqual(anomalie.solution, 'Dépense ajoutée')
+        self.assertIsNotNone(anomalie.date_resolution)
+        resume = self.resume()
+        self.assertEqual(resume.nb_anomalies_ouvertes, ouvertes - 1)
+        self.assertEqual(resume.nb_anomalies_resolues, 1)
+        
+        # Une anomalie résolue n'est pas recréée par la détection suivante
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        self.assertEqual(self.anomalies(etudiant=etudiant, type_anomalie='MANQUANTE').count(), 1)
+    
+    def test_ignorer_et_supprimer(self):
+        self.creer_etudiant(self.enqueteur, nom='Ngono Marie')
+        self.creer_etudiant(self.enqueteur, nom='Ngono Marie')
+        DetecteurAnomalies(self.enqueteur).creer_anomalies_bd()
+        ignoree, supprimee = self.anomalies(type_anomalie='DOUBLON')[:2]
+        
+        self.assertEqual(self.client.post(f'/anomalies/ignorer/{ignoree.pk}/').json(), {'success': True})
+        self.assertEqual(Anomalie.objects.get(pk=ignoree.pk).statut, 'IGNOREE')
+        
+        self.assertEqual(self.client.post(f'/anomalies/supprimer/{supprimee.pk}/').json(), {'success': True})
+        self.assertFalse(Anomalie.objects.filter(pk=supprimee.pk).exists())
+        self.assertEqual(self.resume().nb_anomalies_ouvertes, self.anomalies(statut='A_TRAITER').count())
+    
+    def test_actions_reservees_a_l_enqueteur(self):
+        autre = self.creer_enqueteur('autre')
+        anomalie = Anomalie.objects.create(
+            enqueteur=autre, etudiant=self.creer_etudiant(autre), type_anomalie='MANQUANTE', description='Test',
+        )
+        for action in ('resoudre', 'ignorer', 'supprimer'):
+            self.assertEqual(self.client.post(f'/anomalies/{action}/{anomalie.pk}/').status_code, 404, action)
+            self.assertEqual(self.client.get(f'/anomalies/{action}/{anomalie.pk}/').status_code, 400, action)
+        self.assertEqual(Anomalie.objects.get(pk=anomalie.pk).statut, 'A_TRAITER')
+
+
+class ReglesTests(DonneesMixin, TestCase):
+    """Règles déclaratives : déclenchement hors des bornes, silence à l'intérieur"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('regles')
+    
+    def en_anomalie(self, regle, objets):
+        """Objets (parmi ceux donnés) que la règle signale"""
+        queryset = regle.modele.objects.filter(pk__in=[objet.pk for objet in objets])
+        return set(regle.evaluer(queryset).values_list('pk', flat=True))
+    
+    def test_age_niveau(self):
+        regle = RegleAgeNiveau('L1', 18, 25)
+        trop_jeune = self.creer_etudiant(self.enqueteur, niveau='L1', age=17)
+        trop_age = self.creer_etudiant(self.enqueteur, niveau='L1', age=26)
+        bornes = [self.creer_etudiant(self.enqueteur, niveau='L1', age=age) for age in (18, 25)]
+        autre_niveau = self.creer_etudiant(self.enqueteur, niveau='M2', age=30)
+        
+        self.assertEqual(
+            self.en_anomalie(regle, [trop_jeune, trop_age, *bornes, autre_niveau]), {trop_jeune.pk, trop_age.pk}
+        )
+        self.assertIn('17 ans', regle.description(trop_jeune))
+    
+    def test_zone_gps(self):
+        regle = RegleZoneGps('Yaoundé', lat_min=3.70, lat_max=4.05, lng_min=11.35, lng_max=11.65)
+        dans_la_zone = self.creer_etudiant(self.enqueteur, gps_lat=3.87, gps_lng=11.52)
+        # Latitude et longitude inversées à la saisie
+        inverse = self.creer_etudiant(self.enqueteur, gps_lat=11.52, gps_lng=3.87)
+        trop_au_nord = self.creer_etudiant(self.enqueteur, gps_lat=4.10, gps_lng=11.52)
+        trop_a_l_est = self.creer_etudiant(self.enqueteur, gps_lat=3.87, gps_lng=11.70)
+        sans_gps = self.creer_etudiant(self.enqueteur)
+        gps_partiel = self.creer_etudiant(self.enqueteur, gps_lat=12.0)
+        
+        self.assertEqual(
+            self.en_anomalie(regle, [dans_la_zone, inverse, trop_au_nord, trop_a_l_est, sans_gps, gps_partiel]),
+            {inverse.pk, trop_au_nord.pk, trop_a_l_est.pk},
+        )
+    
+    def test_montant(self):
+        regle = RegleMontant('montant_invraisemblable', minimum=1, maximum=1000000)
+        etudiant = self.creer_etudiant(self.enqueteur)
+        nul = self.creer_depense(etudiant, montant=0)
+        enorme = self.creer_depense(etudiant, montant=1000001)
+        bornes = [self.creer_depense(etudiant, montant=montant) for montant in (1, 1000000)]
+        
+        self.assertEqual(self.en_anomalie(regle, [nul, enorme, *bornes]), {nul.pk, enorme.pk})
+    
+    def test_montant_par_categorie(self):
+        regle = RegleMontant('loyer_excessif', maximum=200000, categorie='LOGEMENT')
+        etudiant = self.creer_etudiant(self.enqueteur)
+        loyer = self.creer_depense(etudiant, categorie='LOGEMENT', montant=250000)
+        loyer_normal = self.creer_depense(etudiant, categorie='LOGEMENT', montant=150000)
+        autre_categorie = self.creer_depense(etudiant, categorie='SANTE', montant=250000)
+        
+        self.assertEqual(self.en_anomalie(regle, [loyer, loyer_normal, autre_categorie]), {loyer.pk})
+    
+    def test_montant_sans_borne(self):
+        regle = RegleMontant('sans_borne')
+        depense = self.creer_depense(self.creer_etudiant(self.enqueteur), montant=-5)
+        self.assertEqual(self.en_anomalie(regle, [depense]), set())
+    
+    def test_registre_applique_par_le_detecteur(self):
+        self.assertEqual(
+            {regle.code for regle in REGLES}, {'age_niveau', 'gps_hors_zone', 'montant_invraisemblable'}
+        )
+        conforme = self.creer_etudiant(self.enqueteur, niveau='L2', age=20, gps_lat=3.87, gps_lng=11.52)
+        atypique = self.creer_etudiant(self.enqueteur, niveau='L2', age=40, gps_lat=11.52, gps_lng=3.87)
+        self.creer_depense(conforme, montant=0)
+        
+        anomalies = DetecteurAnomalies(self.enqueteur).detecter_regles()
+        self.assertEqual(
+            sorted((a['regle'], (a.get('etudiant') or a['depense'].etudiant).pk) for a in anomalies),
+            sorted([('age_niveau', atypique.pk), ('gps_hors_zone', atypique.pk), ('montant_invraisemblable', conforme.pk)]),
+        )
+
+
+class MoteurStatistiqueTests(SimpleTestCase):
+    """Bornes robustes des montants : cas limites du calcul vectorisé"""
+    
+    LIMITES = {'NOURRITURE': {'min': 2000, 'max': 30000}}
+    
+    @staticmethod
+    def montants(valeurs, categorie='NOURRITURE', quartier='Melen'):
+        return pd.DataFrame({
+            'id': range(1, len(valeurs) + 1),
+            'categorie': categorie,
+            'quartier': quartier,
+            'montant': valeurs,
+        })
+    
+    def aberrantes(self, montants, **options):
+        resultat = detecter_valeurs_aberrantes(montants, limites_defaut=self.LIMITES, **options)
+        return dict(zip(resultat['id'], resultat['sens']))
+    
+    def test_dispersion_detectee(self):
+        # 7 000 reste dans les limites par défaut, mais s'écarte nettement du groupe
+        valeurs = [5000, 5100, 4900, 5050, 4950, 5000, 5100, 4900, 7000]
+        self.assertEqual(self.aberrantes(self.montants(valeurs)), {9: 'haut'})
+    
+    def test_serie_constante(self):
+        # MAD nulle : limites par défaut, sans division par zéro ni tout signaler
+        montants = self.montants([5000] * 10 + [40000, 1000])
+        bornes = bornes_robustes(montants, limites_defaut=self.LIMITES)
+        self.assertEqual(bornes['borne_min'].unique().tolist(), [2000])
+        self.assertEqual(bornes['borne_max'].unique().tolist(), [30000])
+        self.assertEqual(self.aberrantes(montants), {11: 'haut', 12: 'bas'})
+    
+    def test_petit_effectif(self):
+        for valeurs in ([], [40000], [5000, 40000]):
+            attendu = {len(valeurs): 'haut'} if valeurs else {}
+            self.assertEqual(self.aberrantes(self.montants(valeurs)), attendu, valeurs)
+    
+    def test_montants_nan(self):
+        valeurs = [5000, 5100, 4900, 5050, 4950, 5000, 5100, 4900, 7000, np.nan]
+        self.assertEqual(self.aberrantes(self.montants(valeurs)), {9: 'haut'})
+        
+        # Les NaN ne comptent pas dans l'effectif : 5 vraies valeurs, limites par défaut
+        montants = self.montants([5000, 5100, 4900, 5050, 7000] + [np.nan] * 5)
+        self.assertEqual(bornes_robustes(montants, limites_defaut=self.LIMITES)['borne_max'].max(), 30000)
+        self.assertEqual(self.aberrantes(montants), {})
+    
+    def test_categorie_sans_limites(self):
+        bornes = bornes_robustes(self.montants([10, 10 ** 9], categorie='AUTRE'), limites_defaut=self.LIMITES)
+        self.assertEqual(bornes['borne_min'].tolist(), [0, 0])
+        self.assertEqual(bornes['borne_max'].tolist(), [np.inf, np.inf])
+    
+    def test_methode_iqr(self):
+        valeurs = [4000, 4500, 5000, 5000, 5500, 6000, 5000, 5000]
+        bornes = bornes_robustes(self.montants(valeurs), methode='iqr', limites_defaut=self.LIMITES)
+        # Q1 = 4875, Q3 = 5125 : seuil de Tukey 1,5 par défaut
+        self.assertEqual(bornes['borne_min'][0], 4875 - 1.5 * 250)
+        self.assertEqual(bornes['borne_max'][0], 5125 + 1.5 * 250)
+        self.assertEqual(self.aberrantes(self.montants(valeurs), methode='iqr'), {1: 'bas', 6: 'haut'})
+        
+        with self.assertRaises(ValueError):
+            bornes_robustes(self.montants(valeurs), methode='ecart_type')
+    
+    def test_par_quartier(self):
+        bastos = self.montants([20000, 20500, 19500, 20000, 20200, 19800, 20000, 20100], quartier='Bastos')
+        melen = self.montants([5000, 5100, 4900, 5050, 4950, 5000, 5100, 4900, 20000])
+        montants = pd.concat([bastos, melen.assign(id=melen['id'] + 100)], ignore_index=True)
+        
+        # Tous quartiers confondus, 20 000 FCFA est courant ; à Melen, c'est un écart
+        self.assertNotIn(109, self.aberrantes(montants))
+        self.assertEqual(self.aberrantes(montants, par=('categorie', 'quartier')), {109: 'haut'})
+    
+    def test_distributions(self):
+        montants = pd.concat([
+            self.montants([0, 10, 20, 40], quartier='Melen'),
+            self.montants([30, 40], quartier='Bastos'),
+            self.montants([25], quartier='Emana'),
+        ], ignore_index=True)
+        resume, bornes, histogrammes = distributions(montants, nb_classes=4)
+        
+        # Quantile 99 % de [0, 10, 20, 25, 30, 40, 40] : 40 ; une borne appartient à la classe qui la suit
+        self.assertEqual(bornes.tolist(), [0, 10, 20, 30, 40])
+        self.assertEqual(histogrammes, {'Melen': [1, 1, 1, 1], 'Bastos': [0, 0, 0, 2], 'Emana': [0, 0, 1, 0]})
+        
+        melen = resume.loc['Melen']
+        self.assertEqual((melen.effectif, melen.moyenne, melen.mediane), (4, 17.5, 15))
+        self.assertAlmostEqual(melen.p10, 3)
+        self.assertAlmostEqual(melen.p90, 34)
+        self.assertAlmostEqual(melen.ecart_type, (875 / 3) ** 0.5)
+        self.assertAlmostEqual(resume.loc['Bastos', 'ecart_type'], 50 ** 0.5)
+        # Écart-type d'un groupe d'une seule valeur : 0
+        self.assertEqual(resume.loc['Emana', 'ecart_type'], 0)
+    
+    def test_distributions_derniere_classe_ouverte(self):
+        # Au-delà du quantile 99 %, le montant extrême tombe dans la dernière classe sans l'élargir
+        montants = self.montants([0] + [100] * 99 + [1000])
+        _, bornes, histogrammes = distributions(montants, nb_classes=2)
+        self.assertEqual(bornes.tolist(), [0, 50, 100])
+        self.assertEqual(histogrammes, {'Melen': [1, 100]})
+
+
+class DetectionMontantsTests(DonneesMixin, TestCase):
+    """Options de bornes du détecteur et de la commande scanner_anomalies"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('montants')
+        bastos = self.creer_etudiant(self.enqueteur, quartier='Bastos')
+        melen = self.creer_etudiant(self.enqueteur, nom='Atangana Paul', quartier='Melen')
+        for montant in (20000, 20500, 19500, 20000, 20200, 19800, 20000, 20100):
+            self.creer_depense(bastos, montant=montant)
+        for montant in (5000, 5100, 4900, 5050, 4950, 5000, 5100, 4900):
+            self.creer_depense(melen, montant=montant)
+        self.ecart = self.creer_depense(melen, montant=20000)
+    
+    def test_bornes_par_quartier(self):
+        anomalies = DetecteurAnomalies(self.enqueteur).detecter_depenses_hors_norme()
+        self.assertNotIn(self.ecart.pk, [a['depense'].pk for a in anomalies])
+        for methode in ('mad', 'iqr'):
+            anomalies = DetecteurAnomalies(self.enqueteur, par_quartier=True, methode=methode).detecter_depenses_hors_norme()
+            self.assertIn((self.ecart.pk, 'montant_max'), [(a['depense'].pk, a['regle']) for a in anomalies], methode)
+    
+    def test_scanner_enqueteur(self):
+        resultat = scanner_enqueteur(self.enqueteur.pk, par_quartier=True, methode='iqr')
+        self.assertEqual(resultat['lignes'], 19)
+        self.assertTrue(
+            Anomalie.objects.filter(enqueteur=self.enqueteur, depense=self.ecart, type_anomalie='HORS_NORME').exists()
+        )
+
+    
+    def detection_incrementale(self, **options):
+        """Détection des dépenses hors norme modifiées depuis une minute, et requêtes de lecture des montants
+        
+        (hors chargement des seules dépenses signalées, par identifiants)
+        """
+        detecteur = DetecteurAnomalies(self.enqueteur, depuis=timezone.now() - timedelta(minutes=1), **options)
+        with CaptureQueriesContext(connection) as requetes:
+            anomalies = detecteur.detecter_depenses_hors_norme()
+        chargements = [
+            requete['sql'] for requete in requetes.captured_queries
+            if requete['sql'].startswith('SELECT') and 'FROM "core_depense"' in requete['sql']
+            and '"montant"' in requete['sql'] and '"id" IN (' not in requete['sql']
+        ]
+        return anomalies, chargements
+    
+    def vieillir_depenses(self):
+        Depense.objects.filter(enqueteur=self.enqueteur).update(date_modification=timezone.now() - timedelta(days=1))
+    
+    def test_bornes_enregistrees_par_la_detection_complete(self):
+        DetecteurAnomalies(self.enqueteur, par_quartier=True).detecter_depenses_hors_norme()
+        bornes = {
+            borne.quartier: borne
+            for borne in BorneMontant.objects.filter(enqueteur=self.enqueteur, methode='mad', par_quartier=True)
+        }
+        self.assertEqual(set(bornes), {'Bastos', 'Melen'})
+        self.assertLess(bornes['Melen'].borne_max, 20000)
+        self.assertGreater(bornes['Bastos'].borne_max, 20500)
+        
+        DetecteurAnomalies(self.enqueteur).detecter_depenses_hors_norme()
+        self.assertEqual(
+            list(BorneMontant.objects.filter(enqueteur=self.enqueteur, par_quartier=False).values_list('quartier', flat=True)),
+            [''],
+        )
+    
+    def test_incremental_ne_charge_que_les_depenses_modifiees(self):
+        DetecteurAnomalies(self.enqueteur, par_quartier=True).detecter_depenses_hors_norme()
+        self.vieillir_depenses()
+        melen = Etudiant.objects.get(enqueteur=self.enqueteur, quartier='Melen')
+        nouvelle = self.creer_depense(melen, montant=19000)
+        normale = self.creer_depense(melen, montant=5000)
+        
+        anomalies, chargements = self.detection_incrementale(par_quartier=True)
+        self.assertEqual([a['depense'].pk for a in anomalies], [nouvelle.pk])
+        self.assertNotIn(normale.pk, [a['depense'].pk for a in anomalies])
+        # Une seule lecture des montants, restreinte aux lignes modifiées
+        self.assertEqual(len(chargements), 1)
+        self.assertIn('"date_modification" >=', chargements[0])
+    
+    def test_incremental_compare_aux_bornes_enregistrees(self):
+        DetecteurAnomalies(self.enqueteur).detecter_depenses_hors_norme()
+        self.vieillir_depenses()
+        BorneMontant.objects.filter(enqueteur=self.enqueteur).update(borne_min=100, borne_max=200)
+        depense = self.creer_depense(Etudiant.objects.get(enqueteur=self.enqueteur, quartier='Melen'), montant=5000)
+        
+        anomalies, _ = self.detection_incrementale()
+        self.assertEqual([(a['depense'].pk, a['regle']) for a in anomalies], [(depense.pk, 'montant_max')])
+    
+    def test_groupe_inconnu_aux_limites_par_defaut(self):
+        DetecteurAnomalies(self.enqueteur).detecter_depenses_hors_norme()
+        self.vieillir_depenses()
+        etudiant = Etudiant.objects.get(enqueteur=self.enqueteur, quartier='Melen')
+        # Aucune dépense de santé lors de l'analyse complète : limites par défaut (1 000 à 100 000 FCFA)
+        chere = self.creer_depense(etudiant, categorie='SANTE', montant=150000)
+        self.creer_depense(etudiant, categorie='SANTE', montant=50000)
+        
+        anomalies, _ = self.detection_incrementale()
+        self.assertEqual([a['depense'].pk for a in anomalies], [chere.pk])
+    
+    def test_bornes_perimees_recalculees(self):
+        for options in ({}, {'methode': 'iqr'}):
+            # Pas de bornes pour cette méthode, ou bornes trop anciennes : analyse complète
+            BorneMontant.objects.filter(enqueteur=self.enqueteur).update(
+                date_calcul=timezone.now() - DUREE_VALIDITE_BORNES - timedelta(minutes=1)
+            )
+            _, chargements = self.detection_incrementale(**options)
+            self.assertEqual(len(chargements), 1)
+            self.assertNotIn('date_modification', chargements[0].split('WHERE', 1)[1])
+            self.assertTrue(BorneMontant.objects.filter(
+                enqueteur=self.enqueteur, methode=options.get('methode', 'mad'),
+                date_calcul__gte=timezone.now() - timedelta(minutes=1),
+            ).exists())
+
+
+class QuasiDoublonsTests(SimpleTestCase):
+    """Blocage puis score de similarité : fautes de frappe, accents, casse et ordre des mots"""
+    
+    @staticmethod
+    def fiches(*noms, quartier='Melen', age=20):
+        return [
+            {'id': id_, 'nom_normalise': normaliser_texte(nom), 'quartier': quartier, 'age': age}
+            for id_, nom in enumerate(noms, start=1)
+        ]
+    
+    def test_paires_proches(self):
+        for nom_a, nom_b in [
+            ('Ngono Marie', 'Ngono Mari'),
+            ('Ngono Marie', 'Marie Ngono'),
+            ('Essomba Éric', 'ESSOMBA  Erik'),
+            ('Owona Alice', 'Owono Alice'),
+        ]:
+            paires = quasi_doublons(self.fiches(nom_a, nom_b))
+            self.assertEqual([paire[:2] for paire in paires], [(1, 2)], (nom_a, nom_b))
+            self.assertGreaterEqual(paires[0][2], 0.85)
+    
+    def test_noms_differents(self):
+        for nom_a, nom_b in [
+            ('Ngono Marie', 'Ngono Paul'),
+            ('Ngono Marie', 'Atangana Paul'),
+            # Même bloc (quartier, âge, initiales), mais noms trop éloignés
+            ('Ngono Marie', 'Nkoulou Michel'),
+        ]:
+            self.assertEqual(quasi_doublons(self.fiches(nom_a, nom_b)), [], (nom_a, nom_b))
+    
+    def test_variantes_d_accents_et_de_casse_laissees_aux_doublons_exacts(self):
+        # Même nom normalisé : c'est un doublon exact, pas un quasi-doublon
+        fiches = self.fiches('Mbarga Hélène', 'MBARGA  helene')
+        self.assertEqual(fiches[0]['nom_normalise'], fiches[1]['nom_normalise'])
+        self.assertEqual(paires_candidates(fiches), {(1, 2)})
+        self.assertEqual(quasi_doublons(fiches), [])
+    
+    def test_blocage(self):
+        self.assertEqual(paires_candidates(self.fiches('Ngono Marie', 'Atangana Paul')), set())
+        # Sans quartier ni âge, seules les clés phonétique et de mots triés restent
+        fiches = self.fiches('Ngono Marie', 'Nkoulou Michel', quartier=None, age=None)
+        self.assertEqual(paires_candidates(fiches), set())
+        self.assertEqual(paires_candidates(self.fiches('Ngono Marie', '')), set())
+    
+    def test_bloc_trop_grand_ignore(self):
+        fiches = self.fiches(*['Ngono Marie'] * 4)
+        self.assertEqual(len(paires_candidates(fiches)), 6)
+        self.assertEqual(paires_candidates(fiches, taille_max_bloc=3), set())
+    
+    def test_ids_a_verifier(self):
+        fiches = self.fiches('Ngono Marie', 'Ngono Mari', 'Fouda Jean', 'Fouda Jeanne')
+        self.assertEqual([paire[:2] for paire in quasi_doublons(fiches)], [(1, 2), (3, 4)])
+        self.assertEqual([paire[:2] for paire in quasi_doublons(fiches, ids_a_verifier={4})], [(3, 4)])
+    
+    def test_similarite_insensible_a_l_ordre(self):
+        self.assertEqual(similarite('ngono marie', 'marie ngono'), 1.0)
+        self.assertLess(similarite('ngono marie', 'atangana paul'), 0.5)
+
+
+class DetectionQuasiDoublonsTests(DonneesMixin, TestCase):
+    """Quasi-doublons signalés par le détecteur, sur la fiche la plus récente"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('quasi')
+    
+    def test_anomalie_sur_la_fiche_recente(self):
+        ancien = self.creer_etudiant(self.enqueteur, nom='Essomba Éric')
+        recent = self.creer_etudiant(self.enqueteur, nom='ESSOMBA Erik')
+        self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        
+        anomalies = DetecteurAnomalies(self.enqueteur).detecter_quasi_doublons()
+        self.assertEqual(
+            [(a['etudiant'].pk, [d.pk for d in a['doublons']], a['regle']) for a in anomalies],
+            [(recent.pk, [ancien.pk], 'quasi_doublon')],
+        )
+    
+    def test_doublon_exact_non_signale_en_quasi_doublon(self):
+        self.creer_etudiant(self.enqueteur, nom='Mbarga Hélène')
+        self.creer_etudiant(self.enqueteur, nom='mbarga helene')
+        detecteur = DetecteurAnomalies(self.enqueteur)
+        self.assertEqual(detecteur.detecter_quasi_doublons(), [])
+        self.assertEqual(len(detecteur.detecter_doublons_etudiants()), 2)
+    
+    def test_incremental_ne_charge_que_les_blocs_modifies(self):
+        ancien = self.creer_etudiant(self.enqueteur, nom='Essomba Éric')
+        voisin = self.creer_etudiant(self.enqueteur, nom='Ondoa Luc', quartier='Bastos', age=23)
+        autres = [
+            self.creer_etudiant(self.enqueteur, nom=nom, quartier='Emana') for nom in ('Atangana Paul', 'Fouda Jean', 'Bella Rose')
+        ]
+        Etudiant.objects.filter(enqueteur=self.enqueteur).update(date_modification=timezone.now() - timedelta(days=1))
+        # Même code phonétique que « Essomba Éric », et même quartier (autre graphie) et même âge que « Ondoa Luc »
+        recent = self.creer_etudiant(self.enqueteur, nom='ESSOMBA Erik')
+        faute = self.creer_etudiant(self.enqueteur, nom='Ondoua Luc', quartier='BASTOS', age=23)
+        
+        detecteur = DetecteurAnomalies(self.enqueteur, depuis=timezone.now() - timedelta(minutes=1))
+        fiches, ids_a_verifier = detecteur.fiches_quasi_doublons()
+        self.assertEqual(ids_a_verifier, {recent.pk, faute.pk})
+        self.assertEqual({fiche['id'] for fiche in fiches}, {ancien.pk, voisin.pk, recent.pk, faute.pk})
+        self.assertFalse({autre.pk for autre in autres} & {fiche['id'] for fiche in fiches})
+        
+        incrementales = {(a['etudiant'].pk, a['cle']) for a in detecteur.detecter_quasi_doublons()}
+        completes = {(a['etudiant'].pk, a['cle']) for a in DetecteurAnomalies(self.enqueteur).detecter_quasi_doublons()}
+        self.assertEqual(incrementales, completes)
+        self.assertEqual(incrementales, {(recent.pk, str(ancien.pk)), (faute.pk, str(voisin.pk))})
+    
+    def test_incremental_sans_modification(self):
+        self.creer_etudiant(self.enqueteur, nom='Essomba Éric')
+        Etudiant.objects.filter(enqueteur=self.enqueteur).update(date_modification=timezone.now() - timedelta(days=1))
+        detecteur = DetecteurAnomalies(self.enqueteur, depuis=timezone.now() - timedelta(minutes=1))
+        with self.assertNumQueries(1):
+            self.assertEqual(detecteur.fiches_quasi_doublons(), ([], set()))
+
+
+class NormalisationTests(SimpleTestCase):
+    """Texte normalisé et clé d'identité : insensibles aux accents, à la casse et aux espaces"""
+    
+    def test_normaliser_texte(self):
+        for variante in ('Hélène Mbarga', 'HELENE MBARGA', '  hélène   mbarga ', 'Hélène\tMbarga', 'He\u0301le\u0300ne Mbarga'):
+            self.assertEqual(normaliser_texte(variante), 'helene mbarga', repr(variante))
+        self.assertEqual(normaliser_texte('Ngoa-Ékellé'), 'ngoa-ekelle')
+        self.assertEqual(normaliser_texte(''), '')
+        self.assertEqual(normaliser_texte(None), '')
+    
+    def test_cle_identite_variantes(self):
+        reference = calculer_cle_identite('Hélène Mbarga', 20, 'Université de Yaoundé I', 'Ngoa-Ékellé')
+        for variante in [
+            ('HELENE  MBARGA', 20, 'universite de yaounde i', 'NGOA-EKELLE'),
+            (' hélène mbarga ', 20, 'Université  de Yaoundé I ', 'ngoa-ékellé'),
+        ]:
+            self.assertEqual(calculer_cle_identite(*variante), reference, variante)
+    
+    def test_cle_identite_distingue_les_personnes(self):
+        reference = calculer_cle_identite('Hélène Mbarga', 20, 'Université de Yaoundé I', 'Melen')
+        for variante in [
+            ('Hélène Mbarga', 21, 'Université de Yaoundé I', 'Melen'),
+            ('Hélène Mbala', 20, 'Université de Yaoundé I', 'Melen'),
+            ('Hélène Mbarga', 20, 'Université de Yaoundé II', 'Melen'),
+            ('Hélène Mbarga', 20, 'Université de Yaoundé I', 'Bastos'),
+            ('Hélène Mbarga', None, 'Université de Yaoundé I', 'Melen'),
+        ]:
+            self.assertNotEqual(calculer_cle_identite(*variante), reference, variante)
+    
+    def test_code_phonetique_et_mots_tries(self):
+        self.assertEqual(code_phonetique('Marie'), code_phonetique('mari'))
+        self.assertEqual(code_phonetique('Éric'), code_phonetique('ERIK'))
+        self.assertEqual(code_phonetique('123'), '')
+        self.assertEqual(mots_tries('Mbarga  Hélène'), mots_tries('HELENE mbarga'))
+        self.assertEqual(cle_phonetique('Mbarga Hélène'), cle_phonetique('HELENE mbarga'))
+        self.assertEqual(cle_phonetique('Essomba Éric'), cle_phonetique('essomba erik'))
+
+
+class CleIdentiteTests(DonneesMixin, TestCase):
+    """Clés dérivées d'un étudiant tenues à jour à chaque sauvegarde"""
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('cles')
+    
+    def assertClesAJour(self, etudiant):
+        enregistre = Etudiant.objects.get(pk=etudiant.pk)
+        self.assertEqual(enregistre.nom_normalise, normaliser_texte(enregistre.nom))
+        self.assertEqual(
+            enregistre.cle_identite,
+            calculer_cle_identite(enregistre.nom, enregistre.age, enregistre.universite, enregistre.quartier),
+        )
+        self.assertEqual(enregistre.cle_phonetique, cle_phonetique(enregistre.nom))
+    
+    def test_meme_cle_entre_enqueteurs(self):
+        autre = self.creer_enqueteur('autre')
+        a = self.creer_etudiant(self.enqueteur, nom='Hélène Mbarga', quartier='Ngoa-Ékellé')
+        b = self.creer_etudiant(autre, nom='HELENE  MBARGA', quartier='ngoa-ekelle')
+        self.assertEqual(a.nom_normalise, b.nom_normalise)
+        self.assertEqual(a.cle_identite, b.cle_identite)
+        self.assertTrue(Etudiant.objects.filter(cle_identite=a.cle_identite).exclude(enqueteur=self.enqueteur).exists())
+    
+    def test_cle_mise_a_jour_a_la_sauvegarde(self):
+        etudiant = self.creer_etudiant(self.enqueteur, nom='Hélène Mbarga')
+        cle_initiale = etudiant.cle_identite
+        self.assertClesAJour(etudiant)
+        
+        etudiant.nom = 'Hélène Mbala'
+        etudiant.save()
+        self.assertClesAJour(etudiant)
+        self.assertNotEqual(Etudiant.objects.get(pk=etudiant.pk).cle_identite, cle_initiale)
+        
+        etudiant.quartier = 'Bastos'
+        etudiant.age = 21
+        etudiant.save()
+        self.assertClesAJour(etudiant)
+    
+    def test_cle_mise_a_jour_avec_update_fields(self):
+        etudiant = self.creer_etudiant(self.enqueteur, nom='Hélène Mbarga')
+        etudiant.nom = 'Hélène Mbala'
+        etudiant.save(update_fields=['nom'])
+        self.assertClesAJour(etudiant)
+        self.assertEqual(Etudiant.objects.get(pk=etudiant.pk).nom_normalise, 'helene mbala')
+
+
+class AgregatsDepensesTests(DonneesMixin, TestCase):
+    """La table de cumul journalière reste égale à une agrégation directe des dépenses"""
+    
+    JOUR = date(2025, 3, 10)
+    LENDEMAIN = date(2025, 3, 11)
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('agregats')
+        self.etudiant = self.creer_etudiant(self.enqueteur)
+    
+    def assertAgregatsExacts(self):
+        rafraichir_agregats(self.enqueteur)
+        champs = ('quartier', 'categorie', 'date_depense')
+        attendu = Depense.objects.filter(enqueteur=self.enqueteur).values(*champs).annotate(
+            nombre=Count('id'), total=Sum('montant'), minimum=Min('montant'), maximum=Max('montant'),
+        ).order_by(*champs)
+        agregats = AgregatDepenseJour.objects.filter(enqueteur=self.enqueteur).values(
+            *champs, 'nombre', 'total', 'minimum', 'maximum',
+        ).order_by(*champs)
+        self.assertEqual(list(agregats), list(attendu))
+        self.assertFalse(JourModifie.objects.filter(enqueteur=self.enqueteur).exists())
+    
+    def test_insertions(self):
+        self.creer_depense(self.etudiant, montant=1000, date_depense=self.JOUR)
+        self.creer_depense(self.etudiant, montant=3000, date_depense=self.JOUR)
+        self.creer_depense(self.etudiant, montant=500, date_depense=self.LENDEMAIN, categorie='TRANSPORT')
+        self.creer_depense(self.etudiant, montant=8000, date_depense=self.JOUR, quartier='Bastos')
+        self.assertAgregatsExacts()
+        self.assertEqual(AgregatDepenseJour.objects.filter(enqueteur=self.enqueteur).count(), 3)
+    
+    def test_modifications(self):
+        depense = self.creer_depense(self.etudiant, montant=1000, date_depense=self.JOUR)
+        self.creer_depense(self.etudiant, montant=3000, date_depense=self.JOUR)
+        self.assertAgregatsExacts()
+        
+        depense.montant = 9000
+        depense.save()
+        self.assertAgregatsExacts()
+        
+        depense.categorie = 'LOGEMENT'
+        depense.quartier = 'Bastos'
+        depense.save()
+        self.assertAgregatsExacts()
+    
+    def test_deplacement_entre_jours(self):
+        depense = self.creer_depense(self.etudiant, montant=1000, date_depense=self.JOUR)
+        self.assertAgregatsExacts()
+        
+        depense.date_depense = self.LENDEMAIN
+        depense.save()
+        self.assertAgregatsExacts()
+        # L'ancien jour n'a plus aucune dépense : sa ligne disparaît
+        self.assertFalse(AgregatDepenseJour.objects.filter(enqueteur=self.enqueteur, date_depense=self.JOUR).exists())
+    
+    def test_suppressions(self):
+        premiere = self.creer_depense(self.etudiant, montant=1000, date_depense=self.JOUR)
+        self.creer_depense(self.etudiant, montant=3000, date_depense=self.JOUR)
+        autre = self.creer_etudiant(self.enqueteur, nom='Atangana Paul')
+        self.creer_depense(autre, montant=2000, date_depense=self.LENDEMAIN)
+        self.assertAgregatsExacts()
+        
+        premiere.delete()
+        self.assertAgregatsExacts()
+        # Suppression en cascade avec l'étudiant
+        autre.delete()
+        self.assertAgregatsExacts()
+        self.assertEqual(AgregatDepenseJour.objects.filter(enqueteur=self.enqueteur).count(), 1)
+    
+    def test_rafraichissement_sans_modification(self):
+        self.creer_depense(self.etudiant, date_depense=self.JOUR)
+        self.assertEqual(rafraichir_agregats(self.enqueteur), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(rafraichir_agregats(self.enqueteur), 0)
+
+
+class StatistiquesAgregatsTests(DonneesMixin, TestCase):
+    """Évolution et comparaison des quartiers lues dans la table de cumul : mêmes chiffres que sur les dépenses brutes"""
+    
+    def setUp(self):
+        cache_statistiques.vider()
+        self.enqueteur = self.creer_enqueteur('cumul')
+        self.client.force_login(self.enqueteur.user)
+        aujourd_hui = timezone.localdate()
+        
+        melen = [self.creer_etudiant(self.enqueteur, nom=nom) for nom in ('Ngono Marie', 'Atangana Paul')]
+        bastos = self.creer_etudiant(self.enqueteur, nom='Essomba Luc', quartier='Bastos', sexe='M')
+        self.creer_etudiant(self.enqueteur, nom='Fouda Jean', quartier='Ngoa-Ekelle')
+        for etudiant, categorie, montant, jours in [
+            (melen[0], 'NOURRITURE', 1500, 0),
+            (melen[0], 'NOURRITURE', 2500, 0),
+            (melen[0], 'TRANSPORT', 700, 2),
+            (melen[1], 'LOGEMENT', 25000, 9),
+            (melen[1], 'NOURRITURE', 1800, 40),
+            (bastos, 'LOGEMENT', 60000, 1),
+            (bastos, 'NOURRITURE', 4000, 75),
+        ]:
+            self.creer_depense(
+                etudiant, categorie=categorie, montant=montant, date_depense=aujourd_hui - timedelta(days=jours)
+            )
+        # Dépense saisie dans un autre quartier que celui de l'étudiant
+        self.creer_depense(melen[1], categorie='TRANSPORT', montant=300, quartier='Bastos', date_depense=aujourd_hui)
+    
+    def quartiers_directs(self, quartiers, categorie=None):
+        """Calcul d'avant la table de cumul : agrégats sur les dépenses brutes de chaque quartier"""
+        resultats = {}
+        for quartier in quartiers:
+            depenses = Depense.objects.filter(enqueteur=self.enqueteur, quartier=quartier)
+            if categorie:
+                depenses = depenses.filter(categorie=categorie)
+            agregat = depenses.aggregate(
+                nb=Count('id'), total=Sum('montant'), moyenne=Avg('montant'), maximum=Max('montant'), minimum=Min('montant'),
+            )
+            resultats[quartier] = {
+                'nb_etudiants': Etudiant.objects.filter(enqueteur=self.enqueteur, quartier=quartier).count(),
+                'nb_depenses': agregat['nb'],
+                'total_depenses': agregat['total'] or 0.0,
+                'moyenne_depenses': round(agregat['moyenne'] or 0.0, 6),
+                'depense_max': agregat['maximum'] or 0.0,
+                'depense_min': agregat['minimum'] or 0.0,
+            }
+        return resultats
+    
+    def evolution_directe(self, granularite, periode, categorie=None, quartier=None):
+        """Totaux par intervalle calculés en Python sur les dépenses brutes (par date de dépense)"""
+        debut_de = {
+            'jour': lambda jour: jour,
+            'semaine': lambda jour: jour - timedelta(days=jour.weekday()),
+            'mois': lambda jour: jour.replace(day=1),
+        }[granularite]
+        depenses = Depense.objects.filter(enqueteur=self.enqueteur)
+        if categorie:
+            depenses = depenses.filter(categorie=categorie)
+        if quartier:
+            depenses = depenses.filter(quartier=quartier)
+        totaux = {}
+        for jour, montant in depenses.values_list('date_depense', 'montant'):
+            totaux[debut_de(jour)] = totaux.get(debut_de(jour), 0.0) + montant
+        
+        # Les `periode` derniers intervalles, jusqu'à celui d'aujourd'hui
+        debuts = [debut_de(timezone.localdate())]
+        while len(debuts) < periode:
+            debuts.append(debut_de(debuts[-1] - timedelta(days=1)))
+        return [(debut, totaux.get(debut, 0.0)) for debut in reversed(debuts)]
+    
+    def test_stats_par_quartier(self):
+        quartiers = ['Melen', 'Bastos', 'Ngoa-Ekelle']
+        for categorie in (None, 'NOURRITURE', 'SANTE'):
+            stats = {
+                ligne['quartier']: {
+                    cle: round(valeur, 6) if cle == 'moyenne_depenses' else valeur
+                    for cle, valeur in ligne.items() if cle in ('nb_etudiants', 'nb_depenses', 'total_depenses',
+                                                                 'moyenne_depenses', 'depense_max', 'depense_min')
+                }
+                for ligne in stats_par_quartier(self.enqueteur, categorie=categorie)
+            }
+            self.assertEqual(stats, self.quartiers_directs(quartiers, categorie), categorie)
+    
+    def test_api_comparaison_quartiers(self):
+        quartiers = ['Melen', 'Bastos', 'Ngoa-Ekelle']
+        for categorie in ('TOUTES', 'LOGEMENT'):
+            reponse = self.client.get('/api/comparaison-quartiers/', {'quartiers[]': quartiers, 'categorie': categorie})
+            self.assertEqual(reponse.status_code, 200)
+            attendu = self.quartiers_directs(quartiers, None if categorie == 'TOUTES' else categorie)
+            for ligne in reponse.json()['results']:
+                direct = attendu[ligne['quartier']]
+                self.assertEqual(
+                    (ligne['nb_etudiants'], ligne['nb_depenses'], ligne['total'], ligne['maximum'], ligne['minimum']),
+                    (direct['nb_etudiants'], direct['nb_depenses'], direct['total_depenses'],
+                     direct['depense_max'], direct['depense_min']),
+                    (categorie, ligne['quartier']),
+                )
+                self.assertAlmostEqual(ligne['moyenne'], direct['moyenne_depenses'], places=6)
+    
+    def test_evolution_depenses(self):
+        for granularite, periode in (('jour', 7), ('jour', 45), ('semaine', 8), ('mois', 4)):
+            for filtres in ({}, {'categorie': 'NOURRITURE'}, {'quartier': 'Bastos'}):
+                self.assertEqual(
+                    evolution_depenses(self.enqueteur, granularite, periode, **filtres),
+                    self.evolution_directe(granularite, periode, **filtres),
+                    (granularite, periode, filtres),
+                )
+    
+    def test_api_evolution_suit_les_ecritures(self):
+        def montants():
+            return self.client.get('/api/evolution-depenses/', {'granularite': 'semaine', 'periode': 12}).json()['montants']
+        
+        self.assertEqual(montants(), [total for _, total in self.evolution_directe('semaine', 12)])
+        
+        depense = Depense.objects.filter(enqueteur=self.enqueteur, montant=25000).get()
+        depense.date_depense = timezone.localdate()
+        depense.save()
+        self.creer_depense(Etudiant.objects.get(nom='Fouda Jean'), montant=900, date_depense=timezone.localdate())
+        self.assertEqual(montants(), [total for _, total in self.evolution_directe('semaine', 12)])
+
+
+class DistributionsDepensesTests(DonneesMixin, TestCase):
+    """Distributions de montants (bornes de classes et histogrammes) calculées à la main"""
+    
+    def setUp(self):
+        cache_statistiques.vider()
+        self.enqueteur = self.creer_enqueteur('distributions')
+        self.client.force_login(self.enqueteur.user)
+        melen = self.creer_etudiant(self.enqueteur)
+        bastos = self.creer_etudiant(self.enqueteur, nom='Essomba Luc', quartier='Bastos')
+        for montant in (1000, 2000, 3000, 5000):
+            self.creer_depense(melen, montant=montant)
+        self.creer_depense(bastos, categorie='LOGEMENT', montant=4000)
+        self.creer_depense(bastos, montant=5000)
+        # Les dépenses des autres enquêteurs ne comptent pas
+        self.creer_depense(self.creer_etudiant(self.creer_enqueteur('autre')), montant=900000)
+    
+    def test_distributions_depenses(self):
+        resultat = distributions_depenses(self.enqueteur, nb_classes=4)
+        self.assertEqual(resultat['bornes_classes'], [1000, 2000, 3000, 4000, 5000])
+        self.assertEqual(resultat['groupes']['Melen']['histogramme'], [1, 1, 1, 1])
+        self.assertEqual(resultat['groupes']['Bastos']['histogramme'], [0, 0, 0, 2])
+        
+        melen = resultat['groupes']['Melen']
+        self.assertEqual((melen['effectif'], melen['moyenne'], melen['mediane']), (4, 2750, 2500))
+        self.assertAlmostEqual(melen['p10'], 1300)
+        self.assertAlmostEqual(melen['p90'], 4400)
+        bastos = resultat['groupes']['Bastos']
+        self.assertEqual((bastos['effectif'], bastos['p10'], bastos['p90']), (2, 4100, 4900))
+        self.assertAlmostEqual(bastos['ecart_type'], 500000 ** 0.5)
+    
+    def test_distributions_filtrees(self):
+        resultat = distributions_depenses(self.enqueteur, categorie='NOURRITURE', quartiers=['Bastos'], nb_classes=4)
+        # Une seule valeur : la classe unique s'étend sur 1 FCFA
+        self.assertEqual(resultat['bornes_classes'], [5000, 5000.25, 5000.5, 5000.75, 5001])
+        self.assertEqual(resultat['groupes'], {'Bastos': {
+            'effectif': 1, 'moyenne': 5000, 'ecart_type': 0, 'p10': 5000, 'mediane': 5000, 'p90': 5000,
+            'histogramme': [1, 0, 0, 0],
+        }})
+        self.assertEqual(
+            distributions_depenses(self.enqueteur, categorie='SANTE'), {'bornes_classes': [], 'groupes': {}}
+        )
+    
+    def test_api_distributions_depenses(self):
+        # 10 classes de 400 FCFA entre 1 000 et 5 000 ; 3 000 est une borne, 5 000 tombe dans la dernière classe
+        reponse = self.client.get('/api/distributions-depenses/', {'par': 'categorie'})
+        self.assertEqual(reponse.status_code, 200)
+        donnees = reponse.json()
+        self.assertEqual(donnees['par'], 'categorie')
+        self.assertEqual(donnees['bornes_classes'], [1000 + 400 * i for i in range(11)])
+        self.assertEqual(donnees['groupes']['NOURRITURE']['histogramme'], [1, 0, 1, 0, 0, 1, 0, 0, 0, 2])
+        self.assertEqual(donnees['groupes']['LOGEMENT']['histogramme'], [0, 0, 0, 0, 0, 0, 0, 1, 0, 0])
+        
+        donnees = self.client.get('/api/distributions-depenses/', {'categorie': 'NOURRITURE'}).json()
+        self.assertEqual(donnees['par'], 'quartier')
+        self.assertEqual(donnees['groupes']['Melen']['histogramme'], [1, 0, 1, 0, 0, 1, 0, 0, 0, 1])
+        self.assertEqual(donnees['groupes']['Bastos']['histogramme'], [0, 0, 0, 0, 0, 0, 0, 0, 0, 1])
+        
+        reponse = self.client.get('/api/distributions-depenses/', {'par': 'universite'})
+        self.assertEqual(reponse.status_code, 400)
+    
+    def test_page_comparaison_affiche_les_histogrammes(self):
+        reponse = self.client.get('/comparaison-quartiers/')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertContains(reponse, 'id="chartHistogramme"')
+        self.assertEqual(reponse.context['bornes_classes'], distributions_depenses(self.enqueteur)['bornes_classes'])
+        histogrammes = {q['nom']: q['histogramme'] for q in reponse.context['quartiers_data']}
+        self.assertEqual(histogrammes['Bastos'], [0, 0, 0, 0, 0, 0, 0, 1, 0, 1])
+        self.assertContains(reponse, '<script id="bornes-classes" type="application/json">[1000.0, 1400.0')
+
+
+class GrilleGpsTests(SimpleTestCase):
+    """Cellules de la grille fixe (0,01°) : un point situé sur une limite appartient à la cellule qui la suit"""
+    
+    def test_cellule_gps(self):
+        self.assertEqual(geo.cellule_gps(3.87, 11.52), '387:1152')
+        self.assertEqual(geo.cellule_gps(3.8699, 11.5199), '386:1151')
+        self.assertEqual(geo.cellule_gps(0, 0), '0:0')
+        self.assertEqual(geo.cellule_gps(-0.01, -0.005), '-1:-1')
+        self.assertEqual(geo.cellule_gps(None, 11.52), '')
+        self.assertEqual(geo.cellule_gps(3.87, None), '')
+    
+    def test_cellules_cadre(self):
+        self.assertEqual(geo.cellules_cadre(3.87, 11.52, 3.87, 11.52), ['387:1152'])
+        self.assertEqual(
+            geo.cellules_cadre(3.865, 11.515, 3.87, 11.52), ['386:1151', '386:1152', '387:1151', '387:1152'],
+        )
+        self.assertEqual(geo.cellules_cadre(-0.005, -0.005, 0.005, 0), ['-1:-1', '-1:0', '0:-1', '0:0'])
+        # 101 × 101 cellules : au-delà de CELLULES_MAX, le filtre porte directement sur les coordonnées
+        self.assertIsNone(geo.cellules_cadre(0, 0, 1, 1))
+    
+    def test_points_du_cadre_dans_ses_cellules(self):
+        cadre = (3.86, 11.51, 3.88, 11.53)
+        cellules = set(geo.cellules_cadre(*cadre))
+        for lat in (3.86, 3.865, 3.87, 3.88):
+            for lng in (11.51, 11.52, 11.5299, 11.53):
+                self.assertIn(geo.cellule_gps(lat, lng), cellules, (lat, lng))
+
+
+class ProximiteTests(DonneesMixin, TestCase):
+    """Recherche par rayon et API cartographique des étudiants proches"""
+    
+    CENTRE = (3.87, 11.52)
+    
+    def setUp(self):
+        cache_statistiques.vider()
+        self.enqueteur = self.creer_enqueteur('carte')
+        self.client.force_login(self.enqueteur.user)
+        # À ≈ 0,56 km, ≈ 0,95 km, puis dans le coin du cadre de 1 km mais à ≈ 1,26 km du centre
+        self.proche = self.creer_etudiant(self.enqueteur, nom='Proche', gps_lat=3.875, gps_lng=11.52)
+        self.limite = self.creer_etudiant(self.enqueteur, nom='Limite', gps_lat=3.87, gps_lng=11.5285)
+        self.coin = self.creer_etudiant(self.enqueteur, nom='Coin', gps_lat=3.878, gps_lng=11.528)
+        self.creer_etudiant(self.enqueteur, nom='Sans GPS')
+        self.creer_depense(self.proche, montant=1000)
+        self.creer_depense(self.proche, montant=500)
+        self.creer_depense(self.limite, montant=2000)
+        self.creer_depense(self.coin, montant=7000)
+    
+    def test_dans_rayon(self):
+        etudiants = Etudiant.objects.filter(enqueteur=self.enqueteur)
+        cadre = geo.dans_cadre(etudiants, *geo.cadre_autour(*self.CENTRE, 1))
+        self.assertEqual({e.pk for e in cadre}, {self.proche.pk, self.limite.pk, self.coin.pk})
+        
+        # Le coin du cadre est hors du cercle : exclu, et les autres sont triés par distance
+        proches = list(geo.dans_rayon(etudiants, *self.CENTRE, 1))
+        self.assertEqual([e.pk for e in proches], [self.proche.pk, self.limite.pk])
+        for etudiant in proches:
+            self.assertAlmostEqual(
+                etudiant.distance_km, geo.distance_km(*self.CENTRE, etudiant.gps_lat, etudiant.gps_lng), places=9,
+            )
+        self.assertGreater(geo.distance_km(*self.CENTRE, self.coin.gps_lat, self.coin.gps_lng), 1)
+        self.assertEqual(len(geo.dans_rayon(etudiants, *self.CENTRE, 1.5)), 3)
+    
+    def test_api_rayon(self):
+        reponse = self.client.get('/api/etudiants-proximite/', {'lat': 3.87, 'lng': 11.52, 'rayon': 1})
+        self.assertEqual(reponse.status_code, 200)
+        donnees = reponse.json()
+        self.assertEqual([e['nom'] for e in donnees['etudiants']], ['Proche', 'Limite'])
+        self.assertEqual(donnees['etudiants'][0]['nb_depenses'], 2)
+        self.assertEqual(donnees['etudiants'][0]['total_depenses'], 1500)
+        self.assertEqual((donnees['nombre'], donnees['tronque'], donnees['total_depenses']), (2, False, 3500))
+        
+        donnees = self.client.get('/api/etudiants-proximite/', {'cadre': '3.86,11.51,3.88,11.53'}).json()
+        self.assertEqual([e['nom'] for e in donnees['etudiants']], ['Proche', 'Limite', 'Coin'])
+        self.assertEqual(donnees['total_depenses'], 10500)
+    
+    def test_api_tronquee_par_la_base(self):
+        with mock.patch.object(geo, 'RESULTATS_MAX', 2), CaptureQueriesContext(connection) as requetes:
+            donnees = self.client.get('/api/etudiants-proximite/', {'lat': 3.87, 'lng': 11.52, 'rayon': 1.5}).json()
+        
+        # Les plus proches, mais l'effectif et le total portent sur toute la zone
+        self.assertEqual([e['nom'] for e in donnees['etudiants']], ['Proche', 'Limite'])
+        self.assertEqual((donnees['nombre'], donnees['tronque'], donnees['total_depenses']), (3, True, 10500))
+        chargement = next(r['sql'] for r in requetes.captured_queries if '"nb_depenses"' in r['sql'])
+        # Cercle, tri par distance et limite évalués en SQL
+        self.assertIn('ASIN(', chargement)
+        self.assertRegex(chargement, r' ORDER BY \S+ ASC, \S+ ASC LIMIT 2$')
+    
+    def test_api_parametres_invalides(self):
+        for parametres in [
+            {},
+            {'lat': 3.87},
+            {'lat': 'abc', 'lng': 11.52},
+            {'lat': 95, 'lng': 11.52},
+            {'lat': 3.87, 'lng': 'nan'},
+            {'lat': 3.87, 'lng': 11.52, 'rayon': 0},
+            {'lat': 3.87, 'lng': 11.52, 'rayon': 30},
+            {'lat': 3.87, 'lng': 11.52, 'rayon': 'loin'},
+            {'cadre': '3.86,11.51,3.88'},
+            {'cadre': '3.88,11.51,3.86,11.53'},
+            {'cadre': '3.86,11.51,3.88,181'},
+        ]:
+            reponse = self.client.get('/api/etudiants-proximite/', parametres)
+            self.assertEqual(reponse.status_code, 400, parametres)
+            self.assertIn('error', reponse.json(), parametres)
+
+
+class PaginationListeTests(DonneesMixin, TestCase):
+    """Pagination par clé de la liste des étudiants : sans doublon ni trou, filtres conservés par le curseur"""
+    
+    FILTRES = {'nom': '', 'quartier': 'Melen', 'statut': 'COMPLET', 'periode': ''}
+    
+    def setUp(self):
+        self.enqueteur = self.creer_enqueteur('pages')
+        self.client.force_login(self.enqueteur.user)
+        maintenant = timezone.now()
+        for i in range(23):
+            etudiant = self.creer_etudiant(self.enqueteur, nom=f"Etudiant {i}", statut='COMPLET')
+            # Dates égales trois par trois : l'id départage les lignes de même date
+            Etudiant.objects.filter(pk=etudiant.pk).update(date_collecte=maintenant - timedelta(hours=i // 3))
+        # Hors filtres : autre quartier, autre statut
+        self.creer_etudiant(self.enqueteur, nom='Bastos', quartier='Bastos', statut='COMPLET')
+        self.creer_etudiant(self.enqueteur, nom='Brouillon')
+        self.attendus = list(
+            Etudiant.objects.filter(enqueteur=self.enqueteur, quartier='Melen', statut='COMPLET')
+                            .order_by('-date_collecte', '-id').values_list('pk', flat=True)
+        )
+    
+    def page(self, parametres):
+        reponse = self.client.get('/etudiants/', parametres)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.context['filtres'], self.FILTRES)
+        return reponse, [etudiant.pk for etudiant in reponse.context['etudiants']]
+    
+    def test_pages_suivantes_puis_precedentes(self):
+        reponse, ids = self.page({'quartier': 'Melen', 'statut': 'COMPLET', 'taille': 10})
+        pages = [ids]
+        while reponse.context['curseur_suivant']:
+            # Les paramètres de l'URL sont ignorés : seuls comptent les filtres signés dans le curseur
+            reponse, ids = self.page({'curseur': reponse.context['curseur_suivant'], 'quartier': 'Bastos'})
+            pages.append(ids)
+        self.assertEqual([len(page) for page in pages], [10, 10, 3])
+        self.assertEqual([pk for page in pages for pk in page], self.attendus)
+        
+        # Retour en arrière depuis la dernière page : mêmes pages, dans l'ordre inverse
+        retour = [ids]
+        while reponse.context['curseur_precedent']:
+            reponse, ids = self.page({'curseur': reponse.context['curseur_precedent']})
+            retour.append(ids)
+        self.assertEqual(retour, pages[::-1])
+    
+    def test_filtres_rendus_pour_les_filtres_rapides(self):
+        reponse, _ = self.page({'quartier': 'Melen', 'statut': 'COMPLET', 'taille': 10})
+        reponse, _ = self.page({'curseur': reponse.context['curseur_suivant']})
+        self.assertContains(reponse, '<script id="filtres-liste" type="application/json">')
+        self.assertContains(reponse, '"quartier": "Melen"')
+        # Le quartier du curseur reste sélectionné dans le formulaire de recherche
+        self.assertEqual(list(reponse.context['quartiers_uniques']), ['Bastos', 'Melen'])
+        self.assertRegex(reponse.content.decode(), r'<option value="Melen"\s+selected>')
+    
+    def test_curseur_altere_ignore(self):
+        reponse, _ = self.page({'quartier': 'Melen', 'statut': 'COMPLET', 'taille': 10})
+        jeton = reponse.context['curseur_suivant']
+        reponse = self.client.get('/etudiants/', {'curseur': jeton[:-2] + 'xx', 'quartier': 'Bastos'})
+        self.assertEqual(reponse.context['filtres']['quartier'], 'Bastos')
+        self.assertEqual([e.nom for e in reponse.context['etudiants']], ['Bastos'])
+
+
+class BenchmarkTests(TestCase):
+    """Banc d'essai de la détection sur un petit jeu synthétique : structure du rapport et base inchangée"""
+    
+    def assertMesures(self, resultat, lot):
+        attendues = methodes_detection() + ['creer_anomalies_bd', 'creer_anomalies_bd_incremental']
+        self.assertEqual(sorted(resultat['mesures']), sorted(attendues))
+        for nom, mesure in resultat['mesures'].items():
+            self.assertIsInstance(mesure['duree_s'], float, nom)
+            self.assertGreaterEqual(mesure['duree_s'], 0, nom)
+            self.assertGreater(mesure['requetes'], 0, nom)
+            self.assertGreaterEqual(mesure['anomalies'], 0, nom)
+        self.assertEqual(resultat['mesures']['creer_anomalies_bd_incremental']['lot'], lot)
+    
+    def test_executer_benchmark(self):
+        rapportees = []
+        rapport = executer_benchmark(
+            [20, 40], depenses_par_etudiant=2, graine=1, lot_incremental=5,
+            rapporter=lambda taille, methode, mesure: rapportees.append((taille, methode)),
+        )
+        
+        self.assertEqual(
+            set(rapport), {'date', 'python', 'django', 'base_de_donnees', 'parametres', 'resultats'},
+        )
+        self.assertEqual(rapport['parametres']['lot_incremental'], 5)
+        self.assertEqual([(r['nb_etudiants'], r['nb_depenses']) for r in rapport['resultats']], [(20, 40), (40, 80)])
+        for resultat in rapport['resultats']:
+            self.assertGreater(resultat['generation_s'], 0)
+            self.assertMesures(resultat, lot=5)
+        self.assertEqual(len(rapportees), 2 * (len(methodes_detection()) + 2))
+        
+        # Données générées dans une transaction annulée
+        self.assertFalse(Etudiant.objects.exists())
+        self.assertFalse(Enqueteur.objects.exists())
+    
+    def test_commande_benchmark_anomalies(self):
+        sortie, journal = io.StringIO(), io.StringIO()
+        call_command('benchmark_anomalies', '--tailles', '15', '--lot-incremental', '3', stdout=sortie, stderr=journal)
+        rapport = json.loads(sortie.getvalue())
+        self.assertEqual([r['nb_etudiants'] for r in rapport['resultats']], [15])
+        self.assertMesures(rapport['resultats'][0], lot=3)
+        self.assertIn('creer_anomalies_bd_incremental', journal.getvalue())
+        
+        with self.assertRaises(CommandError):
+            call_command('benchmark_anomalies', '--tailles', '15,beaucoup', stdout=io.StringIO(), stderr=io.StringIO())
@@ -41,7 +41,10 @@ urlpatterns = [
     path('api/sexe-stats/', views.api_sexe_stats, name='api_sexe_stats'),
     path('api/evolution-depenses/', views.api_evolution_depenses, name='api_evolution_depenses'),
     path('api/rechercher-etudiants/', views.api_rechercher_etudiants, name='api_rechercher_etudiants'),
+    path('api/etudiants-proximite/', views.api_etudiants_proximite, name='api_etudiants_proximite'),
     path('api/anomalies/stats/', views.api_anomalies_stats, name='api_anomalies_stats'),
+    path('api/pivot/', views.api_pivot, name='api_pivot'),
+    path('flux/', views.flux_donnees, name='flux_donnees'),
     
     # ===== AUTHENTIFICATION =====
     path('login/', views.login_view, name='login'),
@@ -50,5 +53,6 @@ urlpatterns = [
     # ===== COMPARAISON QUARTIERS =====
     path('comparaison-quartiers/', views.comparaison_quartiers, name='comparaison_quartiers'),
     path('api/comparaison-quartiers/', views.api_comparaison_quartiers, name='api_comparaison_quartiers'),
+    path('api/distributions-depenses/', views.api_distributions_depenses, name='api_distributions_depenses'),
     path('etudiant/<int:id>/detail/', views.etudiant_detail, name='etudiant_detail_old'),
 ]
\ No newline at end of file
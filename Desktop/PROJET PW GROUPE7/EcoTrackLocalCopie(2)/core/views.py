@@ -2,11 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Count, Sum, Avg, Q, Max, Min
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Count, Sum, Avg
 import csv
 import io
 import json
+import orjson
 from datetime import datetime, date, timedelta
 from django.utils import timezone
 from reportlab.pdfgen import canvas
@@ -15,9 +17,14 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 
-from .models import Enqueteur, Etudiant, Depense, Anomalie
+from .models import Enqueteur, Etudiant, Depense, Anomalie, ResumeEnqueteur
+from . import flux, geo, pivot, recherche, statistiques
 from .forms import EtudiantForm, DepenseForm, LoginForm
 from .detecteur_anomalies import DetecteurAnomalies
+from .taches import planifier_detection, etat_detection
+from .cache_stats import en_cache
+from .decorators import donnees_conditionnelles
+from .pagination import TAILLES_PAGE, lire_curseur, paginer_par_cle, signer_curseur, taille_page
 
 # =========== UTILITAIRES ===========
 def get_or_create_enqueteur(user):
@@ -59,23 +66,21 @@ def dashboard(request):
     # Récupérer l'enquêteur
     enqueteur = get_or_create_enqueteur(request.user)
     
-    # Statistiques de base
-    total_etudiants = Etudiant.objects.filter(enqueteur=enqueteur).count()
-    total_depenses = Depense.objects.filter(enqueteur=enqueteur).count()
-    montant_total = Depense.objects.filter(enqueteur=enqueteur).aggregate(Sum('montant'))['montant__sum'] or 0
+    # Statistiques de base (résumé pré-calculé : une seule ligne lue)
+    resume = statistiques.resume_enqueteur(enqueteur)
+    total_etudiants = resume.nb_etudiants
+    total_depenses = resume.nb_depenses
+    montant_total = resume.montant_total
     
     # Statistiques par sexe
-    hommes_count = Etudiant.objects.filter(enqueteur=enqueteur, sexe='M').count()
-    femmes_count = Etudiant.objects.filter(enqueteur=enqueteur, sexe='F').count()
+    hommes_count = resume.nb_hommes
+    femmes_count = resume.nb_femmes
     
     # Nombre de quartiers distincts
-    quartiers_count = Etudiant.objects.filter(enqueteur=enqueteur)\
-                                     .values('quartier')\
-                                     .distinct()\
-                                     .count()
+    quartiers_count = resume.nb_quartiers
 
     # Anomalies
-    anomalies = Anomalie.objects.filter(enqueteur=enqueteur, statut='A_TRAITER').count()
+    anomalies = resume.nb_anomalies_ouvertes
     
     # Dernières anomalies
     dernieres_anomalies = Anomalie.objects.filter(enqueteur=enqueteur).order_by('-date_detection')[:5]
@@ -188,38 +193,28 @@ def profil(request):
         return redirect('profil')
     
     # ===== CALCULER LES STATISTIQUES COMPLÈTES =====
-    total_etudiants = Etudiant.objects.filter(enqueteur=enqueteur).count()
-    total_depenses = Depense.objects.filter(enqueteur=enqueteur).count()
+    kpis = statistiques.calculer_kpis(enqueteur)
+    total_etudiants = kpis['nb_etudiants']
+    total_depenses = kpis['nb_depenses']
     
     # Calcul du montant total et moyenne générale
-    montant_total = Depense.objects.filter(enqueteur=enqueteur).aggregate(Sum('montant'))['montant__sum'] or 0
+    montant_total = kpis['montant_total']
+    moyenne_generale = kpis['moyenne_depenses']
     
-    if total_depenses > 0:
-        moyenne_generale = montant_total / total_depenses
-    else:
-        moyenne_generale = 0
-    
-    quartiers = Etudiant.objects.filter(enqueteur=enqueteur)\
-                               .values('quartier')\
-                               .distinct()\
-                               .count()
+    quartiers = kpis['nb_quartiers']
     
-    anomalies_resolues = Anomalie.objects.filter(enqueteur=enqueteur, statut='RESOLUE').count()
+    anomalies_resolues = kpis['nb_anomalies_resolues']
     
     # Statistiques par sexe
-    hommes_count = Etudiant.objects.filter(enqueteur=enqueteur, sexe='M').count()
-    femmes_count = Etudiant.objects.filter(enqueteur=enqueteur, sexe='F').count()
+    hommes_count = kpis['nb_hommes']
+    femmes_count = kpis['nb_femmes']
     
     # Dernières activités
     dernieres_depenses = Depense.objects.filter(enqueteur=enqueteur).order_by('-date_saisie')[:5]
     dernieres_etudiants = Etudiant.objects.filter(enqueteur=enqueteur).order_by('-date_collecte')[:5]
     
     # Évolution ce mois (simplifié)
-    date_debut_mois = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    etudiants_ce_mois = Etudiant.objects.filter(
-        enqueteur=enqueteur,
-        date_collecte__gte=date_debut_mois
-    ).count()
+    etudiants_ce_mois = kpis['etudiants_ce_mois']
     
     # Calculer le pourcentage d'évolution
     if total_etudiants > 0 and etudiants_ce_mois > 0:
@@ -253,20 +248,29 @@ def parametres(request):
 # =========== GESTION ÉTUDIANTS ===========
 @login_required
 def etudiant_list(request):
-    """Liste des étudiants avec filtres"""
+    """Liste des étudiants avec filtres, paginée côté serveur (pagination par clé)"""
     enqueteur = get_or_create_enqueteur(request.user)
     
-    # Récupérer les paramètres de recherche
-    nom = request.GET.get('nom', '')
-    quartier = request.GET.get('quartier', '')
-    statut = request.GET.get('statut', '')
-    periode = request.GET.get('periode', '')
+    # Un curseur valide porte les filtres de la liste ; sinon on lit les paramètres de recherche
+    curseur = lire_curseur(request.GET.get('curseur'))
+    if curseur:
+        filtres = curseur['filtres']
+        taille = taille_page(request.GET.get('taille', curseur['taille']))
+    else:
+        filtres = {champ: request.GET.get(champ, '') for champ in ('nom', 'quartier', 'statut', 'periode')}
+        taille = taille_page(request.GET.get('taille'))
+    
+    nom = filtres['nom']
+    quartier = filtres['quartier']
+    statut = filtres['statut']
+    periode = filtres['periode']
     
     # Filtrer les étudiants
     etudiants = Etudiant.objects.filter(enqueteur=enqueteur)
     
     if nom:
-        etudiants = etudiants.filter(nom__icontains=nom)
+        # Recherche par nom dans l'index plein texte, évaluée en sous-requête SQL
+        etudiants = etudiants.filter(recherche.filtre_recherche(enqueteur, nom, colonnes=('nom',)))
     
     if quartier:
         etudiants = etudiants.filter(quartier=quartier)
@@ -285,14 +289,30 @@ def etudiant_list(request):
         elif periode == 'quarter':
             etudiants = etudiants.filter(date_collecte__date__gte=aujourdhui - timedelta(days=90))
     
+    page, a_precedente, a_suivante = paginer_par_cle(etudiants, taille, curseur)
+    # Dépenses comptées pour les seules lignes de la page (la requête de page reste une lecture d'index)
+    nb_depenses = statistiques.nb_depenses_par_etudiant([etudiant.pk for etudiant in page])
+    for etudiant in page:
+        etudiant.nb_depenses = nb_depenses.get(etudiant.pk, 0)
+    
+    # Curseurs des pages voisines, construits sur la première et la dernière ligne affichées
+    curseur_precedent = curseur_suivant = None
+    if page and a_precedente:
+        curseur_precedent = signer_curseur(filtres, taille, 'precedent', page[0].date_collecte, page[0].pk)
+    if page and a_suivante:
+        curseur_suivant = signer_curseur(filtres, taille, 'suivant', page[-1].date_collecte, page[-1].pk)
+    
     context = {
-        'etudiants': etudiants,
-        'filtres': {
-            'nom': nom,
-            'quartier': quartier,
-            'statut': statut,
-            'periode': periode,
-        }
+        'etudiants': page,
+        # Total connu sans requête supplémentaire uniquement pour la liste non filtrée
+        'total_etudiants': None if any(filtres.values()) else statistiques.resume_enqueteur(enqueteur).nb_etudiants,
+        'filtres': filtres,
+        'quartiers_uniques': Etudiant.objects.filter(enqueteur=enqueteur)
+                                             .values_list('quartier', flat=True).distinct().order_by('quartier'),
+        'taille_page': taille,
+        'tailles_page': sorted(TAILLES_PAGE),
+        'curseur_precedent': curseur_precedent,
+        'curseur_suivant': curseur_suivant,
     }
     
     return render(request, 'core/etudiant_list.html', context)
@@ -310,6 +330,7 @@ def etudiant_create(request):
             # ASSIGNER L'ENQUÊTEUR AVANT DE SAUVEGARDER
             etudiant.enqueteur = enqueteur
             etudiant.save()
+            planifier_detection(enqueteur)
             
             messages.success(request, f'Étudiant "{etudiant.nom}" créé avec succès !')
             return redirect('etudiant_detail', id=etudiant.id)  # Redirige vers les détails
@@ -349,6 +370,7 @@ def etudiant_update(request, id):
         form = EtudiantForm(request.POST, request.FILES, instance=etudiant)
         if form.is_valid():
             form.save()
+            planifier_detection(enqueteur)
             messages.success(request, f'Étudiant "{etudiant.nom}" modifié avec succès !')
             return redirect('etudiant_detail', id=etudiant.id)
         else:
@@ -369,6 +391,9 @@ def etudiant_delete(request, id):
         enqueteur = get_or_create_enqueteur(request.user)
         etudiant = get_object_or_404(Etudiant, id=id, enqueteur=enqueteur)
         etudiant.delete()
+        # Une suppression ne modifie aucune ligne restante : seule une analyse complète
+        # en voit les effets (bornes des montants recalculées, doublons)
+        planifier_detection(enqueteur, incremental=False)
         return JsonResponse({'success': True, 'message': 'Étudiant supprimé avec succès'})
     return JsonResponse({'success': False, 'message': 'Méthode non autorisée'}, status=405)
 
@@ -478,9 +503,8 @@ def depense_create(request, etudiant_id):
             if depenses_crees > 0:
                 messages.success(request, f'{depenses_crees} dépense(s) créée(s) avec succès !')
                 
-                # DÉTECTER LES ANOMALIES APRÈS LA CRÉATION
-                detecteur = DetecteurAnomalies(enqueteur)
-                detecteur.creer_anomalies_bd()
+                # DÉTECTER LES ANOMALIES SUR LES SEULES DONNÉES MODIFIÉES (en arrière-plan)
+                planifier_detection(enqueteur)
                 
                 # Rediriger vers les détails de l'étudiant
                 return redirect('etudiant_detail', id=etudiant.id)
@@ -518,6 +542,7 @@ def depense_update(request, id):
         form = DepenseForm(request.POST, request.FILES, instance=depense)
         if form.is_valid():
             form.save()
+            planifier_detection(enqueteur)
             return redirect('etudiant_detail', id=depense.etudiant.id)
     else:
         form = DepenseForm(instance=depense)
@@ -535,6 +560,8 @@ def depense_delete(request, id):
         depense = get_object_or_404(Depense, id=id, enqueteur=enqueteur)
         etudiant_id = depense.etudiant.id
         depense.delete()
+        # Analyse complète : l'étudiant peut se retrouver sans dépense, les bornes des montants changent
+        planifier_detection(enqueteur, incremental=False)
         return JsonResponse({'success': True, 'etudiant_id': etudiant_id})
     return JsonResponse({'success': False}, status=405)
 
@@ -543,9 +570,8 @@ def depense_delete(request, id):
 def anomalies_list(request):
     enqueteur = get_or_create_enqueteur(request.user)
     
-    # Détecter automatiquement les anomalies
-    detecteur = DetecteurAnomalies(enqueteur)
-    detecteur.creer_anomalies_bd()
+    # La détection tourne en arrière-plan (commande traiter_detections) :
+    # la page ne fait que lire les anomalies déjà enregistrées
     
     # Option: Générer des anomalies simulées (pour la démo)
     # DetecteurAnomalies.generer_anomalies_simulees(enqueteur, count=5)
@@ -554,17 +580,19 @@ def anomalies_list(request):
     anomalies = Anomalie.objects.filter(enqueteur=enqueteur).order_by('-date_detection')
     
     # Statistiques
+    kpis = statistiques.stats_anomalies(enqueteur)
     stats = {
-        'total': anomalies.count(),
-        'critiques': anomalies.filter(gravite='ELEVEE', statut='A_TRAITER').count(),
-        'moyennes': anomalies.filter(gravite='MOYENNE', statut='A_TRAITER').count(),
-        'faibles': anomalies.filter(gravite='FAIBLE', statut='A_TRAITER').count(),
-        'resolues': anomalies.filter(statut='RESOLUE').count(),
+        'total': kpis['nb_anomalies'],
+        'critiques': kpis['anomalies_critiques'],
+        'moyennes': kpis['anomalies_moyennes'],
+        'faibles': kpis['anomalies_faibles'],
+        'resolues': kpis['nb_anomalies_resolues'],
     }
     
     context = {
         'anomalies': anomalies,
         'stats': stats,
+        **etat_detection(enqueteur),
     }
     
     return render(request, 'core/anomalies.html', context)
@@ -615,16 +643,18 @@ def supprimer_anomalie(request, anomalie_id):
     return JsonResponse({'error': 'Méthode non autorisée'}, status=400)
 
 @login_required
+@donnees_conditionnelles
 def api_anomalies_stats(request):
     """API pour les statistiques d'anomalies"""
     enqueteur = get_or_create_enqueteur(request.user)
+    kpis = statistiques.stats_anomalies(enqueteur)
     
     stats = {
-        'total': Anomalie.objects.filter(enqueteur=enqueteur).count(),
-        'critiques': Anomalie.objects.filter(enqueteur=enqueteur, gravite='ELEVEE', statut='A_TRAITER').count(),
-        'moyennes': Anomalie.objects.filter(enqueteur=enqueteur, gravite='MOYENNE', statut='A_TRAITER').count(),
-        'faibles': Anomalie.objects.filter(enqueteur=enqueteur, gravite='FAIBLE', statut='A_TRAITER').count(),
-        'resolues': Anomalie.objects.filter(enqueteur=enqueteur, statut='RESOLUE').count(),
+        'total': kpis['nb_anomalies'],
+        'critiques': kpis['anomalies_critiques'],
+        'moyennes': kpis['anomalies_moyennes'],
+        'faibles': kpis['anomalies_faibles'],
+        'resolues': kpis['nb_anomalies_resolues'],
     }
     
     return JsonResponse(stats)
@@ -644,42 +674,17 @@ def comparaison_quartiers(request):
     """Page détaillée de comparaison par quartier"""
     enqueteur = get_or_create_enqueteur(request.user)
     
-    # Récupérer les statistiques par quartier
-    quartiers = Etudiant.objects.filter(
-        enqueteur=enqueteur
-    ).values('quartier').annotate(
-        nb_etudiants=Count('id'),
-        nb_hommes=Count('id', filter=Q(sexe='M')),
-        nb_femmes=Count('id', filter=Q(sexe='F')),
-        age_moyen=Avg('age')
-    )
-    
-    # Pour chaque quartier, calculer les dépenses
-    quartiers_stats = []
-    for q in quartiers:
-        if q['quartier']:
-            depenses = Depense.objects.filter(
-                enqueteur=enqueteur,
-                quartier=q['quartier']
-            ).aggregate(
-                total=Sum('montant'),
-                moyenne=Avg('montant'),
-                count=Count('id')
-            )
-            
-            quartiers_stats.append({
-                'quartier': q['quartier'],
-                'nb_etudiants': q['nb_etudiants'],
-                'nb_hommes': q['nb_hommes'] or 0,
-                'nb_femmes': q['nb_femmes'] or 0,
-                'age_moyen': q['age_moyen'] or 0,
-                'total_depenses': depenses['total'] or 0,
-                'moyenne_depenses': depenses['moyenne'] or 0,
-                'nb_depenses': depenses['count'] or 0
-            })
+    # Statistiques par quartier (étudiants et dépenses), triées par moyenne décroissante
+    quartiers_stats = list(statistiques.stats_par_quartier(enqueteur))
     
-    # Trier par moyenne décroissante
-    quartiers_stats.sort(key=lambda x: x['moyenne_depenses'], reverse=True)
+    # Distributions robustes (médiane, P10/P90, histogramme), en cache jusqu'à la prochaine écriture
+    distributions = en_cache(
+        'distributions', enqueteur,
+        lambda: statistiques.distributions_depenses(enqueteur, par='quartier'),
+        'quartier',
+    )
+    for q in quartiers_stats:
+        q.update(_distribution(distributions, q['quartier']))
     
     # Calculer les statistiques globales
     if quartiers_stats:
@@ -698,11 +703,37 @@ def comparaison_quartiers(request):
         'moins_cher': moins_cher,
         'difference_max': difference_max,
         'moyenne_globale': moyenne_globale,
+        'bornes_classes': distributions['bornes_classes'],
+        # Données du tableau et des graphiques (lues par le JavaScript de la page)
+        'quartiers_data': [{
+            'nom': q['quartier'],
+            'etudiants': q['nb_etudiants'],
+            'depenses': q['nb_depenses'],
+            'moyenne': q['moyenne_depenses'],
+            'total': q['total_depenses'],
+            'hommes': q['nb_hommes'],
+            'femmes': q['nb_femmes'],
+            'age_moyen': q['age_moyen'] or 0,
+            'mediane': q['mediane'],
+            'p10': q['p10'],
+            'p90': q['p90'],
+            'ecart_type': q['ecart_type'],
+            'histogramme': q['histogramme'],
+        } for q in quartiers_stats],
     }
     
     return render(request, 'core/comparaison_quartiers.html', context)
 
+
+def _distribution(distributions, groupe):
+    """Indicateurs de distribution d'un groupe (zéros s'il n'a aucune dépense)"""
+    nb_classes = max(len(distributions['bornes_classes']) - 1, 0)
+    vide = {'mediane': 0, 'p10': 0, 'p90': 0, 'ecart_type': 0, 'histogramme': [0] * nb_classes}
+    indicateurs = distributions['groupes'].get(groupe, vide)
+    return {champ: indicateurs[champ] for champ in vide}
+
 @login_required
+@donnees_conditionnelles
 def api_comparaison_quartiers(request):
     """API pour comparer les quartiers"""
     enqueteur = get_or_create_enqueteur(request.user)
@@ -714,41 +745,30 @@ def api_comparaison_quartiers(request):
     if len(quartiers) < 2:
         return JsonResponse({'error': 'Sélectionnez au moins 2 quartiers'}, status=400)
     
-    results = []
+    # Une seule requête groupée pour tous les quartiers demandés
+    quartiers = list(dict.fromkeys(quartiers))
+    categorie_filtre = None if categorie == 'TOUTES' else categorie
+    stats = {
+        q['quartier']: q for q in statistiques.stats_par_quartier(enqueteur, quartiers, categorie_filtre)
+    }
+    distributions = en_cache(
+        'distributions', enqueteur,
+        lambda: statistiques.distributions_depenses(enqueteur, 'quartier', categorie_filtre, quartiers),
+        'quartier', categorie_filtre, tuple(quartiers),
+    )
     
-    for quartier in quartiers[:3]:  # Limiter à 3 quartiers max
-        # Filtrer par catégorie
-        depenses_query = Depense.objects.filter(
-            enqueteur=enqueteur,
-            quartier=quartier
-        )
-        
-        if categorie != 'TOUTES':
-            depenses_query = depenses_query.filter(categorie=categorie)
-        
-        # Calculer les statistiques
-        stats = depenses_query.aggregate(
-            moyenne=Avg('montant'),
-            maximum=Max('montant'),
-            minimum=Min('montant'),
-            total=Sum('montant'),
-            count=Count('id')
-        )
-        
-        # Compter les étudiants
-        nb_etudiants = Etudiant.objects.filter(
-            enqueteur=enqueteur,
-            quartier=quartier
-        ).count()
-        
+    results = []
+    for quartier in quartiers:
+        q = stats.get(quartier, {})
         results.append({
             'quartier': quartier,
-            'moyenne': float(stats['moyenne'] or 0),
-            'maximum': float(stats['maximum'] or 0),
-            'minimum': float(stats['minimum'] or 0),
-            'total': float(stats['total'] or 0),
-            'nb_depenses': stats['count'] or 0,
-            'nb_etudiants': nb_etudiants
+            'moyenne': float(q.get('moyenne_depenses', 0)),
+            'maximum': float(q.get('depense_max', 0)),
+            'minimum': float(q.get('depense_min', 0)),
+            'total': float(q.get('total_depenses', 0)),
+            'nb_depenses': q.get('nb_depenses', 0),
+            'nb_etudiants': q.get('nb_etudiants', 0),
+            **_distribution(distributions, quartier)
         })
     
     # Trier par moyenne décroissante
@@ -766,152 +786,296 @@ def api_comparaison_quartiers(request):
         'results': results,
         'difference': difference,
         'pourcentage': pourcentage,
-        'categorie': categorie
+        'categorie': categorie,
+        'bornes_classes': distributions['bornes_classes']
     })
 
+@login_required
+@donnees_conditionnelles
+def api_distributions_depenses(request):
+    """API des distributions de montants (médiane, P10/P90, écart-type, histogramme)"""
+    enqueteur = get_or_create_enqueteur(request.user)
+    
+    par = request.GET.get('par', 'quartier')
+    categorie = request.GET.get('categorie') or None
+    if par not in statistiques.DIMENSIONS_DISTRIBUTION:
+        return JsonResponse({'error': 'Dimension invalide (quartier ou categorie)'}, status=400)
+    
+    distributions = en_cache(
+        'distributions', enqueteur,
+        lambda: statistiques.distributions_depenses(enqueteur, par, categorie),
+        par, categorie,
+    )
+    return JsonResponse({'par': par, **distributions})
+
 # =========== API ENDPOINTS ===========
 @login_required
+@donnees_conditionnelles
 def api_quartiers_stats(request):
     """API pour les statistiques par quartier"""
     enqueteur = get_or_create_enqueteur(request.user)
     
-    quartiers = Etudiant.objects.filter(
-        enqueteur=enqueteur
-    ).values('quartier').annotate(
-        nb_etudiants=Count('id'),
-        nb_depenses=Count('depenses'),
-        total_depenses=Sum('depenses__montant'),
-        moyenne_depenses=Avg('depenses__montant')
-    )
-    
-    data = []
-    for q in quartiers:
-        if q['quartier']:
-            data.append({
-                'nom': q['quartier'],
-                'etudiants': q['nb_etudiants'] or 0,
-                'depenses': q['nb_depenses'] or 0,
-                'moyenne': float(q['moyenne_depenses'] or 0),
-                'total': float(q['total_depenses'] or 0)
-            })
-    
-    return JsonResponse(data, safe=False)
+    def calculer():
+        quartiers = Etudiant.objects.filter(
+            enqueteur=enqueteur
+        ).values('quartier').annotate(
+            nb_etudiants=Count('id'),
+            nb_depenses=Count('depenses'),
+            total_depenses=Sum('depenses__montant'),
+            moyenne_depenses=Avg('depenses__montant')
+        )
+        
+        data = []
+        for q in quartiers:
+            if q['quartier']:
+                data.append({
+                    'nom': q['quartier'],
+                    'etudiants': q['nb_etudiants'] or 0,
+                    'depenses': q['nb_depenses'] or 0,
+                    'moyenne': float(q['moyenne_depenses'] or 0),
+                    'total': float(q['total_depenses'] or 0)
+                })
+        return data
+    
+    return JsonResponse(en_cache('quartiers', enqueteur, calculer), safe=False)
 
 @login_required
+@donnees_conditionnelles
 def api_dashboard_stats(request):
     """API pour les statistiques du dashboard"""
     enqueteur = get_or_create_enqueteur(request.user)
     
-    stats = {
-        'total_etudiants': Etudiant.objects.filter(enqueteur=enqueteur).count(),
-        'total_depenses': Depense.objects.filter(enqueteur=enqueteur).count(),
-        'total_quartiers': Etudiant.objects.filter(enqueteur=enqueteur)
-                                        .values('quartier')
-                                        .distinct()
-                                        .count(),
-        'anomalies_resolues': Anomalie.objects.filter(
-            enqueteur=enqueteur, 
-            statut='RESOLUE'
-        ).count(),
-    }
+    def calculer():
+        resume = statistiques.resume_enqueteur(enqueteur)
+        return {
+            'total_etudiants': resume.nb_etudiants,
+            'total_depenses': resume.nb_depenses,
+            'total_quartiers': resume.nb_quartiers,
+            'anomalies_ouvertes': resume.nb_anomalies_ouvertes,
+            'anomalies_resolues': resume.nb_anomalies_resolues,
+        }
     
-    return JsonResponse(stats)
+    return JsonResponse(en_cache('dashboard', enqueteur, calculer))
 
 @login_required
+@donnees_conditionnelles
 def api_sexe_stats(request):
     """API pour les statistiques par sexe"""
     enqueteur = get_or_create_enqueteur(request.user)
     
-    stats = Etudiant.objects.filter(enqueteur=enqueteur).values('sexe').annotate(
-        count=Count('id'),
-        moyenne_depenses=Avg('depenses__montant')
-    )
+    def calculer():
+        resume = statistiques.resume_enqueteur(enqueteur)
+        data = {
+            'hommes': resume.nb_hommes,
+            'femmes': resume.nb_femmes,
+            'ratio': '0:0'
+        }
+        
+        if data['femmes'] > 0:
+            data['ratio'] = f"{data['hommes']}:{data['femmes']}"
+        elif data['hommes'] > 0:
+            data['ratio'] = f"{data['hommes']}:0"
+        return data
     
-    data = {
-        'hommes': 0,
-        'femmes': 0,
-        'ratio': '0:0'
-    }
+    return JsonResponse(en_cache('sexe', enqueteur, calculer))
+
+@login_required
+@donnees_conditionnelles
+def api_evolution_depenses(request):
+    """API pour l'évolution des dépenses (par défaut : 7 derniers jours)"""
+    enqueteur = get_or_create_enqueteur(request.user)
+    
+    # Paramètres : granularité (jour/semaine/mois), nombre d'intervalles, filtres optionnels
+    granularite = request.GET.get('granularite', 'jour')
+    categorie = request.GET.get('categorie') or None
+    quartier = request.GET.get('quartier') or None
     
-    for stat in stats:
-        if stat['sexe'] == 'M':
-            data['hommes'] = stat['count']
-        elif stat['sexe'] == 'F':
-            data['femmes'] = stat['count']
+    if granularite not in statistiques.GRANULARITES:
+        return JsonResponse({'error': 'Granularité invalide (jour, semaine ou mois)'}, status=400)
     
-    if data['femmes'] > 0:
-        data['ratio'] = f"{data['hommes']}:{data['femmes']}"
-    elif data['hommes'] > 0:
-        data['ratio'] = f"{data['hommes']}:0"
+    try:
+        periode = int(request.GET.get('periode', 7))
+    except ValueError:
+        return JsonResponse({'error': 'Période invalide'}, status=400)
+    if not 1 <= periode <= statistiques.PERIODE_MAX_EVOLUTION:
+        return JsonResponse({'error': f'La période doit être comprise entre 1 et {statistiques.PERIODE_MAX_EVOLUTION}'}, status=400)
+    
+    def calculer():
+        _, format_libelle = statistiques.GRANULARITES[granularite]
+        evolution = statistiques.evolution_depenses(enqueteur, granularite, periode, categorie, quartier)
+        return {
+            'dates': [debut.strftime(format_libelle) for debut, _ in evolution],
+            'montants': [total for _, total in evolution],
+            'granularite': granularite,
+        }
     
-    return JsonResponse(data)
+    # La date du jour fait partie de la clé : la fenêtre glisse à minuit
+    return JsonResponse(en_cache(
+        'evolution', enqueteur, calculer,
+        granularite, periode, categorie, quartier, timezone.localdate()
+    ))
 
 @login_required
-def api_evolution_depenses(request):
-    """API pour l'évolution des dépenses (7 derniers jours)"""
+@donnees_conditionnelles
+def api_pivot(request):
+    """API de tableau croisé : ?source=depenses&dimensions=quartier,mois&mesures=count,sum,avg&categorie=..."""
     enqueteur = get_or_create_enqueteur(request.user)
     
-    # 7 derniers jours
-    dates = []
-    montants = []
+    source = request.GET.get('source', 'depenses')
+    dimensions = tuple(filter(None, request.GET.get('dimensions', '').split(',')))
+    mesures = tuple(filter(None, request.GET.get('mesures', 'count').split(',')))
+    # Un paramètre portant le nom d'une dimension filtre sur elle (ex. categorie=LOGEMENT), les autres sont ignorés
+    filtres = tuple(sorted(pivot.lire_filtres(source, request.GET).items()))
     
-    for i in range(7):
-        date = timezone.now() - timedelta(days=i)
-        
-        total = Depense.objects.filter(
-            enqueteur=enqueteur,
-            date_saisie__date=date.date()
-        ).aggregate(Sum('montant'))['montant__sum'] or 0
-        
-        dates.append(date.strftime('%a'))
-        montants.append(float(total))
-    
-    # Inverser pour avoir du plus ancien au plus récent
-    dates.reverse()
-    montants.reverse()
+    try:
+        resultat = en_cache(
+            'pivot', enqueteur,
+            lambda: pivot.pivoter(enqueteur, source, dimensions, mesures, dict(filtres)),
+            source, dimensions, mesures, filtres,
+        )
+    except ValueError as erreur:
+        return JsonResponse({'error': str(erreur)}, status=400)
     
-    return JsonResponse({
-        'dates': dates,
-        'montants': montants
-    })
+    return JsonResponse(resultat)
+
+@login_required
+async def flux_donnees(request):
+    """Flux temps réel (Server-Sent Events) des compteurs de l'enquêteur, servi en ASGI"""
+    if not isinstance(request, ASGIRequest):
+        # En WSGI, une connexion ouverte bloquerait un worker : le client repasse en interrogation
+        return HttpResponse(status=204)
+    
+    user = await request.auser()
+    enqueteur = await Enqueteur.objects.filter(user=user).afirst()
+    if enqueteur is None:
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(flux.evenements(enqueteur.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 # Dans views.py, tu dois avoir cette fonction :
 @login_required
+@donnees_conditionnelles
 def api_rechercher_etudiants(request):
-    """API pour rechercher des étudiants"""
+    """API pour rechercher des étudiants (plein texte classé par pertinence, paginée par curseur, sérialisée avec orjson)
+    
+    Aucune limite sur le nombre de résultats : le curseur parcourt tout le classement.
+    """
     enqueteur = get_or_create_enqueteur(request.user)
     
-    # Récupérer les filtres
-    nom = request.GET.get('nom', '')
-    quartier = request.GET.get('quartier', '')
-    sexe = request.GET.get('sexe', '')
+    # Récupérer les filtres : ceux du curseur pour les pages suivantes
+    curseur = lire_curseur(request.GET.get('curseur'))
+    if curseur:
+        filtres = curseur['filtres']
+        taille = taille_page(request.GET.get('taille', curseur['taille']))
+    else:
+        filtres = {champ: request.GET.get(champ, '') for champ in ('nom', 'quartier', 'sexe')}
+        taille = taille_page(request.GET.get('taille'))
     
     # Construire la requête
     queryset = Etudiant.objects.filter(enqueteur=enqueteur)
     
-    if nom:
-        queryset = queryset.filter(nom__icontains=nom)
-    if quartier:
-        queryset = queryset.filter(quartier=quartier)
-    if sexe:
-        queryset = queryset.filter(sexe=sexe)
+    if filtres['quartier']:
+        queryset = queryset.filter(quartier=filtres['quartier'])
+    if filtres['sexe']:
+        queryset = queryset.filter(sexe=filtres['sexe'])
+    
+    # Colonnes seules : la requête de page reste une lecture d'index
+    colonnes = queryset.values(
+        'id', 'nom', 'age', 'sexe', 'quartier', 'niveau', 'statut',
+        'code_enquete', 'date_collecte',
+    )
+    
+    if filtres['nom']:
+        # Recherche plein texte : classement par pertinence paginé dans la base (une ligne de plus = page suivante)
+        rang = curseur['rang'] if curseur and curseur['sens'] == 'pertinence' else 0
+        classement = recherche.rechercher(
+            enqueteur, filtres['nom'],
+            etudiants=queryset if filtres['quartier'] or filtres['sexe'] else None,
+            limite=taille + 1, decalage=rang,
+        )
+        page_ids = classement[:taille]
+        lignes = sorted(colonnes.filter(id__in=page_ids), key=lambda ligne: page_ids.index(ligne['id']))
+        a_suivante = len(classement) > taille
+        suite = {'rang': rang + taille}
+    else:
+        lignes, _, a_suivante = paginer_par_cle(
+            colonnes, taille, curseur if curseur and curseur['sens'] == 'suivant' else None,
+        )
+        suite = {'date_collecte': lignes[-1]['date_collecte'], 'pk': lignes[-1]['id']} if lignes else {}
+    
+    # Dépenses comptées pour les seules lignes de la page
+    nb_depenses = statistiques.nb_depenses_par_etudiant([ligne['id'] for ligne in lignes])
     
-    # Sérialiser les résultats
+    sexes = dict(Etudiant.SEXE_CHOICES)
+    niveaux = dict(Etudiant.NIVEAU_CHOICES)
     etudiants = []
-    for etud in queryset:
+    for ligne in lignes:
         etudiants.append({
-            'id': etud.id,
-            'nom': etud.nom,
-            'age': etud.age,
-            'sexe': etud.get_sexe_display(),
-            'quartier': etud.quartier,
-            'niveau': etud.get_niveau_display(),
-            'statut': etud.statut,
-            'code_enquete': etud.code_enquete,
-            'nb_depenses': etud.depenses.count()
+            'id': ligne['id'],
+            'nom': ligne['nom'],
+            'age': ligne['age'],
+            'sexe': sexes.get(ligne['sexe'], ligne['sexe']),
+            'quartier': ligne['quartier'],
+            'niveau': niveaux.get(ligne['niveau'], ligne['niveau']),
+            'statut': ligne['statut'],
+            'code_enquete': ligne['code_enquete'],
+            'nb_depenses': nb_depenses.get(ligne['id'], 0)
         })
     
-    return JsonResponse({'etudiants': etudiants})
+    curseur_suivant = None
+    if lignes and a_suivante:
+        sens = 'pertinence' if filtres['nom'] else 'suivant'
+        curseur_suivant = signer_curseur(filtres, taille, sens, **suite)
+    
+    return HttpResponse(
+        orjson.dumps({'etudiants': etudiants, 'curseur_suivant': curseur_suivant}),
+        content_type='application/json',
+    )
+
+@login_required
+@donnees_conditionnelles
+def api_etudiants_proximite(request):
+    """API cartographique : étudiants et dépenses autour d'un point (?lat=&lng=&rayon=) ou dans un cadre (?cadre=)"""
+    enqueteur = get_or_create_enqueteur(request.user)
+    
+    try:
+        zone = geo.lire_zone(request.GET)
+    except ValueError as erreur:
+        return JsonResponse({'error': str(erreur)}, status=400)
+    
+    # Cellules de la grille par index, puis filtre exact sur les coordonnées (et le cercle, trié par distance)
+    etudiants = Etudiant.objects.filter(enqueteur=enqueteur)
+    champs = ['id', 'nom', 'quartier', 'statut', 'gps_lat', 'gps_lng', 'nb_depenses', 'total_depenses']
+    if 'centre' in zone:
+        etudiants = geo.dans_rayon(etudiants, *zone['centre'], zone['rayon_km'])
+        champs.append('distance_km')
+    else:
+        etudiants = geo.dans_cadre(etudiants, *zone['cadre']).order_by('id')
+    
+    # Effectif et total de toute la zone, mais seuls les RESULTATS_MAX premiers points sont chargés (LIMIT)
+    totaux = etudiants.aggregate(nombre=Count('id', distinct=True), total_depenses=Sum('depenses__montant'))
+    lignes = list(etudiants.annotate(
+        nb_depenses=Count('depenses'),
+        total_depenses=Sum('depenses__montant'),
+    ).values(*champs)[:geo.RESULTATS_MAX])
+    
+    for ligne in lignes:
+        ligne['total_depenses'] = float(ligne['total_depenses'] or 0)
+        if 'distance_km' in ligne:
+            ligne['distance_km'] = round(ligne['distance_km'], 3)
+    
+    return HttpResponse(
+        orjson.dumps({
+            'etudiants': lignes,
+            'nombre': totaux['nombre'],
+            'tronque': totaux['nombre'] > len(lignes),
+            'total_depenses': float(totaux['total_depenses'] or 0),
+        }),
+        content_type='application/json',
+    )
 
 # =========== EXPORT ===========
 @login_required
@@ -1001,7 +1165,11 @@ def marquer_verifies(request):
         ids = request.POST.getlist('ids[]')
         statut = request.POST.get('statut', 'VERIFIE')
         
-        Etudiant.objects.filter(id__in=ids, enqueteur=enqueteur).update(statut=statut)
+        modifies = Etudiant.objects.filter(id__in=ids, enqueteur=enqueteur).update(statut=statut)
+        # update() n'émet pas de signal : la version des données (caches, ETag, flux) est avancée ici
+        if modifies:
+            ResumeEnqueteur.incrementer(enqueteur.pk, version=1)
+            flux.signaler_modification(enqueteur.pk)
         return JsonResponse({'success': True, 'count': len(ids)})
     
     return JsonResponse({'success': False}, status=400)
@@ -1012,7 +1180,9 @@ def supprimer_selection(request):
     if request.method == 'POST':
         enqueteur = get_or_create_enqueteur(request.user)
         ids = request.POST.getlist('ids[]')
-        Etudiant.objects.filter(id__in=ids, enqueteur=enqueteur).delete()
+        supprimes, _ = Etudiant.objects.filter(id__in=ids, enqueteur=enqueteur).delete()
+        if supprimes:
+            planifier_detection(enqueteur, incremental=False)
         return JsonResponse({'success': True, 'count': len(ids)})
     
     return JsonResponse({'success': False}, status=400)
\ No newline at end of file
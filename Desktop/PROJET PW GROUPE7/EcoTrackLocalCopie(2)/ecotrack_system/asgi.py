@@ -3,6 +3,18 @@ ASGI config for ecotrack_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Le flux temps réel ``/flux/`` (Server-Sent Events, core.flux) n'est servi
+qu'à travers ce point d'entrée, avec uvicorn (dans requirements.txt) :
+
+    uvicorn ecotrack_system.asgi:application
+
+Derrière un serveur WSGI (runserver, gunicorn sync), la vue répond 204 et le
+tableau de bord interroge /api/dashboard-stats/ toutes les 60 s, en mettant à
+jour les mêmes compteurs (anomalies comprises). Un onglet masqué ferme son
+flux ; un flux ouvert reçoit un ping toutes les 30 s (core.flux.INTERVALLE_PING)
+et ne relit la base qu'à une notification ou toutes les 300 s
+(core.flux.INTERVALLE_VERIFICATION), pour voir les écritures d'autres processus.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """